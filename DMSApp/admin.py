@@ -1,7 +1,18 @@
 from django.contrib import admin
-from .models import Document,Entity
+from .models import Document,DocumentEntity,Entity,IngestedFile
 # Register your models here.
 
 
-admin.site.register(Document)
-admin.site.register(Entity)
\ No newline at end of file
+class DocumentEntityInline(admin.TabularInline):
+    model = DocumentEntity
+    raw_id_fields = ["entity"]
+    extra = 0
+
+
+class DocumentAdmin(admin.ModelAdmin):
+    inlines = [DocumentEntityInline]
+
+
+admin.site.register(Document, DocumentAdmin)
+admin.site.register(Entity)
+admin.site.register(IngestedFile)
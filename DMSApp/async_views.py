@@ -0,0 +1,155 @@
+"""
+Async read path for the document endpoints (``/api/async/...``), served
+without a thread per request when the project runs under ASGI.
+
+Each view borrows a ``DocumentViewSet`` bound to the request for its
+querysets, filters, serializers and cache keys, and only swaps the
+database calls for the async ORM, so both paths return the same bodies.
+"""
+from contextlib import nullcontext
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from django.utils.cache import get_conditional_response
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .cache import aget_cached, alist_cache_key, alists_changed_recently, aset_cached, document_cache_key
+from .etags import aget_document_validators, document_etag, last_modified_timestamp
+from .fast_serializers import ValuesPlan, fast_serialization_enabled
+from .filters import facets_requested, get_facet_counts
+from .instrumentation import timed
+from .models import Entity
+from .pagination import EntityPagination
+from .renderers import ORJSONRenderer
+from .routers import use_primary
+from .serializers import EntitySerializer
+from .views import DocumentViewSet, filter_by_labels
+
+renderer = ORJSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+def read_only_api_view(view_func):
+    """
+    Allow only GET/HEAD and turn exceptions into responses with DRF's
+    exception handler, so errors match the sync views.
+    """
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        try:
+            return await view_func(request, *args, **kwargs)
+        except Exception as exc:
+            context = {"request": request, "view": None, "args": args, "kwargs": kwargs}
+            handled = api_settings.EXCEPTION_HANDLER(exc, context)
+            if handled is None:
+                raise
+            response = json_response(handled.data, status=handled.status_code)
+            for header, value in handled.items():
+                response[header] = value
+            return response
+
+    return wrapper
+
+
+async def aserialize_page(serializer, paginator, queryset, request, view=None):
+    """``serialize_page`` for async views; related rows are fetched in a thread."""
+    plan = ValuesPlan.for_serializer(serializer) if fast_serialization_enabled() else None
+    if plan is None:
+        page = await paginator.apaginate_queryset(queryset, request, view=view)
+        with timed("serialize"):
+            return type(serializer)(page, many=True, context=serializer.context).data
+    page = await paginator.apaginate_queryset(plan.values(queryset), request, view=view)
+    with timed("serialize"):
+        if plan.relations:
+            return await sync_to_async(plan.render)(page)
+        return plan.render(page)
+
+
+async def aget_object(view):
+    """``view.get_object()`` with the async ORM, raising the same ``Http404``."""
+    queryset = view.filter_queryset(view.get_queryset())
+    try:
+        return await queryset.aget(**{view.lookup_field: view.kwargs[view.lookup_field]})
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
+    except (TypeError, ValueError, ValidationError):
+        raise Http404
+
+
+def get_viewset(request, action, **kwargs):
+    drf_request = Request(request)
+    drf_request.accepted_renderer = renderer
+    drf_request.accepted_media_type = renderer.media_type
+    return DocumentViewSet(request=drf_request, action=action, args=(), kwargs=kwargs, format_kwarg=None)
+
+
+@read_only_api_view
+async def document_list(request):
+    view = get_viewset(request, "list")
+    key = await alist_cache_key(view.get_page_variant(view.request))
+    data = await aget_cached(key)
+    if data is None:
+        with use_primary() if await alists_changed_recently() else nullcontext():
+            queryset = view.filter_queryset(view.get_queryset())
+            paginator = view.paginator
+            page_data = await aserialize_page(view.get_serializer(), paginator, queryset, view.request, view=view)
+            data = paginator.get_paginated_response(page_data).data
+            if facets_requested(view.request):
+                data["facets"] = await sync_to_async(get_facet_counts)(queryset)
+        await aset_cached(key, data)
+    return json_response(data)
+
+
+@read_only_api_view
+async def document_detail(request, uid):
+    view = get_viewset(request, "retrieve", uid=uid)
+    variant = view.get_representation_variant(view.request)
+    validators = await aget_document_validators(uid)
+    if validators is None:
+        # Raises the same 404 as the sync view for a missing or invalid uid.
+        instance = await aget_object(view)
+        validators = instance.version, instance.updated_at
+
+    version, updated_at = validators
+    etag = document_etag(uid, version, variant)
+    last_modified = last_modified_timestamp(updated_at)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return view.set_validators(not_modified, etag, last_modified)
+
+    data = await aget_cached(document_cache_key("detail", uid, version, variant))
+    if data is None:
+        instance = await aget_object(view)
+        with timed("serialize"):
+            data = view.get_serializer(instance).data
+        await aset_cached(document_cache_key("detail", uid, instance.version, variant), data)
+        etag = document_etag(uid, instance.version, variant)
+        last_modified = last_modified_timestamp(instance.updated_at)
+    return view.set_validators(json_response(data), etag, last_modified)
+
+
+@read_only_api_view
+async def document_entities(request, uid):
+    view = get_viewset(request, "entities", uid=uid)
+    validators = await aget_document_validators(uid)
+    if validators is None:
+        return json_response({"error": "Document with the given ID does not exist."}, status=404)
+
+    key = document_cache_key("entities", uid, validators[0], view.get_page_variant(view.request))
+    data = await aget_cached(key)
+    if data is None:
+        queryset = filter_by_labels(Entity.objects.filter(documents__uid=uid).order_by("id"), view.request)
+        paginator = EntityPagination()
+        page_data = await aserialize_page(EntitySerializer(), paginator, queryset, view.request)
+        data = paginator.get_paginated_response(page_data).data
+        await aset_cached(key, data)
+    return json_response(data)
@@ -0,0 +1,181 @@
+"""
+Benchmark suite for the API and ingest hot paths (``manage.py benchmark_suite``).
+
+A synthetic corpus is cloned from the sample files in ``data/``, seeded,
+and the main endpoints are measured through the Django test client with
+the response cache disabled. Results are plain JSON so runs from two
+commits can be compared with ``compare_results``.
+"""
+import itertools
+import json
+import os
+import time
+
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Descriptor, Document
+from .utils.parsing import extract_metadata_and_text_from_html, json_path_for
+from .utils.seeding_scripts import populate_database_with_files
+
+RESULTS_VERSION = 1
+PAGE_SIZE = 50
+SEARCH_TERMS = ("recurso", "tribunal", "crime", "contrato", "prova")
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def generate_corpus(source_folder, target_folder, documents):
+    """
+    Write ``documents`` HTML/JSON pairs to ``target_folder`` by cycling through
+    the pairs in ``source_folder``. Each clone gets its own process number
+    and one extra citation shared with a tenth of the corpus, so entity
+    sharing grows with the corpus like it does in real data.
+    """
+    templates = []
+    for file_name in sorted(os.listdir(source_folder)):
+        if not file_name.endswith(".html"):
+            continue
+        html_path = os.path.join(source_folder, file_name)
+        metadata, _ = extract_metadata_and_text_from_html(html_path)
+        if not metadata or not metadata.get("process_number"):
+            continue
+        with open(html_path, "rb") as html_file:
+            html = html_file.read()
+        entities = []
+        if os.path.exists(json_path_for(html_path)):
+            with open(json_path_for(html_path), encoding="utf-8") as json_file:
+                entities = json.load(json_file).get("entities", [])
+        templates.append((metadata["process_number"].encode("ascii", "ignore"), html, entities))
+    if not templates:
+        raise ValueError(f"No usable HTML files found in '{source_folder}'.")
+
+    os.makedirs(target_folder, exist_ok=True)
+    shared_citations = max(1, documents // 10)
+    for index, (process_number, html, entities) in zip(range(documents), itertools.cycle(templates)):
+        base_name = os.path.join(target_folder, f"synthetic{index:07d}")
+        with open(f"{base_name}.html", "wb") as html_file:
+            html_file.write(html.replace(process_number, process_number + f"-S{index:07d}".encode("ascii")))
+        citation = {"name": f"Synthetic citation {index % shared_citations}", "label": "CASE", "url": None}
+        with open(f"{base_name}.json", "w", encoding="utf-8") as json_file:
+            json.dump({"entities": entities + [citation]}, json_file, ensure_ascii=False)
+    return documents
+
+
+def measure_seed(data_folder, workers=1):
+    started = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        report = populate_database_with_files(data_folder, max_workers=workers, full=True)
+    seconds = time.perf_counter() - started
+    written = report.documents_inserted + report.documents_updated
+    return {
+        "documents": written,
+        "seconds": round(seconds, 3),
+        "documents_per_second": round(written / seconds, 1) if seconds else 0.0,
+        "queries": len(queries),
+    }
+
+
+def build_scenarios(samples=20):
+    """Map scenario names to the URLs their requests cycle through."""
+    uids = list(Document.objects.order_by("?").values_list("uid", flat=True)[:samples])
+    tribunals = list(
+        Document.objects.exclude(tribunal=None).values_list("tribunal", flat=True).distinct()[:samples]
+    )
+    descriptors = list(Descriptor.objects.values_list("name", flat=True)[:samples])
+    list_url = reverse("document-list")
+    return {
+        "list": [f"{list_url}?page_size={PAGE_SIZE}"],
+        "list_fields": [f"{list_url}?page_size={PAGE_SIZE}&fields=uid,summary,entities,descriptor_terms"],
+        "list_filtered": [
+            f"{list_url}?page_size={PAGE_SIZE}&facets=true&tribunal={tribunal}" for tribunal in tribunals
+        ] + [f"{list_url}?page_size={PAGE_SIZE}&descriptor={descriptor}" for descriptor in descriptors],
+        "search": [f"{list_url}?page_size={PAGE_SIZE}&search={term}" for term in SEARCH_TERMS],
+        "detail": [reverse("document-detail", args=[uid]) for uid in uids],
+        "entities": [reverse("document-entities", args=[uid]) for uid in uids],
+    }
+
+
+def measure_endpoint(client, urls, repeat):
+    """Latency percentiles and the highest query count over ``repeat`` requests."""
+    latencies = []
+    max_queries = 0
+    errors = 0
+    for _, url in zip(range(repeat), itertools.cycle(urls)):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(url)
+            latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            errors += 1
+        max_queries = max(max_queries, len(queries))
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "queries": max_queries,
+        "errors": errors,
+    }
+
+
+def run_suite(data_folder, corpus_folder, documents, repeat, workers=1):
+    """Generate and seed a corpus, then measure every scenario. Returns the results dict."""
+    generate_corpus(data_folder, corpus_folder, documents)
+    results = {
+        "version": RESULTS_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "settings": {"documents": documents, "repeat": repeat, "database": connection.vendor},
+        "seed": measure_seed(corpus_folder, workers=workers),
+        "endpoints": {},
+    }
+    client = Client()
+    # Measure the work behind each request, not the response cache.
+    with override_settings(DOCUMENT_CACHE_TIMEOUT=0):
+        for name, urls in build_scenarios().items():
+            if urls:
+                results["endpoints"][name] = measure_endpoint(client, urls, repeat)
+    return results
+
+
+def flatten_metrics(results):
+    """``{metric: (value, higher_is_better, tolerance_applies)}`` for comparison."""
+    metrics = {}
+    seed = results.get("seed", {})
+    if "documents_per_second" in seed:
+        metrics["seed.documents_per_second"] = (seed["documents_per_second"], True, True)
+    if "queries" in seed and seed.get("documents"):
+        metrics["seed.queries_per_document"] = (round(seed["queries"] / seed["documents"], 3), False, True)
+    for name, endpoint in results.get("endpoints", {}).items():
+        metrics[f"{name}.p50_ms"] = (endpoint["p50_ms"], False, True)
+        metrics[f"{name}.p95_ms"] = (endpoint["p95_ms"], False, True)
+        # Query counts are deterministic: any increase is a regression.
+        metrics[f"{name}.queries"] = (endpoint["queries"], False, False)
+    return metrics
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Compare two result dicts. Returns ``(metric, baseline, current, change,
+    regressed)`` rows, where ``change`` is the relative change and timings
+    regress when they get worse by more than ``threshold`` (e.g. 0.2).
+    """
+    rows = []
+    baseline_metrics = flatten_metrics(baseline)
+    for metric, (value, higher_is_better, tolerant) in flatten_metrics(current).items():
+        if metric not in baseline_metrics:
+            continue
+        before = baseline_metrics[metric][0]
+        change = (value - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        regressed = worse > threshold if tolerant else value > before
+        rows.append((metric, before, value, change, regressed))
+    return rows
@@ -0,0 +1,198 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from .cache import invalidate_document_lists
+from .compression import get_body_codec
+from .descriptors import index_descriptors
+from .models import (
+    BODY_FIELDS,
+    Document,
+    DocumentEntity,
+    Entity,
+    defer_version_bumps,
+    normalize_name,
+    store_document_bodies,
+)
+from .search import index_documents
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UpsertResult:
+    # process_number -> "created" / "updated", and -> document id
+    outcomes: dict = field(default_factory=dict)
+    document_ids: dict = field(default_factory=dict)
+    documents_skipped: int = 0
+    entities_created: int = 0
+    entities_skipped: int = 0
+    citations_created: int = 0
+
+
+def entity_key(entity_data):
+    return normalize_name(entity_data["name"]), entity_data["label"]
+
+
+def resolve_entities(entities_data):
+    """
+    Map ``(normalized_name, label)`` to entity ids, creating the entities no
+    document has cited yet. Nameless entities cannot be matched and are left
+    out. Returns ``(entity_ids, created_count)``.
+    """
+    wanted = {}
+    for entity_data in entities_data:
+        key = entity_key(entity_data)
+        if key[0]:
+            wanted.setdefault(key, entity_data)
+
+    def lookup(keys):
+        names = {name for name, _ in keys}
+        return {
+            (name, label): entity_id
+            for name, label, entity_id in Entity.objects.filter(normalized_name__in=names).values_list(
+                "normalized_name", "label", "id"
+            )
+            if (name, label) in keys
+        }
+
+    entity_ids = lookup(wanted.keys())
+    missing = [key for key in wanted if key not in entity_ids]
+    if not missing:
+        return entity_ids, 0
+    Entity.objects.bulk_create(
+        [Entity(normalized_name=key[0], **wanted[key]) for key in missing], ignore_conflicts=True
+    )
+    created = lookup(set(missing))
+    entity_ids.update(created)
+    return entity_ids, len(created)
+
+
+def upsert_documents(items):
+    """
+    Insert or update documents keyed on ``process_number`` with a fixed
+    number of queries, in the caller's transaction.
+
+    ``items`` are ``(document_data, entities_data)`` pairs. Updates write only
+    the fields present in ``document_data``; ``entities_data`` replaces the
+    document's entity links, or leaves them alone when it is ``None``. Later
+    items repeating a process number are skipped.
+    """
+    result = UpsertResult()
+    batch = {}
+    for document_data, entities_data in items:
+        process_number = document_data["process_number"]
+        if process_number in batch:
+            result.documents_skipped += 1
+            continue
+        batch[process_number] = (document_data, entities_data)
+    if not batch:
+        return result
+
+    compressed = bool(get_body_codec())
+    with defer_version_bumps() as changed_document_ids:
+        existing_ids = dict(
+            Document.objects.filter(process_number__in=batch).values_list("process_number", "id")
+        )
+        new_documents = []
+        updates_by_fields = defaultdict(list)
+        for process_number, (document_data, _) in batch.items():
+            if compressed:
+                # The columns are emptied and the text goes to DocumentBody below.
+                document_data = {
+                    field: None if field in BODY_FIELDS else value for field, value in document_data.items()
+                }
+            if process_number in existing_ids:
+                fields = tuple(sorted(set(document_data) - {"process_number"}))
+                updates_by_fields[fields].append(Document(id=existing_ids[process_number], **document_data))
+            else:
+                new_documents.append(Document(**document_data))
+        Document.objects.bulk_create(new_documents, ignore_conflicts=True)
+        for fields, documents in updates_by_fields.items():
+            if fields:
+                Document.objects.bulk_update(documents, fields)
+        changed_document_ids.update(existing_ids.values())
+
+        document_ids = result.document_ids = dict(
+            Document.objects.filter(process_number__in=batch).values_list("process_number", "id")
+        )
+        store_written_bodies(batch, existing_ids, document_ids, compressed)
+        index_written_documents(batch, existing_ids, document_ids)
+        link_entities(batch, existing_ids, document_ids, result)
+
+    result.outcomes = {
+        process_number: "updated" if process_number in existing_ids else "created"
+        for process_number in batch
+        if process_number in document_ids
+    }
+    invalidate_document_lists()
+    return result
+
+
+def store_written_bodies(batch, existing_ids, document_ids, compressed):
+    bodies = {}
+    for process_number, (document_data, _) in batch.items():
+        # Plain-text bodies only need stale compressed copies dropped.
+        if process_number in document_ids and (compressed or process_number in existing_ids):
+            texts = {field: document_data[field] for field in BODY_FIELDS if field in document_data}
+            if texts:
+                bodies[document_ids[process_number]] = texts
+    store_document_bodies(bodies)
+
+
+def index_written_documents(batch, existing_ids, document_ids):
+    search_rows = []
+    stale_ids = []
+    descriptor_rows = []
+    for process_number, (document_data, _) in batch.items():
+        document_id = document_ids.get(process_number)
+        if document_id is None:
+            continue
+        is_new = process_number not in existing_ids
+        if is_new or ("summary" in document_data and "main_text" in document_data):
+            search_rows.append((document_id, document_data.get("summary"), document_data.get("main_text")))
+        elif "summary" in document_data or "main_text" in document_data:
+            stale_ids.append(document_id)
+        if is_new or "descriptors" in document_data:
+            descriptor_rows.append((document_id, document_data.get("descriptors")))
+    if stale_ids:
+        search_rows += [
+            (document.id, document.summary, document.main_text)
+            for document in Document.objects.filter(id__in=stale_ids)
+            .select_related("body")
+            .only("id", "summary", "main_text", "body__main_text")
+        ]
+    index_documents(search_rows)
+    index_descriptors(descriptor_rows)
+
+
+def link_entities(batch, existing_ids, document_ids, result):
+    replaced = {
+        process_number: entities_data
+        for process_number, (_, entities_data) in batch.items()
+        if entities_data is not None
+    }
+    DocumentEntity.objects.filter(
+        document_id__in=[existing_ids[process_number] for process_number in replaced if process_number in existing_ids]
+    ).delete()
+    entity_ids, result.entities_created = resolve_entities(
+        entity_data for entities_data in replaced.values() for entity_data in entities_data
+    )
+    links = set()
+    for process_number, entities_data in replaced.items():
+        document_id = document_ids.get(process_number)
+        for entity_data in entities_data:
+            if document_id is None:
+                logger.warning(f"Document for entity '{entity_data['name']}' not found. Skipping.")
+                result.entities_skipped += 1
+                continue
+            entity_id = entity_ids.get(entity_key(entity_data))
+            if entity_id is None or (document_id, entity_id) in links:
+                result.entities_skipped += 1
+                continue
+            links.add((document_id, entity_id))
+    DocumentEntity.objects.bulk_create(
+        [DocumentEntity(document_id=document_id, entity_id=entity_id) for document_id, entity_id in links],
+        ignore_conflicts=True,
+    )
+    result.citations_created = len(links)
@@ -0,0 +1,108 @@
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .routers import replica_aliases
+
+LIST_GENERATION_KEY = "documents:list:generation"
+LIST_CHANGED_AT_KEY = "documents:list:changed_at"
+
+
+def get_document_cache():
+    return caches[getattr(settings, "DOCUMENT_CACHE_ALIAS", "default")]
+
+
+def get_cache_timeout():
+    return getattr(settings, "DOCUMENT_CACHE_TIMEOUT", 300)
+
+
+def _digest(variant):
+    return hashlib.md5(variant.encode("utf-8")).hexdigest()
+
+
+def document_cache_key(kind, uid, version, variant=""):
+    """
+    Key for a single document representation. The stored ``version`` is part
+    of the key, so any write to the document or its entities moves readers to
+    a fresh key and the old entry simply expires.
+    """
+    return f"documents:{kind}:{str(uid).replace('-', '')}:{version}:{_digest(variant)}"
+
+
+def encoded_response_cache_key(path, etag, encoding):
+    """Compressed bytes of a response, keyed by its strong ETag."""
+    return f"documents:encoded:{encoding}:{_digest(path + etag)}"
+
+
+def get_list_generation():
+    cache = get_document_cache()
+    generation = cache.get(LIST_GENERATION_KEY)
+    if generation is None:
+        # Start from the clock so an evicted counter never reuses old keys.
+        cache.add(LIST_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(LIST_GENERATION_KEY, 0)
+    return generation
+
+
+def list_cache_key(variant):
+    return f"documents:list:{get_list_generation()}:{_digest(variant)}"
+
+
+def _bump_list_generation():
+    cache = get_document_cache()
+    try:
+        cache.incr(LIST_GENERATION_KEY)
+    except ValueError:
+        cache.set(LIST_GENERATION_KEY, time.time_ns(), timeout=None)
+    if replica_aliases():
+        cache.set(LIST_CHANGED_AT_KEY, time.time(), timeout=None)
+
+
+def lists_changed_recently():
+    """
+    Whether document lists changed within ``REPLICA_LAG_SECONDS``. Pages
+    cached in that window are built on the primary, since a replica may not
+    have the change yet and its page would be cached under the new generation.
+    """
+    window = getattr(settings, "REPLICA_LAG_SECONDS", 10)
+    if not window or not replica_aliases():
+        return False
+    changed_at = get_document_cache().get(LIST_CHANGED_AT_KEY)
+    return changed_at is not None and time.time() - changed_at < window
+
+
+def invalidate_document_lists(using=None):
+    """
+    Drop every cached list page by moving to a new list generation.
+
+    Inside a transaction the generation is bumped again on commit, since a
+    concurrent reader may have cached the pre-commit rows in between.
+    """
+    _bump_list_generation()
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(_bump_list_generation, using=using)
+
+
+def get_cached(key):
+    return get_document_cache().get(key)
+
+
+def set_cached(key, data):
+    get_document_cache().set(key, data, get_cache_timeout())
+
+
+# Async views use these; the list key reads (and may create) the generation.
+alist_cache_key = sync_to_async(list_cache_key)
+alists_changed_recently = sync_to_async(lists_changed_recently)
+
+
+async def aget_cached(key):
+    return await get_document_cache().aget(key)
+
+
+async def aset_cached(key, data):
+    await get_document_cache().aset(key, data, get_cache_timeout())
@@ -0,0 +1,48 @@
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd is optional, zlib is always available
+    zstandard = None
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+
+
+def available_codecs():
+    return ("zlib", "zstd") if zstandard is not None else ("zlib",)
+
+
+def get_body_codec():
+    """Codec for new document bodies, or ``None`` to keep them as plain text."""
+    codec = getattr(settings, "DOCUMENT_BODY_CODEC", "") or None
+    if codec is not None and codec not in available_codecs():
+        raise ImproperlyConfigured(
+            f"DOCUMENT_BODY_CODEC must be one of {', '.join(available_codecs())}, got '{codec}'."
+        )
+    return codec
+
+
+def compress_text(text, codec):
+    if text is None:
+        return None
+    data = text.encode("utf-8")
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress_text(data):
+    """Decode a body written by ``compress_text``; the codec is read from the frame header."""
+    if data is None:
+        return None
+    data = bytes(data)
+    if data[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ImproperlyConfigured("Reading zstd-compressed bodies requires the 'zstandard' package.")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
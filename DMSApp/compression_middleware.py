@@ -0,0 +1,120 @@
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .cache import encoded_response_cache_key, get_cached, set_cached
+from .instrumentation import timed
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional, gzip is always available
+    brotli = None
+
+DEFAULT_COMPRESSION_PATH_PREFIXES = ('/api/',)
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings():
+    """Supported content codings, in server preference order."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding):
+    """
+    Pick the content coding for an ``Accept-Encoding`` header, or ``None``
+    for identity. The client's q-values win; ties go to the server order.
+    """
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    candidates = [
+        (weights.get(coding, weights.get('*', 0.0)), -index, coding)
+        for index, coding in enumerate(available_encodings())
+    ]
+    weight, _, coding = max(candidates)
+    return coding if weight > 0 else None
+
+
+def encode_body(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+    return gzip.compress(content, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Gzip/Brotli content coding for API responses.
+
+    Listed before ``ETagMiddleware`` so it sees the final identity body.
+    Compressed responses carry ``Vary: Accept-Encoding`` and a weak ETag,
+    as the bytes differ per coding while the representation is the same;
+    304s get the same weak tag. JSON responses with a view-set (strong)
+    ETag are compressed once per coding and then served from the cache.
+    """
+
+    min_length = 200
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.path_prefixes = tuple(
+            getattr(settings, 'COMPRESSION_PATH_PREFIXES', DEFAULT_COMPRESSION_PATH_PREFIXES)
+        )
+
+    def process_response(self, request, response):
+        if not self.applies_to(request, response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response['ETag'] = f'W/{etag}'
+        if response.status_code == 304:
+            return response
+
+        key = None
+        if etag and not etag.startswith('W/') and response.get('Content-Type', '').startswith('application/json'):
+            key = encoded_response_cache_key(request.path, etag, encoding)
+        compressed = get_cached(key) if key else None
+        if compressed is None:
+            with timed('compress'):
+                compressed = encode_body(response.content, encoding)
+            if key:
+                set_cached(key, compressed)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        return response
+
+    def applies_to(self, request, response):
+        if response.status_code == 304:
+            return request.path.startswith(self.path_prefixes)
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.has_header('Content-Encoding')
+            and len(response.content) >= self.min_length
+            and 'no-transform' not in response.get('Cache-Control', '')
+            and request.path.startswith(self.path_prefixes)
+        )
@@ -0,0 +1,48 @@
+from .models import Descriptor, Document, normalize_name
+from .utils.parsing import split_descriptors
+
+
+def resolve_descriptors(names, using="default"):
+    """
+    Map normalized names to descriptor ids, creating the missing ones.
+    ``names`` maps each normalized name to the display name to store.
+    """
+    descriptors = Descriptor.objects.using(using)
+    descriptor_ids = dict(descriptors.filter(normalized_name__in=names).values_list("normalized_name", "id"))
+    missing = [name for name in names if name not in descriptor_ids]
+    if missing:
+        descriptors.bulk_create(
+            [Descriptor(name=names[name][:255], normalized_name=name) for name in missing], ignore_conflicts=True
+        )
+        descriptor_ids.update(descriptors.filter(normalized_name__in=missing).values_list("normalized_name", "id"))
+    return descriptor_ids
+
+
+def index_descriptors(rows, using="default"):
+    """
+    Replace the descriptor terms of documents with the terms found in their
+    ``descriptors`` text. ``rows`` are ``(document_id, descriptors)`` pairs.
+    """
+    terms_by_document = {}
+    names = {}
+    for document_id, text in rows:
+        terms = terms_by_document[document_id] = set()
+        for term in split_descriptors(text):
+            name = normalize_name(term)
+            if name:
+                terms.add(name)
+                names.setdefault(name, term)
+    if not terms_by_document:
+        return
+
+    descriptor_ids = resolve_descriptors(names, using=using)
+    DocumentDescriptor = Document.descriptor_terms.through
+    DocumentDescriptor.objects.using(using).filter(document_id__in=terms_by_document).delete()
+    DocumentDescriptor.objects.using(using).bulk_create(
+        [
+            DocumentDescriptor(document_id=document_id, descriptor_id=descriptor_ids[name])
+            for document_id, terms in terms_by_document.items()
+            for name in sorted(terms)
+        ],
+        ignore_conflicts=True,
+    )
@@ -1,25 +1,55 @@
 import hashlib
 
-class ETagMiddleware:
-    def __init__(self, get_response):
-        self.get_response = get_response
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import parse_http_date_safe
 
-    def __call__(self, request):
-        response = self.get_response(request)
+from .instrumentation import timed
 
+DEFAULT_ETAG_PATH_PREFIXES = ('/api/',)
 
-        if request.method not in ('GET', 'HEAD'):
-            return response
 
-        etag = hashlib.md5(response.content).hexdigest()
+class ETagMiddleware(MiddlewareMixin):
+    """
+    Conditional GET layer for API responses.
+
+    Views that can validate cheaply (document detail) set ``ETag`` and
+    ``Last-Modified`` and answer 304 before doing any expensive work; this
+    middleware only evaluates ``If-None-Match`` (including lists and ``*``)
+    and ``If-Modified-Since`` against those headers. Other buffered API
+    responses get a weak ETag computed from their body. Streaming responses
+    and paths outside ``ETAG_PATH_PREFIXES`` (admin, static files, API
+    docs) pass through untouched. Works under both WSGI and ASGI.
+
+    Runs inside ``CompressionMiddleware``, so tags always describe the
+    identity body and ``If-None-Match`` uses the weak comparison: a tag that
+    was weakened for a compressed response still matches.
+    """
 
-        if_none_match = request.headers.get('If-None-Match')
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.path_prefixes = tuple(getattr(settings, 'ETAG_PATH_PREFIXES', DEFAULT_ETAG_PATH_PREFIXES))
+
+    def process_response(self, request, response):
+        if request.method not in ('GET', 'HEAD') or not self.applies_to(request, response):
+            return response
 
-        if if_none_match == etag:
+        if not response.has_header('ETag') and not response.has_header('Content-Encoding'):
+            with timed('etag'):
+                response['ETag'] = 'W/"%s"' % hashlib.md5(response.content).hexdigest()
 
-            response.status_code = 304
-            response.content = b''
+        last_modified = None
+        if response.has_header('Last-Modified'):
+            last_modified = parse_http_date_safe(response['Last-Modified'])
 
-        response['ETag'] = etag
+        return get_conditional_response(
+            request, etag=response.get('ETag'), last_modified=last_modified, response=response
+        )
 
-        return response
+    def applies_to(self, request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and request.path.startswith(self.path_prefixes)
+        )
@@ -0,0 +1,33 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.utils.http import quote_etag
+
+from .models import Document
+
+
+def get_document_validators(uid):
+    """
+    Return ``(version, updated_at)`` for a document from a single indexed
+    lookup, or ``None`` if it does not exist.
+    """
+    try:
+        return Document.objects.filter(uid=uid).values_list("version", "updated_at").first()
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+async def aget_document_validators(uid):
+    try:
+        return await Document.objects.filter(uid=uid).values_list("version", "updated_at").afirst()
+    except (TypeError, ValueError, ValidationError):
+        return None
+
+
+def document_etag(uid, version, variant=""):
+    variant_hash = hashlib.md5(variant.encode("utf-8")).hexdigest()[:8]
+    return quote_etag(f"{str(uid).replace('-', '')}-{version}-{variant_hash}")
+
+
+def last_modified_timestamp(updated_at):
+    return int(updated_at.timestamp()) if updated_at else None
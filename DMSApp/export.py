@@ -0,0 +1,162 @@
+import csv
+import json
+import zlib
+from datetime import datetime, time
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .compression_middleware import BROTLI_QUALITY, GZIP_LEVEL, brotli, negotiate_encoding
+from .models import BODY_FIELDS, Document
+from .serializers import requested_field_names
+
+EXPORT_FORMATS = ("ndjson", "csv")
+EXPORT_FIELDS = (
+    "id", "uid", "process_number", "tribunal", "summary", "decision", "date", "descriptors", "main_text",
+    "version", "updated_at", "entities",
+)
+EXPORT_CHUNK_SIZE = 500
+
+
+def export_queryset(fields, since=None):
+    """
+    Documents to export in ``(updated_at, id)`` order, so a ``since``
+    watermark reads a range of ``document_updated_at_id_idx``.
+    """
+    queryset = Document.objects.order_by("updated_at", "id").only(
+        *[field for field in fields if field != "entities"], "updated_at"
+    )
+    bodies = [field for field in fields if field in BODY_FIELDS]
+    if bodies:
+        queryset = queryset.select_related("body").only(
+            *[field for field in fields if field != "entities"], "updated_at", *(f"body__{field}" for field in bodies)
+        )
+    if since is not None:
+        queryset = queryset.filter(updated_at__gte=since)
+    if "entities" in fields:
+        queryset = queryset.prefetch_related("entities")
+    return queryset
+
+
+def iter_export_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one list of plain rows per chunk. ``iterator()`` streams from a
+    server-side cursor where the database has one and prefetches entities per
+    chunk, so memory is bounded by ``chunk_size`` whatever the corpus size.
+    """
+    rows = []
+    for document in queryset.iterator(chunk_size=chunk_size):
+        row = {}
+        for field in fields:
+            if field == "entities":
+                row[field] = [
+                    {"name": entity.name, "label": entity.label, "url": entity.url}
+                    for entity in document.entities.all()
+                ]
+                continue
+            value = getattr(document, field)
+            if field == "uid":
+                value = str(value)
+            elif value is not None and field in ("date", "updated_at"):
+                value = value.isoformat()
+            row[field] = value
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def render_ndjson(row_chunks):
+    for rows in row_chunks:
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+
+class _Lines:
+    """Write target that hands back what ``csv.writer`` wrote."""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(row_chunks, fields):
+    writer = csv.writer(_Lines())
+    yield writer.writerow(fields).encode("utf-8")
+    for rows in row_chunks:
+        lines = []
+        for row in rows:
+            if "entities" in row:
+                row["entities"] = json.dumps(row["entities"], ensure_ascii=False)
+            lines.append(writer.writerow([row[field] for field in fields]))
+        yield "".join(lines).encode("utf-8")
+
+
+def compress_stream(chunks, encoding):
+    """Compress ``chunks`` as they are produced with ``encoding`` ('br' or 'gzip')."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        compress, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        compressed = compress(chunk)
+        if compressed:
+            yield compressed
+    yield finish()
+
+
+def parse_since(value):
+    try:
+        since = parse_datetime(value)
+        if since is None:
+            day = parse_date(value)
+            since = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        since = None
+    if since is None:
+        raise ValidationError({"since": "Enter a valid ISO 8601 date or datetime."})
+    if timezone.is_aware(since) and not settings.USE_TZ:
+        since = timezone.make_naive(since)
+    elif timezone.is_naive(since) and settings.USE_TZ:
+        since = timezone.make_aware(since)
+    return since
+
+
+def export_documents(request):
+    """
+    Stream documents as NDJSON (default) or CSV, compressed with the coding
+    ``negotiate_encoding`` picks. ``output``, ``fields`` and ``since`` come
+    from the query string; the ``X-Export-Started-At`` header is the
+    ``since`` to pass next time to get only what changed in between.
+    """
+    output = request.query_params.get("output", "ndjson").lower()
+    if output not in EXPORT_FORMATS:
+        raise ValidationError({"output": f"Choose one of: {', '.join(EXPORT_FORMATS)}."})
+    since = request.query_params.get("since")
+    since = parse_since(since) if since else None
+    requested = requested_field_names(request, "fields")
+    fields = [field for field in EXPORT_FIELDS if field in requested] or list(EXPORT_FIELDS)
+
+    started_at = timezone.now()
+    rows = iter_export_rows(export_queryset(fields, since), fields)
+    if output == "csv":
+        chunks, content_type = render_csv(rows, fields), "text/csv; charset=utf-8"
+    else:
+        chunks, content_type = render_ndjson(rows), "application/x-ndjson"
+
+    encoding = negotiate_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    if encoding:
+        chunks = compress_stream(chunks, encoding)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    if encoding:
+        response["Content-Encoding"] = encoding
+    patch_vary_headers(response, ["Accept-Encoding"])
+    response["Content-Disposition"] = f'attachment; filename="documents.{output}"'
+    response["X-Export-Started-At"] = started_at.isoformat()
+    return response
@@ -0,0 +1,113 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+
+from .compression import decompress_text
+from .models import BODY_FIELDS, Document
+
+# Serializer fields whose representation of a database value is the value itself.
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+def fast_serialization_enabled():
+    return getattr(settings, "FAST_SERIALIZATION", True)
+
+
+class ValuesPlan:
+    """
+    Read-only fast path for a ``ModelSerializer``: renders ``.values()`` rows
+    into the same dicts as ``serializer.data``, without building model
+    instances or calling ``get_attribute`` per field. Many-to-many fields
+    (nested serializers or slug fields) are fetched with one ``.values()``
+    query each, the same join ``prefetch_related`` uses.
+
+    ``ValuesPlan.for_serializer`` returns ``None`` for serializers it cannot
+    reproduce exactly, and callers then use the serializer as usual.
+    """
+
+    def __init__(self, model, fields, relations):
+        self.model = model
+        self.pk = model._meta.pk.attname
+        self.fields = fields
+        self.relations = relations
+        self.bodies = [key for _, key, _ in fields if model is Document and key in BODY_FIELDS]
+        self.columns = list(dict.fromkeys(
+            [self.pk, *(key for _, key, _ in fields if key), *(f"body__{key}" for key in self.bodies)]
+        ))
+
+    @classmethod
+    def for_serializer(cls, serializer):
+        model = serializer.Meta.model
+        concrete = {field.name: field for field in model._meta.concrete_fields}
+        fields = []
+        relations = []
+        for field in serializer._readable_fields:
+            if isinstance(field, (serializers.ListSerializer, serializers.ManyRelatedField)):
+                try:
+                    model_field = model._meta.get_field(field.source)
+                except FieldDoesNotExist:
+                    return None
+                if not isinstance(model_field, models.ManyToManyField):
+                    return None
+                if isinstance(field, serializers.ListSerializer):
+                    if not isinstance(field.child, serializers.ModelSerializer):
+                        return None
+                    child = cls.for_serializer(field.child)
+                elif isinstance(field.child_relation, serializers.SlugRelatedField):
+                    child = field.child_relation.slug_field
+                    if "__" in child:
+                        return None
+                else:
+                    return None
+                if child is None:
+                    return None
+                relations.append((field.field_name, model_field, child))
+                # Placeholder keeping the serializer's field order.
+                fields.append((field.field_name, None, None))
+            elif field.source in concrete and not concrete[field.source].is_relation:
+                convert = None if type(field) in PASSTHROUGH_FIELDS else field.to_representation
+                fields.append((field.field_name, concrete[field.source].attname, convert))
+            else:
+                return None
+        return cls(model, fields, relations)
+
+    def values(self, queryset):
+        # Keyset pagination reads the ordering fields of the page boundaries.
+        ordering = [term.lstrip("-") for term in queryset.query.order_by if isinstance(term, str)]
+        concrete = {field.attname for field in self.model._meta.concrete_fields}
+        return queryset.values(*dict.fromkeys([*self.columns, *(name for name in ordering if name in concrete)]))
+
+    def render(self, rows):
+        rows = list(rows)
+        data = [self.render_row(row) for row in rows]
+        for name, model_field, child in self.relations:
+            related = self.fetch_related(model_field, child, [row[self.pk] for row in rows])
+            for row, item in zip(rows, data):
+                item[name] = related.get(row[self.pk], [])
+        return data
+
+    def render_row(self, row):
+        for key in self.bodies:
+            if row[key] is None and row[f"body__{key}"] is not None:
+                row[key] = decompress_text(row[f"body__{key}"])
+        item = {}
+        for name, key, convert in self.fields:
+            value = row[key] if key else None
+            item[name] = value if value is None or convert is None else convert(value)
+        return item
+
+    def fetch_related(self, model_field, child, ids):
+        owner = model_field.related_query_name()
+        queryset = model_field.related_model._default_manager.filter(**{f"{owner}__in": ids})
+        related = defaultdict(list)
+        if isinstance(child, ValuesPlan):
+            rows = list(queryset.values(owner, *child.columns))
+            for row, item in zip(rows, child.render(rows)):
+                related[row[owner]].append(item)
+        else:
+            for owner_id, slug in queryset.values_list(owner, child):
+                related[owner_id].append(slug)
+        return related
@@ -0,0 +1,102 @@
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+from rest_framework.settings import api_settings
+
+from .models import Descriptor, Document, normalize_name
+from .pagination import TRUE_VALUES
+from .search import full_text_search
+
+FACET_LIMIT = 20
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Drop-in replacement for ``SearchFilter`` backed by the database full-text
+    index (a GIN-indexed tsvector on PostgreSQL, FTS5 on SQLite).
+
+    Results are ranked by relevance unless the client asks for an explicit
+    ``ordering``, so this backend must come after ``OrderingFilter``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "").replace("\x00", "").strip()
+        if not query:
+            return queryset
+
+        results = full_text_search(queryset, query)
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+
+        if not request.query_params.get(api_settings.ORDERING_PARAM) and "search_rank" in results.query.annotations:
+            results = results.order_by("-search_rank", "id")
+        return results
+
+
+class DocumentFacetFilter(BaseFilterBackend):
+    """
+    Structured filters: ``tribunal`` (repeat for any of several),
+    ``date_from``/``date_to`` (inclusive, ``YYYY-MM-DD``) and ``descriptor``
+    (repeat to require all of them).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        tribunals = [value for value in params.getlist("tribunal") if value]
+        if tribunals:
+            queryset = queryset.filter(tribunal__in=tribunals)
+
+        date_from = self.get_date(params, "date_from")
+        if date_from:
+            queryset = queryset.filter(date__gte=date_from)
+        date_to = self.get_date(params, "date_to")
+        if date_to:
+            queryset = queryset.filter(date__lte=date_to)
+
+        DocumentDescriptor = Document.descriptor_terms.through
+        for descriptor in params.getlist("descriptor"):
+            tagged = DocumentDescriptor.objects.filter(descriptor__normalized_name=normalize_name(descriptor))
+            queryset = queryset.filter(pk__in=tagged.values("document_id"))
+        return queryset
+
+    def get_date(self, params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            date = parse_date(value)
+        except ValueError:
+            date = None
+        if date is None:
+            raise ValidationError({name: "Enter a valid date in YYYY-MM-DD format."})
+        return date
+
+
+def facets_requested(request):
+    # Facet counts cost a few grouped queries, so clients opt in.
+    return request.query_params.get("facets", "").lower() in TRUE_VALUES
+
+
+def get_facet_counts(queryset, limit=FACET_LIMIT):
+    """Document counts per tribunal, descriptor and year over a filtered queryset."""
+    documents = Document.objects.filter(pk__in=queryset.order_by().values("pk"))
+
+    tribunals = (
+        documents.exclude(tribunal__isnull=True).exclude(tribunal="")
+        .values("tribunal").annotate(count=Count("id")).order_by("-count", "tribunal")[:limit]
+    )
+    descriptors = (
+        Descriptor.objects.filter(documents__in=documents)
+        .values("name").annotate(count=Count("documents")).order_by("-count", "name")[:limit]
+    )
+    years = (
+        documents.exclude(date__isnull=True).annotate(year=ExtractYear("date"))
+        .values("year").annotate(count=Count("id")).order_by("-year")[:limit]
+    )
+    return {
+        "tribunal": [{"value": row["tribunal"], "count": row["count"]} for row in tribunals],
+        "descriptors": [{"value": row["name"], "count": row["count"]} for row in descriptors],
+        "year": [{"value": row["year"], "count": row["count"]} for row in years],
+    }
@@ -0,0 +1,226 @@
+"""
+Per-request instrumentation: database query count and time, serialization,
+rendering and ETag hashing time.
+
+``InstrumentationMiddleware`` opens a ``RequestMetrics`` for each request in
+a context variable, which the database execute wrapper and ``timed()``
+blocks add to, including from ``sync_to_async`` threads. On the way out it
+records per-route histograms served by ``metrics_view`` in the Prometheus
+text format, adds a ``Server-Timing`` header if ``SERVER_TIMING`` is on,
+and logs queries slower than ``SLOW_QUERY_THRESHOLD_MS``. Metrics are kept per process, so each
+worker exposes its own.
+"""
+import hmac
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+_current_metrics = ContextVar("request_metrics", default=None)
+
+PHASES = ("db", "serialize", "render", "etag", "compress")
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SLOW_QUERY_SQL_LENGTH = 1000
+
+
+class RequestMetrics:
+    def __init__(self, slow_query_ms=0):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.slow_query_ms = slow_query_ms
+
+    def add(self, phase, seconds):
+        self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to ``phase`` of the current request, if any."""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(phase, time.perf_counter() - started)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper, installed on every connection (see ``install_query_recorder``)."""
+    metrics = _current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        metrics.queries += 1
+        metrics.add("db", duration)
+        if metrics.slow_query_ms and duration * 1000 >= metrics.slow_query_ms:
+            logger.warning(f"Slow query ({duration * 1000:.1f} ms): {sql[:SLOW_QUERY_SQL_LENGTH]}")
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver; wrappers survive reconnects, so add it once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        counts, total = self.series.get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+        counts[bisect_left(self.buckets, value)] += 1
+        self.series[labels] = (counts, total + value)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self.series.items()):
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.histograms = {
+            "request": Histogram(
+                "dms_request_duration_seconds", "Time to produce a response.", DURATION_BUCKETS
+            ),
+            "queries": Histogram(
+                "dms_request_db_queries", "Database queries per request.", QUERY_COUNT_BUCKETS
+            ),
+            **{
+                phase: Histogram(
+                    f"dms_request_{phase}_duration_seconds", f"Time per request spent in {phase}.", DURATION_BUCKETS
+                )
+                for phase in PHASES
+            },
+        }
+
+    def record(self, labels, total, metrics):
+        with self.lock:
+            self.histograms["request"].observe(labels, total)
+            self.histograms["queries"].observe(labels, metrics.queries)
+            for phase, seconds in metrics.durations.items():
+                self.histograms[phase].observe(labels, seconds)
+
+    def expose(self):
+        with self.lock:
+            lines = [line for histogram in self.histograms.values() for line in histogram.expose()]
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def route_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match else "unmatched"
+
+
+class InstrumentationMiddleware:
+    """
+    Times each request (outermost in ``MIDDLEWARE``) and reports the totals.
+    Removed from the stack when ``INSTRUMENTATION`` is off.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "INSTRUMENTATION", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = self.start()
+        token = _current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = self.start()
+        token = _current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def start(self):
+        return RequestMetrics(slow_query_ms=getattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0))
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.started
+        labels = (("route", route_name(request)), ("method", request.method), ("status", str(response.status_code)))
+        registry.record(labels, total, metrics)
+        if getattr(settings, "SERVER_TIMING", False):
+            response["Server-Timing"] = server_timing(metrics, total)
+        return response
+
+
+def server_timing(metrics, total):
+    entries = [f'db;dur={metrics.durations["db"] * 1000:.2f};desc="{metrics.queries} queries"']
+    entries += [
+        f"{phase};dur={seconds * 1000:.2f}"
+        for phase, seconds in metrics.durations.items()
+        if phase != "db" and seconds
+    ]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; 404 unless ``METRICS_ENABLED``. Requires
+    ``Authorization: Bearer <METRICS_TOKEN>`` when a token is set, and a
+    client address in ``INTERNAL_IPS`` otherwise.
+    """
+    if not getattr(settings, "METRICS_ENABLED", False) or not getattr(settings, "INSTRUMENTATION", True):
+        raise Http404
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(registry.expose(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def metrics_allowed(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    return request.META.get("REMOTE_ADDR") in getattr(settings, "INTERNAL_IPS", ())
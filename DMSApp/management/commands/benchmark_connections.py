@@ -0,0 +1,78 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from DMSApp.benchmarks import percentile
+from DMSApp.models import Document
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures per-request database latency with a new connection per request (CONN_MAX_AGE=0) '
+        'and with persistent connections, replaying the request_started/request_finished cycle '
+        'that closes connections between requests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Simulated requests per mode (default: 200).'
+        )
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=60,
+            help='CONN_MAX_AGE used for the persistent mode (default: 60).'
+        )
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Database alias to measure (default: default).'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['requests'] < 1:
+            raise CommandError('--requests must be a positive integer.')
+        connection = connections[kwargs['database']]
+        self.stdout.write(
+            f"{kwargs['requests']} requests against {connection.vendor} "
+            f"({connection.settings_dict.get('HOST') or connection.settings_dict['NAME']})"
+        )
+        self.stdout.write(
+            f"{'mode':<12} {'connects':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}"
+        )
+        for mode, max_age in (('fresh', 0), ('persistent', kwargs['max_age'])):
+            connects, latencies = self.run(connection, max_age, kwargs['requests'])
+            self.stdout.write(
+                f"{mode:<12} {connects:>8} {percentile(latencies, 0.50):>8.2f} {percentile(latencies, 0.95):>8.2f} "
+                f"{percentile(latencies, 0.99):>8.2f} {sum(latencies) / len(latencies):>8.2f}"
+            )
+
+    def run(self, connection, max_age, total):
+        connects = []
+
+        def count_connect(sender, connection, **kwargs):
+            connects.append(connection.alias)
+
+        original_max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        connection.close()
+        connection_created.connect(count_connect)
+        latencies = []
+        try:
+            for _ in range(total):
+                started = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                list(Document.objects.using(connection.alias).order_by('-id').values_list('id', flat=True)[:1])
+                request_finished.send(sender=self.__class__)
+                latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection_created.disconnect(count_connect)
+            connection.settings_dict['CONN_MAX_AGE'] = original_max_age
+            connection.close()
+        return connects.count(connection.alias), sorted(latencies)
@@ -0,0 +1,97 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from DMSApp.compression import available_codecs, compress_text, decompress_text
+from DMSApp.models import BODY_FIELDS, Document, DocumentBody
+from DMSApp.serializers import DocumentSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Reports document table sizes, body compression ratios and detail load latency. '
+        'Run it before and after compress_document_bodies to compare.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=200,
+            help='Number of documents to measure (default: 200).'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Times each document detail is loaded (default: 5).'
+        )
+
+    def handle(self, *args, **kwargs):
+        uids = list(Document.objects.order_by("id").values_list("uid", flat=True)[:kwargs['sample']])
+        if not uids:
+            self.stderr.write("Error: There are no documents to measure.")
+            return
+        self.write_table_sizes()
+        self.write_codec_ratios(uids)
+        self.write_detail_latency(uids, kwargs['repeat'])
+
+    def write_table_sizes(self):
+        if connection.vendor != "postgresql":
+            self.stdout.write(f"Table sizes: not available on {connection.vendor}.")
+            return
+        self.stdout.write(f"{'table':<24} {'total':>10} {'heap':>10}")
+        with connection.cursor() as cursor:
+            for model in (Document, DocumentBody):
+                table = model._meta.db_table
+                cursor.execute(
+                    "SELECT pg_size_pretty(pg_total_relation_size(%s)), pg_size_pretty(pg_relation_size(%s))",
+                    [table, table],
+                )
+                total, heap = cursor.fetchone()
+                self.stdout.write(f"{table:<24} {total:>10} {heap:>10}")
+
+    def write_codec_ratios(self, uids):
+        documents = Document.objects.filter(uid__in=uids).select_related("body")
+        texts = [
+            getattr(document, field).encode("utf-8")
+            for document in documents
+            for field in BODY_FIELDS
+            if getattr(document, field)
+        ]
+        raw_bytes = sum(len(text) for text in texts)
+        self.stdout.write(f"Bodies: {len(texts)} texts, {raw_bytes} bytes")
+        if not raw_bytes:
+            return
+        self.stdout.write(f"{'codec':<6} {'bytes':>10} {'ratio':>6} {'compress MB/s':>14} {'decompress MB/s':>16}")
+        for codec in available_codecs():
+            started = time.perf_counter()
+            compressed = [compress_text(text.decode("utf-8"), codec) for text in texts]
+            compress_seconds = time.perf_counter() - started
+            started = time.perf_counter()
+            for data in compressed:
+                decompress_text(data)
+            decompress_seconds = time.perf_counter() - started
+            size = sum(len(data) for data in compressed)
+            megabytes = raw_bytes / 1e6
+            self.stdout.write(
+                f"{codec:<6} {size:>10} {raw_bytes / size:>5.1f}x "
+                f"{megabytes / compress_seconds:>14.1f} {megabytes / decompress_seconds:>16.1f}"
+            )
+
+    def write_detail_latency(self, uids, repeat):
+        # The detail view's database load and serialization, without HTTP or the response cache.
+        timings = []
+        for _ in range(repeat):
+            for uid in uids:
+                started = time.perf_counter()
+                document = Document.objects.select_related("body").prefetch_related("entities").get(uid=uid)
+                DocumentSerializer(document).data
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+        self.stdout.write(
+            f"Detail load: {len(timings)} loads, p50 {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms"
+        )
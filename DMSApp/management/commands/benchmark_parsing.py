@@ -0,0 +1,81 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from DMSApp.utils.seeding_scripts import EXECUTOR_CHOICES, parse_files
+
+
+class Command(BaseCommand):
+    help = 'Measures HTML parsing throughput of the seeder for different executors and worker counts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data_folder',
+            type=str,
+            default="data/",
+            help='Path to the folder containing the data files (default: "data/").'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            nargs='+',
+            default=[1, 2, 4, 8],
+            help='Worker counts to measure (default: 1 2 4 8).'
+        )
+        parser.add_argument(
+            '--executor',
+            choices=EXECUTOR_CHOICES + ('both',),
+            default='both',
+            help='Executor to measure (default: both).'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Parse every file this many times so small folders give a measurable workload (default: 20).'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Number of files handed to a worker per task.'
+        )
+
+    def handle(self, *args, **kwargs):
+        data_folder = kwargs['data_folder']
+        if not os.path.isdir(data_folder):
+            self.stderr.write(f"Error: The specified data folder '{data_folder}' does not exist.")
+            return
+
+        file_names = sorted(name for name in os.listdir(data_folder) if name.endswith(".html"))
+        file_names = file_names * kwargs['repeat']
+        if not file_names:
+            self.stderr.write(f"Error: No HTML files found in '{data_folder}'.")
+            return
+
+        executors = EXECUTOR_CHOICES if kwargs['executor'] == 'both' else (kwargs['executor'],)
+        self.stdout.write(f"Parsing {len(file_names)} files from {data_folder}")
+        self.stdout.write(f"{'executor':<10} {'workers':>7} {'seconds':>9} {'files/s':>9} {'speedup':>8}")
+
+        for executor in executors:
+            baseline = None
+            for workers in kwargs['workers']:
+                started = time.perf_counter()
+                parsed = sum(
+                    1 for record in parse_files(
+                        file_names,
+                        data_folder,
+                        max_workers=workers,
+                        executor=executor,
+                        chunk_size=kwargs['chunk_size'],
+                    )
+                    if record["document"]
+                )
+                elapsed = time.perf_counter() - started
+                throughput = parsed / elapsed if elapsed else 0.0
+                baseline = baseline or throughput
+                speedup = throughput / baseline if baseline else 0.0
+                self.stdout.write(
+                    f"{executor:<10} {workers:>7} {elapsed:>9.2f} {throughput:>9.1f} {speedup:>7.2f}x"
+                )
@@ -0,0 +1,80 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from DMSApp.fast_serializers import ValuesPlan
+from DMSApp.models import Document, Entity
+from DMSApp.renderers import ORJSONRenderer
+from DMSApp.serializers import DocumentListSerializer, DocumentSerializer, EntitySerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares DRF serializers with the stdlib JSON renderer against the .values() fast path '
+        'with the orjson renderer, checking that both produce the same bytes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--documents',
+            type=int,
+            default=100,
+            help='Number of documents (and entities) per page (default: 100).'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Number of timed runs per case (default: 20).'
+        )
+
+    def handle(self, *args, **kwargs):
+        if not Document.objects.exists():
+            self.stderr.write("Error: There are no documents to serialize.")
+            return
+
+        limit = kwargs['documents']
+        cases = [
+            ("compact list", DocumentListSerializer, Document.objects.order_by("date", "id")),
+            (
+                "full list",
+                DocumentSerializer,
+                Document.objects.order_by("date", "id")
+                .select_related("body")
+                .prefetch_related("entities", "descriptor_terms"),
+            ),
+            ("entities", EntitySerializer, Entity.objects.order_by("id")),
+        ]
+        self.stdout.write(
+            f"{'case':<14} {'rows':>5} {'KB':>8} {'drf ms':>9} {'fast ms':>9} {'speedup':>8}"
+        )
+        for name, serializer_class, queryset in cases:
+            plan = ValuesPlan.for_serializer(serializer_class())
+
+            def standard():
+                data = serializer_class(list(queryset[:limit]), many=True).data
+                return JSONRenderer().render(data)
+
+            def fast():
+                return ORJSONRenderer().render(plan.render(plan.values(queryset)[:limit]))
+
+            expected, actual = standard(), fast()
+            if actual != expected:
+                raise CommandError(f"{name}: the fast path output differs from the serializer output.")
+            baseline = self.measure(standard, kwargs['repeat'])
+            optimized = self.measure(fast, kwargs['repeat'])
+            self.stdout.write(
+                f"{name:<14} {queryset[:limit].count():>5} {len(expected) / 1024:>8.1f} "
+                f"{baseline:>9.2f} {optimized:>9.2f} {baseline / optimized:>7.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS("Outputs are identical."))
+
+    def measure(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,133 @@
+import json
+import os
+import subprocess
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from DMSApp.benchmarks import compare_results, run_suite
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a synthetic corpus into a throwaway test database and measures seed throughput and '
+        'API latency and query counts. Optionally compares the results with an earlier run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data_folder',
+            type=str,
+            default="data/",
+            help='Folder with the sample HTML/JSON files the corpus is cloned from (default: "data/").'
+        )
+        parser.add_argument(
+            '--documents',
+            type=int,
+            default=1000,
+            help='Number of documents in the synthetic corpus (default: 1000).'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='Requests per endpoint scenario (default: 50).'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Parser workers used by the seeder (default: 1).'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Write the results as JSON to this file.'
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            default=None,
+            help='Results file of an earlier run to compare against; exits with an error on regressions.'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.2,
+            help='Allowed relative slowdown before a timing counts as a regression (default: 0.2). '
+                 'Any increase in query counts is a regression.'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['documents'] < 1 or kwargs['repeat'] < 1:
+            raise CommandError("--documents and --repeat must be positive integers.")
+        if not os.path.isdir(kwargs['data_folder']):
+            raise CommandError(f"The specified data folder '{kwargs['data_folder']}' does not exist.")
+        baseline = None
+        if kwargs['compare']:
+            with open(kwargs['compare'], encoding="utf-8") as baseline_file:
+                baseline = json.load(baseline_file)
+
+        results = self.run_in_test_database(kwargs)
+        results["commit"] = self.current_commit()
+        self.write_results(results)
+        if kwargs['output']:
+            with open(kwargs['output'], "w", encoding="utf-8") as output_file:
+                json.dump(results, output_file, indent=2)
+            self.stdout.write(f"Results written to {kwargs['output']}")
+        if baseline is not None:
+            self.compare(baseline, results, kwargs['threshold'])
+
+    def run_in_test_database(self, kwargs):
+        # Never touch the configured database: build a fresh test database
+        # with every migration applied, like the test runner does. Replicas
+        # are switched off too, or reads would go to the real ones.
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with tempfile.TemporaryDirectory(prefix="dms-benchmark-") as corpus_folder, \
+                    override_settings(DATABASE_REPLICAS=[]):
+                return run_suite(
+                    kwargs['data_folder'], corpus_folder, kwargs['documents'], kwargs['repeat'], kwargs['workers']
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def current_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def write_results(self, results):
+        seed = results["seed"]
+        self.stdout.write(
+            f"Seeded {seed['documents']} documents in {seed['seconds']:.2f}s "
+            f"({seed['documents_per_second']:.1f} docs/s, {seed['queries']} queries)"
+        )
+        self.stdout.write(
+            f"{'scenario':<14} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}"
+        )
+        for name, endpoint in results["endpoints"].items():
+            self.stdout.write(
+                f"{name:<14} {endpoint['p50_ms']:>8.2f} {endpoint['p95_ms']:>8.2f} "
+                f"{endpoint['p99_ms']:>8.2f} {endpoint['queries']:>8} {endpoint['errors']:>7}"
+            )
+
+    def compare(self, baseline, results, threshold):
+        rows = compare_results(baseline, results, threshold)
+        self.stdout.write(f"Compared with {baseline.get('commit') or 'baseline'}:")
+        self.stdout.write(f"{'metric':<32} {'baseline':>10} {'current':>10} {'change':>8}")
+        for metric, before, value, change, regressed in rows:
+            marker = "  REGRESSION" if regressed else ""
+            self.stdout.write(f"{metric:<32} {before:>10} {value:>10} {change:>+7.0%}{marker}")
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions:
+            raise CommandError(f"{len(regressions)} metrics regressed: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS("No regressions."))
@@ -0,0 +1,111 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import Length
+
+from DMSApp.compression import available_codecs, decompress_text, get_body_codec
+from DMSApp.models import BODY_FIELDS, Document, DocumentBody, store_document_bodies
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves existing main_text and decision bodies into the compressed DocumentBody table, '
+        'or back into the document table with --decompress.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--codec',
+            choices=available_codecs(),
+            default=None,
+            help='Codec to compress with (default: DOCUMENT_BODY_CODEC).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of documents moved per transaction (default: 500).'
+        )
+        parser.add_argument(
+            '--decompress',
+            action='store_true',
+            help='Move compressed bodies back to plain text columns. Unset DOCUMENT_BODY_CODEC first, '
+                 'or new writes will be compressed again.'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if kwargs['decompress']:
+            self.decompress(kwargs['batch_size'])
+            return
+        codec = kwargs['codec'] or get_body_codec()
+        if not codec:
+            raise CommandError(
+                "Set DOCUMENT_BODY_CODEC (or pass --codec) before compressing, so new writes are "
+                "compressed too and the application reads the moved bodies back."
+            )
+        self.compress(codec, kwargs['batch_size'])
+
+    def compress(self, codec, batch_size):
+        # Rows are rewritten in place: the text does not change, so versions,
+        # ETags, cached responses and the search index all stay valid.
+        pending = Document.objects.filter(Q(main_text__isnull=False) | Q(decision__isnull=False)).order_by("id")
+        moved = raw_bytes = 0
+        last_id = 0
+        while True:
+            rows = list(pending.filter(id__gt=last_id).values_list("id", *BODY_FIELDS)[:batch_size])
+            if not rows:
+                break
+            bodies = {}
+            for document_id, *texts in rows:
+                texts = {field: text for field, text in zip(BODY_FIELDS, texts) if text is not None}
+                bodies[document_id] = texts
+                raw_bytes += sum(len(text.encode("utf-8")) for text in texts.values())
+            with transaction.atomic():
+                store_document_bodies(bodies, codec=codec)
+                Document.objects.filter(id__in=bodies).update(**{field: None for field in BODY_FIELDS})
+            moved += len(rows)
+            last_id = rows[-1][0]
+            self.stdout.write(f"Compressed {moved} documents...")
+        stored = DocumentBody.objects.aggregate(
+            main_text=Sum(Length("main_text")), decision=Sum(Length("decision"))
+        )
+        stored_bytes = sum(size or 0 for size in stored.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Compressed {moved} documents with {codec} ({raw_bytes} bytes of text). "
+            f"Compressed bodies now take {stored_bytes} bytes."
+        ))
+
+    def decompress(self, batch_size):
+        moved = 0
+        last_id = 0
+        while True:
+            bodies = list(
+                DocumentBody.objects.filter(document_id__gt=last_id).order_by("document_id")[:batch_size]
+            )
+            if not bodies:
+                break
+            columns = {
+                document_id: texts
+                for document_id, *texts in Document.objects.filter(
+                    id__in=[body.document_id for body in bodies]
+                ).values_list("id", *BODY_FIELDS)
+            }
+            documents = []
+            for body in bodies:
+                texts = columns.get(body.document_id)
+                if texts is None:
+                    continue
+                # A text column that is set wins over a stale compressed copy.
+                documents.append(Document(id=body.document_id, **{
+                    field: text if text is not None else decompress_text(getattr(body, field))
+                    for field, text in zip(BODY_FIELDS, texts)
+                }))
+            with transaction.atomic():
+                Document.objects.bulk_update(documents, BODY_FIELDS)
+                DocumentBody.objects.filter(document_id__in=[body.document_id for body in bodies]).delete()
+            moved += len(documents)
+            last_id = bodies[-1].document_id
+            self.stdout.write(f"Decompressed {moved} documents...")
+        self.stdout.write(self.style.SUCCESS(f"Decompressed {moved} documents."))
@@ -0,0 +1,94 @@
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from DMSApp.benchmarks import percentile
+
+READ_CHUNK_SIZE = 16 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends concurrent GET requests to one or more running servers and reports throughput and latency, '
+        'e.g. the WSGI and ASGI deployments of the same endpoint at equal worker counts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'urls',
+            nargs='+',
+            help='Full URLs to measure, e.g. http://localhost:8000/api/documents/ '
+                 'http://localhost:8001/api/async/documents/.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=32,
+            help='Number of simultaneous clients (default: 32).'
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=1000,
+            help='Requests sent to each URL (default: 1000).'
+        )
+        parser.add_argument(
+            '--read-delay',
+            type=float,
+            default=0.0,
+            help='Seconds a client waits between 16 KB reads, to simulate slow clients (default: 0).'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=float,
+            default=30.0,
+            help='Per-request timeout in seconds (default: 30).'
+        )
+
+    def handle(self, *args, **kwargs):
+        if kwargs['concurrency'] < 1 or kwargs['requests'] < 1:
+            raise CommandError('--concurrency and --requests must be positive integers.')
+
+        self.stdout.write(
+            f"{kwargs['requests']} requests per URL, {kwargs['concurrency']} concurrent clients"
+        )
+        self.stdout.write(
+            f"{'url':<50} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for url in kwargs['urls']:
+            result = self.run(
+                url, kwargs['requests'], kwargs['concurrency'], kwargs['read_delay'], kwargs['timeout']
+            )
+            self.stdout.write(
+                f"{url:<50} {result['throughput']:>8.1f} {result['p50']:>8.1f} "
+                f"{result['p95']:>8.1f} {result['p99']:>8.1f} {result['errors']:>7}"
+            )
+
+    def run(self, url, total, concurrency, read_delay, timeout):
+        def fetch(_):
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as response:
+                    while response.read(READ_CHUNK_SIZE):
+                        if read_delay:
+                            time.sleep(read_delay)
+                    ok = response.status == 200
+            except OSError:
+                ok = False
+            return ok, (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(fetch, range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for ok, latency in results if ok)
+        return {
+            'throughput': len(latencies) / elapsed if elapsed else 0.0,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'errors': total - len(latencies),
+        }
@@ -1,7 +1,19 @@
-from django.core.management.base import BaseCommand
-from DMSApp.utils.seeding_scripts import populate_database_with_files # Import your function
+import cProfile
+import io
+import json
+import pstats
+
+from django.core.management.base import BaseCommand, CommandError
+from DMSApp.utils.seeding_scripts import (  # Import your function
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_QUEUE_SIZE,
+    EXECUTOR_CHOICES,
+    populate_database_with_files,
+)
 import os
 
+PROFILE_STATS_LIMIT = 25
+
 
 class Command(BaseCommand):
     help = 'Seeds the database with documents and entities from the specified data folder.'
@@ -20,21 +32,138 @@ class Command(BaseCommand):
             default=4,
             help='Number of parallel workers to use for processing (default: 4).'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Number of documents written per transaction (default: {DEFAULT_BATCH_SIZE}).'
+        )
+        parser.add_argument(
+            '--executor',
+            choices=EXECUTOR_CHOICES,
+            default='threads',
+            help='Run HTML parsing in a thread pool or a process pool (default: threads). '
+                 'Use processes on multi-core machines; parsing is CPU-bound.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Number of files handed to a worker per task (default: 1 for threads, 16 for processes).'
+        )
+        parser.add_argument(
+            '--queue-size',
+            type=int,
+            default=DEFAULT_QUEUE_SIZE,
+            help=f'Maximum number of parsed files waiting to be written (default: {DEFAULT_QUEUE_SIZE}).'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore the ingest manifest and re-parse every file.'
+        )
+        parser.add_argument(
+            '--profile',
+            type=str,
+            default=None,
+            metavar='PATH',
+            help='Run under cProfile, write the pstats dump to PATH and print the top functions. '
+                 'Only the writer thread is profiled; parsing shows up in the stage timings.'
+        )
+        parser.add_argument(
+            '--summary-json',
+            type=str,
+            default=None,
+            metavar='PATH',
+            help='Write a JSON summary of the run to PATH ("-" for stdout), also on failure.'
+        )
 
     def handle(self, *args, **kwargs):
         # Read arguments
         data_folder = kwargs['data_folder']
         max_workers = kwargs['workers']
+        batch_size = kwargs['batch_size']
+        executor = kwargs['executor']
+        chunk_size = kwargs['chunk_size']
+        queue_size = kwargs['queue_size']
 
         # Validate the data folder
         if not os.path.isdir(data_folder):
             self.stderr.write(f"Error: The specified data folder '{data_folder}' does not exist.")
             return
+        if batch_size < 1:
+            self.stderr.write("Error: --batch-size must be a positive integer.")
+            return
+        if chunk_size is not None and chunk_size < 1:
+            self.stderr.write("Error: --chunk-size must be a positive integer.")
+            return
+        if queue_size < 1:
+            self.stderr.write("Error: --queue-size must be a positive integer.")
+            return
+
+        summary = {
+            "status": "succeeded",
+            "data_folder": data_folder,
+            "workers": max_workers,
+            "executor": executor,
+            "batch_size": batch_size,
+        }
+        progress = self.write_progress if kwargs['verbosity'] > 0 else None
+        profiler = cProfile.Profile() if kwargs['profile'] else None
 
         # Call the seeding function
-        self.stdout.write(f"Starting database seeding from folder: {data_folder} with {max_workers} workers...")
+        self.stdout.write(
+            f"Starting database seeding from folder: {data_folder} with {max_workers} {executor} workers..."
+        )
         try:
-            populate_database_with_files(data_folder=data_folder, max_workers=max_workers)
+            if profiler:
+                profiler.enable()
+            try:
+                report = populate_database_with_files(
+                    data_folder=data_folder,
+                    max_workers=max_workers,
+                    batch_size=batch_size,
+                    executor=executor,
+                    chunk_size=chunk_size,
+                    queue_size=queue_size,
+                    full=kwargs['full'],
+                    progress=progress,
+                )
+            finally:
+                if profiler:
+                    profiler.disable()
+                    self.write_profile(profiler, kwargs['profile'])
             self.stdout.write("Database seeding completed successfully.")
+            for key, value in report.as_dict().items():
+                self.stdout.write(f"  {key}: {value}")
+            summary.update(report.as_dict())
         except Exception as e:
-            self.stderr.write(f"An error occurred during seeding: {e}")
+            summary.update(status="failed", error=str(e))
+            if kwargs['summary_json']:
+                self.write_summary(summary, kwargs['summary_json'])
+            raise CommandError(f"An error occurred during seeding: {e}") from e
+
+        if kwargs['summary_json']:
+            self.write_summary(summary, kwargs['summary_json'])
+
+    def write_progress(self, report):
+        self.stderr.write(
+            f"  {report.files_processed} files, {report.rows_written} rows in {report.elapsed_seconds:.1f}s "
+            f"({report.files_per_second} files/s, {report.rows_per_second} rows/s)"
+        )
+
+    def write_profile(self, profiler, path):
+        profiler.dump_stats(path)
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_STATS_LIMIT)
+        self.stdout.write(output.getvalue())
+        self.stdout.write(f"Profile written to {path} (open with `python -m pstats {path}`).")
+
+    def write_summary(self, summary, path):
+        payload = json.dumps(summary, sort_keys=True)
+        if path == "-":
+            # Last line of the output, after the human-readable report.
+            self.stdout.write(payload)
+            return
+        with open(path, "w", encoding="utf-8") as output:
+            output.write(payload + "\n")
@@ -0,0 +1,116 @@
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 500
+
+# Frozen copies of the DMSApp.search names and helpers as of this migration.
+DOCUMENT_TABLE = "DMSApp_document"
+POSTGRES_SEARCH_CONFIG = "portuguese"
+POSTGRES_SEARCH_COLUMN = "search_vector"
+POSTGRES_SEARCH_INDEX = "document_search_vector_gin"
+SQLITE_FTS_TABLE = "DMSApp_document_fts"
+SUMMARY_WEIGHT = "A"
+MAIN_TEXT_WEIGHT = "B"
+
+
+def search_backend(connection):
+    if connection.vendor == "postgresql":
+        return "postgresql"
+    if connection.vendor == "sqlite":
+        return "sqlite"
+    return None
+
+
+def install_search_index(schema_editor):
+    connection = schema_editor.connection
+    backend = search_backend(connection)
+    quote = connection.ops.quote_name
+    if backend == "postgresql":
+        schema_editor.execute(
+            f"ALTER TABLE {quote(DOCUMENT_TABLE)} "
+            f"ADD COLUMN IF NOT EXISTS {quote(POSTGRES_SEARCH_COLUMN)} tsvector"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(POSTGRES_SEARCH_INDEX)} "
+            f"ON {quote(DOCUMENT_TABLE)} USING gin ({quote(POSTGRES_SEARCH_COLUMN)})"
+        )
+    elif backend == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {quote(SQLITE_FTS_TABLE)} "
+            "USING fts5(summary, main_text, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    else:
+        logger.warning(f"Full-text search is not supported on '{connection.vendor}'.")
+
+
+def uninstall_search_index(schema_editor):
+    connection = schema_editor.connection
+    backend = search_backend(connection)
+    quote = connection.ops.quote_name
+    if backend == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {quote(POSTGRES_SEARCH_INDEX)}")
+        schema_editor.execute(
+            f"ALTER TABLE {quote(DOCUMENT_TABLE)} DROP COLUMN IF EXISTS {quote(POSTGRES_SEARCH_COLUMN)}"
+        )
+    elif backend == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {quote(SQLITE_FTS_TABLE)}")
+
+
+def index_documents(schema_editor, rows):
+    rows = [(pk, summary or "", main_text or "") for pk, summary, main_text in rows]
+    if not rows:
+        return
+    connection = schema_editor.connection
+    backend = search_backend(connection)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if backend == "postgresql":
+            values = ", ".join(["(%s::bigint, %s::text, %s::text)"] * len(rows))
+            params = [value for row in rows for value in row]
+            cursor.execute(
+                f"UPDATE {quote(DOCUMENT_TABLE)} AS d "
+                f"SET {quote(POSTGRES_SEARCH_COLUMN)} = "
+                f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', v.summary), '{SUMMARY_WEIGHT}') || "
+                f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', v.main_text), '{MAIN_TEXT_WEIGHT}') "
+                f"FROM (VALUES {values}) AS v(id, summary, main_text) WHERE d.id = v.id",
+                params,
+            )
+        elif backend == "sqlite":
+            table = quote(SQLITE_FTS_TABLE)
+            cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {table} (rowid, summary, main_text) VALUES (%s, %s, %s)", rows
+            )
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor)
+
+    Document = apps.get_model("DMSApp", "Document")
+    using = schema_editor.connection.alias
+    rows = Document.objects.using(using).order_by("id").values_list("id", "summary", "main_text")
+    batch = []
+    for row in rows.iterator(chunk_size=BACKFILL_BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            index_documents(schema_editor, batch)
+            batch = []
+    index_documents(schema_editor, batch)
+
+
+def drop_search_index(apps, schema_editor):
+    uninstall_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DMSApp', '0004_document_uid'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
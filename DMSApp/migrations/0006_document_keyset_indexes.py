@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DMSApp', '0005_document_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['date', 'id'], name='document_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['process_number', 'id'], name='document_process_number_id_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-18 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DMSApp', '0006_document_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=1024, unique=True)),
+                ('size', models.BigIntegerField()),
+                ('mtime_ns', models.BigIntegerField()),
+                ('content_hash', models.CharField(max_length=64)),
+                ('process_number', models.CharField(blank=True, max_length=100, null=True)),
+                ('ingested_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-18 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DMSApp', '0007_ingestedfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['uid', 'version'], name='document_uid_version_idx'),
+        ),
+    ]
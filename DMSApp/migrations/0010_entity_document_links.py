@@ -0,0 +1,41 @@
+# Generated by Django 4.2.16 on 2026-10-18 04:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Split in three (schema, data, then constraints) so the data migration does
+# not run in the same transaction as ALTER TABLE on the tables it writes to,
+# which PostgreSQL rejects while deferred FK triggers are pending.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DMSApp', '0009_document_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='entity',
+            name='name',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name='entity',
+            name='document',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='entities', to='DMSApp.document'),
+        ),
+        migrations.AddField(
+            model_name='entity',
+            name='normalized_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='DocumentEntity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entity_links', to='DMSApp.document')),
+                ('entity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_links', to='DMSApp.entity')),
+            ],
+        ),
+    ]
@@ -0,0 +1,87 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def normalize_name(name):
+    # Frozen copy of DMSApp.models.normalize_name as of this migration.
+    if not name:
+        return ""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return re.sub(r"\s+", " ", name).strip().casefold()[:255]
+
+
+
+def link_entities(apps, schema_editor):
+    """
+    Merge entities that name the same case or law and turn the per-document
+    foreign key into link rows.
+    """
+    Entity = apps.get_model("DMSApp", "Entity")
+    DocumentEntity = apps.get_model("DMSApp", "DocumentEntity")
+    using = schema_editor.connection.alias
+
+    canonical_ids = {}
+    links = set()
+    duplicate_ids = []
+    normalized = []
+    rows = Entity.objects.using(using).order_by("id").values_list("id", "document_id", "name", "label")
+    for entity_id, document_id, name, label in rows.iterator(chunk_size=BATCH_SIZE):
+        normalized_name = normalize_name(name)
+        key = (normalized_name, label)
+        if normalized_name and key in canonical_ids:
+            duplicate_ids.append(entity_id)
+        else:
+            canonical_ids[key] = entity_id
+            normalized.append(Entity(id=entity_id, normalized_name=normalized_name))
+        canonical_id = canonical_ids[key] if normalized_name else entity_id
+        if document_id is not None:
+            links.add((document_id, canonical_id))
+
+    Entity.objects.using(using).bulk_update(normalized, ["normalized_name"], batch_size=BATCH_SIZE)
+    DocumentEntity.objects.using(using).bulk_create(
+        [DocumentEntity(document_id=document_id, entity_id=entity_id) for document_id, entity_id in sorted(links)],
+        batch_size=BATCH_SIZE,
+    )
+    for start in range(0, len(duplicate_ids), BATCH_SIZE):
+        Entity.objects.using(using).filter(id__in=duplicate_ids[start:start + BATCH_SIZE]).delete()
+
+
+def unlink_entities(apps, schema_editor):
+    # Entities cited by several documents keep only their first link.
+    Entity = apps.get_model("DMSApp", "Entity")
+    DocumentEntity = apps.get_model("DMSApp", "DocumentEntity")
+    using = schema_editor.connection.alias
+
+    first_links = {}
+    links = DocumentEntity.objects.using(using).order_by("id").values_list("entity_id", "document_id")
+    for entity_id, document_id in links.iterator(chunk_size=BATCH_SIZE):
+        first_links.setdefault(entity_id, document_id)
+    Entity.objects.using(using).bulk_update(
+        [Entity(id=entity_id, document_id=document_id) for entity_id, document_id in first_links.items()],
+        ["document_id"],
+        batch_size=BATCH_SIZE,
+    )
+    Entity.objects.using(using).filter(document__isnull=True).delete()
+
+
+
+class Migration(migrations.Migration):
+
+    # Renumbered from 0010_link_document_entities; databases that applied it under that
+    # name count this one as applied.
+    replaces = [
+        ('DMSApp', '0010_link_document_entities'),
+    ]
+
+    dependencies = [
+        ('DMSApp', '0010_entity_document_links'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_entities, unlink_entities),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Renumbered from 0010_entity_document_links_constraints; databases that applied it under that
+    # name count this one as applied.
+    replaces = [
+        ('DMSApp', '0010_entity_document_links_constraints'),
+    ]
+
+    dependencies = [
+        ('DMSApp', '0011_link_document_entities'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='entity',
+            name='document',
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='entities',
+            field=models.ManyToManyField(blank=True, related_name='documents', through='DMSApp.DocumentEntity', to='DMSApp.entity'),
+        ),
+        migrations.AddConstraint(
+            model_name='entity',
+            constraint=models.UniqueConstraint(condition=models.Q(('normalized_name', ''), _negated=True), fields=('normalized_name', 'label'), name='entity_normalized_name_label_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='documententity',
+            constraint=models.UniqueConstraint(fields=('document', 'entity'), name='document_entity_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='documententity',
+            index=models.Index(fields=['entity', 'document'], name='document_entity_reverse_idx'),
+        ),
+    ]
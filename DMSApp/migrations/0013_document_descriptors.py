@@ -0,0 +1,81 @@
+# Generated by Django 4.2.16 on 2026-10-18 02:52
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+# Frozen copies of DMSApp.models.normalize_name and
+# DMSApp.utils.parsing.split_descriptors as of this migration.
+def normalize_name(name):
+    if not name:
+        return ""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return re.sub(r"\s+", " ", name).strip().casefold()[:255]
+
+
+def split_descriptors(text):
+    terms = []
+    for term in re.split(r"[\n;]", (text or "").replace("\xa0", " ")):
+        term = " ".join(term.split())
+        if term and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def backfill_descriptor_terms(apps, schema_editor):
+    Document = apps.get_model("DMSApp", "Document")
+    Descriptor = apps.get_model("DMSApp", "Descriptor")
+    DocumentDescriptor = Document.descriptor_terms.through
+    using = schema_editor.connection.alias
+
+    descriptor_ids = {}
+    links = []
+    rows = Document.objects.using(using).exclude(descriptors=None).order_by("id").values_list("id", "descriptors")
+    for document_id, text in rows.iterator(chunk_size=BATCH_SIZE):
+        for term in split_descriptors(text):
+            name = normalize_name(term)
+            if not name:
+                continue
+            if name not in descriptor_ids:
+                descriptor_ids[name] = Descriptor.objects.using(using).create(name=term[:255], normalized_name=name).id
+            links.append(DocumentDescriptor(document_id=document_id, descriptor_id=descriptor_ids[name]))
+    DocumentDescriptor.objects.using(using).bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    # Renumbered from 0011_document_descriptors; databases that applied it under that
+    # name count this one as applied.
+    replaces = [
+        ('DMSApp', '0011_document_descriptors'),
+    ]
+
+    dependencies = [
+        ('DMSApp', '0012_entity_document_links_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Descriptor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('normalized_name', models.CharField(editable=False, max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['tribunal', 'id'], name='document_tribunal_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='descriptor_terms',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='documents', to='DMSApp.descriptor'),
+        ),
+        migrations.RunPython(backfill_descriptor_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2026-10-18 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Renumbered from 0012_document_updated_at_index; databases that applied it under that
+    # name count this one as applied.
+    replaces = [
+        ('DMSApp', '0012_document_updated_at_index'),
+    ]
+
+    dependencies = [
+        ('DMSApp', '0013_document_descriptors'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(fields=['updated_at', 'id'], name='document_updated_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.16 on 2026-10-18 03:04
+
+import DMSApp.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    # Renumbered from 0013_document_body; databases that applied it under that
+    # name count this one as applied.
+    replaces = [
+        ('DMSApp', '0013_document_body'),
+    ]
+
+    dependencies = [
+        ('DMSApp', '0014_document_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentBody',
+            fields=[
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='body', serialize=False, to='DMSApp.document')),
+                ('main_text', models.BinaryField(blank=True, null=True)),
+                ('decision', models.BinaryField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='decision',
+            field=DMSApp.models.BodyTextField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='main_text',
+            field=DMSApp.models.BodyTextField(blank=True, null=True),
+        ),
+    ]
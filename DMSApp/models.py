@@ -1,25 +1,294 @@
+import re
+import unicodedata
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
+from django.db.models.query_utils import DeferredAttribute
+from django.utils import timezone
 import uuid
 
+from .compression import compress_text, decompress_text, get_body_codec
+
+_deferred_version_bumps = ContextVar("deferred_version_bumps", default=None)
+
+# Marks a relation that is not in ``fields_cache``.
+NOT_LOADED = object()
+# Document bodies that can live compressed in DocumentBody.
+BODY_FIELDS = ("main_text", "decision")
+
+
+class DocumentQuerySet(models.QuerySet):
+    def bump_version(self):
+        """Mark the selected documents (or their entities) as changed."""
+        return self.update(version=models.F("version") + 1, updated_at=timezone.now())
+
+
+@contextmanager
+def defer_version_bumps(using="default"):
+    """
+    Collect the document ids that would get a version bump inside the block
+    and bump each of them once on exit. Yields the id set so bulk writers
+    can add documents they changed themselves.
+    """
+    if _deferred_version_bumps.get() is not None:
+        yield _deferred_version_bumps.get()
+        return
+    document_ids = set()
+    token = _deferred_version_bumps.set(document_ids)
+    try:
+        yield document_ids
+    finally:
+        _deferred_version_bumps.reset(token)
+    if document_ids:
+        Document.objects.using(using).filter(pk__in=document_ids).bump_version()
+
+
+def bump_document_version(document_id, using="default"):
+    bump_document_versions([document_id], using=using)
+
+
+def bump_document_versions(document_ids, using="default"):
+    document_ids = set(document_ids)
+    if not document_ids:
+        return
+    deferred = _deferred_version_bumps.get()
+    if deferred is not None:
+        deferred.update(document_ids)
+    else:
+        Document.objects.using(using).filter(pk__in=document_ids).bump_version()
+
+
+def normalize_name(name):
+    """Case-, accent- and whitespace-insensitive form used to match citations and descriptors."""
+    if not name:
+        return ""
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    return re.sub(r"\s+", " ", name).strip().casefold()[:255]
+
+
+class BodyTextAttribute(DeferredAttribute):
+    """
+    Falls back to the compressed copy in ``DocumentBody`` when the column is
+    empty, so readers never need to know where a body is stored, whether or
+    not compression is currently on. Select ``body`` with the document to
+    avoid the extra query; a missing row is cached like any other relation.
+    """
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        attname = self.field.attname
+        if (
+            value is None
+            and not instance._state.adding
+            and attname not in instance.__dict__.get("_assigned_bodies", ())
+        ):
+            try:
+                stored = getattr(instance.body, attname)
+            except ObjectDoesNotExist:
+                return None
+            if stored is not None:
+                value = instance.__dict__[attname] = decompress_text(stored)
+        return value
+
+    def __set__(self, instance, value):
+        # Values set on a loaded document are meant as written, even None.
+        if not instance._state.adding:
+            instance.__dict__.setdefault("_assigned_bodies", set()).add(self.field.attname)
+        instance.__dict__[self.field.attname] = value
+
+
+class BodyTextField(models.TextField):
+    """Text column left empty when ``DOCUMENT_BODY_CODEC`` moves its value to ``DocumentBody``."""
+
+    descriptor_class = BodyTextAttribute
+
+    def pre_save(self, model_instance, add):
+        if get_body_codec():
+            return None
+        return super().pre_save(model_instance, add)
+
+
+def store_document_bodies(bodies, using="default", codec=None):
+    """
+    Write ``{document_id: {field: text}}`` to ``DocumentBody`` compressed with
+    ``codec`` (default: the configured one). With compression off, drop the
+    stored copies of those fields instead, as the text is then written to the
+    document row.
+    """
+    groups = {}
+    for document_id, texts in bodies.items():
+        if texts:
+            groups.setdefault(tuple(sorted(texts)), []).append((document_id, texts))
+    codec = codec or get_body_codec()
+    for fields, items in groups.items():
+        if codec:
+            DocumentBody.objects.using(using).bulk_create(
+                [
+                    DocumentBody(
+                        document_id=document_id,
+                        **{field: compress_text(text, codec) for field, text in texts.items()},
+                    )
+                    for document_id, texts in items
+                ],
+                update_conflicts=True,
+                unique_fields=["document"],
+                update_fields=fields,
+            )
+        else:
+            DocumentBody.objects.using(using).filter(
+                document_id__in=[document_id for document_id, _ in items]
+            ).update(**{field: None for field in fields})
+
+
 class Document(models.Model):
     uid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     process_number = models.CharField(max_length=100, blank=True, null=True, unique=True)
     tribunal = models.CharField(max_length=255, blank=True, null=True)
     summary = models.TextField(blank=True, null=True)
-    decision = models.TextField(blank=True, null=True)
+    decision = BodyTextField(blank=True, null=True)
     date = models.DateField(blank=True, null=True)
     descriptors = models.TextField(blank=True, null=True)
-    main_text = models.TextField(blank=True, null=True)
+    main_text = BodyTextField(blank=True, null=True)
+    # Bumped whenever the document or one of its entities changes; ETags are
+    # derived from it so conditional requests never load the document body.
+    version = models.PositiveIntegerField(default=1, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    entities = models.ManyToManyField("Entity", through="DocumentEntity", related_name="documents", blank=True)
+    # Indexed split of ``descriptors``, kept in sync on save and by the seeder.
+    descriptor_terms = models.ManyToManyField("Descriptor", related_name="documents", blank=True, editable=False)
+
+    objects = DocumentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination walks these in (value, id) order.
+            models.Index(fields=["date", "id"], name="document_date_id_idx"),
+            models.Index(fields=["process_number", "id"], name="document_process_number_id_idx"),
+            # Covers the version lookup behind conditional GETs.
+            models.Index(fields=["uid", "version"], name="document_uid_version_idx"),
+            # Tribunal filter and facet; date ranges use document_date_id_idx.
+            models.Index(fields=["tribunal", "id"], name="document_tribunal_id_idx"),
+            # Incremental exports read rows changed since a watermark.
+            models.Index(fields=["updated_at", "id"], name="document_updated_at_id_idx"),
+        ]
 
     def __str__(self):
         return self.process_number
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if not self._state.adding and (update_fields is None or update_fields):
+            self.version = models.F("version") + 1
+            if update_fields is not None:
+                # auto_now only applies to fields being saved.
+                kwargs["update_fields"] = {*update_fields, "version", "updated_at"}
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        deferred = self.get_deferred_fields()
+        # A new plain document has no body row to look at.
+        texts = {} if adding and not get_body_codec() else {
+            field: getattr(self, field) for field in BODY_FIELDS
+            if field not in deferred and (update_fields is None or field in update_fields)
+        }
+        # Saving read empty body columns through BodyTextAttribute, which
+        # cached the body row, or None when there is none.
+        body = self._state.fields_cache.get("body", NOT_LOADED)
+        if isinstance(self.version, models.expressions.Combinable):
+            self.refresh_from_db(fields=["version"])
+        if not texts:
+            return
+        # With compression off the text went to the columns, and stale copies
+        # need clearing only where a row exists, or may exist: an empty
+        # column assigned on purpose is not looked up.
+        if get_body_codec() or body is not None and (body is not NOT_LOADED or None in texts.values()):
+            store_document_bodies({self.pk: texts}, using=self._state.db)
+            self._state.fields_cache.pop("body", None)
+        elif body is None:
+            # Still no row; spares the post_save receivers another lookup.
+            self._state.fields_cache["body"] = None
+
+
+class DocumentBody(models.Model):
+    """Compressed ``main_text`` and ``decision`` of a document, kept out of the document table."""
+
+    document = models.OneToOneField(Document, related_name="body", on_delete=models.CASCADE, primary_key=True)
+    main_text = models.BinaryField(blank=True, null=True)
+    decision = models.BinaryField(blank=True, null=True)
+
 
 class Entity(models.Model):
-    document = models.ForeignKey(Document, related_name="entities", on_delete=models.CASCADE)
-    name = models.CharField(max_length=255, blank=True, null=True, unique=True)
+    """A cited case or law, shared by every document that cites it."""
+
+    name = models.CharField(max_length=255, blank=True, null=True)
+    normalized_name = models.CharField(max_length=255, blank=True, default="", editable=False)
     label = models.CharField(max_length=50, choices=[("CASE", "Case"), ("LAW", "Law")])
     url = models.CharField(max_length=255, blank=True, null=True)
 
+    class Meta:
+        constraints = [
+            # One row per citation; also the index behind name/label lookups.
+            models.UniqueConstraint(
+                fields=["normalized_name", "label"],
+                condition=~models.Q(normalized_name=""),
+                name="entity_normalized_name_label_uniq",
+            ),
+        ]
+
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "normalized_name"}
+        super().save(*args, **kwargs)
+
+
+class Descriptor(models.Model):
+    """A descriptor term (subject heading) shared by the documents tagged with it."""
+
+    name = models.CharField(max_length=255)
+    normalized_name = models.CharField(max_length=255, unique=True, editable=False)
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        super().save(*args, **kwargs)
+
+
+class DocumentEntity(models.Model):
+    """Link between a document and an entity it cites."""
+
+    document = models.ForeignKey(Document, related_name="entity_links", on_delete=models.CASCADE)
+    entity = models.ForeignKey(Entity, related_name="document_links", on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["document", "entity"], name="document_entity_uniq"),
+        ]
+        indexes = [
+            # "Documents citing this entity" reads the index alone.
+            models.Index(fields=["entity", "document"], name="document_entity_reverse_idx"),
+        ]
+
+
+class IngestedFile(models.Model):
+    """Manifest of source files already loaded by the seeder."""
+
+    path = models.CharField(max_length=1024, unique=True)
+    size = models.BigIntegerField()
+    mtime_ns = models.BigIntegerField()
+    content_hash = models.CharField(max_length=64)
+    process_number = models.CharField(max_length=100, blank=True, null=True)
+    ingested_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.path
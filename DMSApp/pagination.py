@@ -0,0 +1,235 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+FALSE_VALUES = ("0", "false", "no", "off")
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+class DocumentPagination(PageNumberPagination):
+    """
+    Keyset (cursor) pagination over ``date``/``process_number`` with an ``id``
+    tiebreaker, so deep pages cost the same as the first one.
+
+    Clients that still send ``?page=`` get the classic page-number behaviour,
+    and so do orderings that have no usable keyset (e.g. search relevance).
+    ``?count=false`` skips the ``COUNT(*)`` query in either mode.
+    """
+
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+    keyset_fields = ("date", "process_number")
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.start_pagination(queryset, request)
+        if self.mode == "page":
+            return super().paginate_queryset(queryset, request, view)
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        if self.include_count:
+            self.count = queryset.count()
+        page_queryset, limit = self.get_page_queryset(queryset, request, page_size)
+        return self.set_page(list(page_queryset[:limit]), page_size)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, using the async ORM."""
+        self.start_pagination(queryset, request)
+        if self.mode == "page":
+            # Classic page numbers with a count, without Django's sync Paginator.
+            self.mode = "offset"
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        if self.include_count:
+            self.count = await queryset.acount()
+        page_queryset, limit = self.get_page_queryset(queryset, request, page_size)
+        return self.set_page([instance async for instance in page_queryset[:limit]], page_size)
+
+    def start_pagination(self, queryset, request):
+        self.request = request
+        self.include_count = (
+            request.query_params.get(self.count_query_param, "").lower() not in FALSE_VALUES
+        )
+        self.keyset = self.get_keyset_ordering(queryset)
+        if self.keyset is not None and self.page_query_param not in request.query_params:
+            self.mode = "keyset"
+        elif self.include_count:
+            self.mode = "page"
+        else:
+            self.mode = "offset"
+
+    def get_page_queryset(self, queryset, request, page_size):
+        """Return the lazy queryset for the requested page and how many rows to fetch."""
+        if self.mode == "keyset":
+            self.position = self.decode_cursor(request, queryset.model)
+            page_queryset, self.reverse = self.get_keyset_page_queryset(queryset, self.position, page_size)
+            return page_queryset, page_size + 1
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message)
+        offset = (self.page_number - 1) * page_size
+        return queryset[offset:], page_size + 1
+
+    def set_page(self, results, page_size):
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if self.mode == "keyset":
+            if self.reverse:
+                results.reverse()
+                self.has_next = True
+                self.has_previous = has_more
+            else:
+                self.has_next = has_more
+                self.has_previous = self.position is not None
+        else:
+            self.has_next = has_more
+            self.has_previous = self.page_number > 1
+        self.page = results
+        self.display_page_controls = False
+        return results
+
+    def get_paginated_response(self, data):
+        if self.mode == "page":
+            return super().get_paginated_response(data)
+        fields = []
+        if self.include_count:
+            fields.append(("count", self.count))
+        fields += [
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]
+        return Response(OrderedDict(fields))
+
+    def get_next_link(self):
+        if self.mode == "keyset":
+            if not self.has_next:
+                return None
+            return self.build_cursor_link(self.page[-1], reverse=False)
+        if self.mode == "offset":
+            if not self.has_next:
+                return None
+            url = self.request.build_absolute_uri()
+            return replace_query_param(url, self.page_query_param, self.page_number + 1)
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.mode == "keyset":
+            if not self.has_previous:
+                return None
+            return self.build_cursor_link(self.page[0], reverse=True)
+        if self.mode == "offset":
+            if self.page_number <= 1:
+                return None
+            url = self.request.build_absolute_uri()
+            if self.page_number == 2:
+                return remove_query_param(url, self.page_query_param)
+            return replace_query_param(url, self.page_query_param, self.page_number - 1)
+        return super().get_previous_link()
+
+    def get_keyset_ordering(self, queryset):
+        """Return ``(field, descending)`` if the queryset ordering supports keyset paging."""
+        ordering = list(queryset.query.order_by)
+        if not all(isinstance(term, str) for term in ordering):
+            return None
+        ordering = [term for term in ordering if term.lstrip("-") not in ("id", "pk")]
+        if len(ordering) != 1:
+            return None
+        field = ordering[0].lstrip("-")
+        if field not in self.keyset_fields:
+            return None
+        return field, ordering[0].startswith("-")
+
+    # Keyset mode
+
+    def get_keyset_page_queryset(self, queryset, position, page_size):
+        """
+        Build the (still lazy) queryset for the page that starts after or ends
+        before ``position``. Returns ``(queryset, reverse)``.
+        """
+        field, descending = self.keyset
+        reverse = bool(position and position["reverse"])
+        backwards = descending != reverse
+
+        nulls = {"nulls_first": True} if reverse else {"nulls_last": True}
+        if backwards:
+            ordering = [F(field).desc(**nulls), F("id").desc()]
+        else:
+            ordering = [F(field).asc(**nulls), F("id").asc()]
+        queryset = queryset.order_by(*ordering)
+
+        if position is not None:
+            queryset = queryset.filter(
+                self.get_keyset_filter(field, position["value"], position["id"], backwards, reverse)
+            )
+        return queryset, reverse
+
+    def get_keyset_filter(self, field, value, pk, backwards, reverse):
+        # NULLs always sort last in the forward direction, so they are reached
+        # after every non-NULL value and walked by id among themselves.
+        after = "lt" if backwards else "gt"
+        if value is None:
+            condition = Q(**{f"{field}__isnull": True, f"id__{after}": pk})
+            if reverse:
+                condition |= Q(**{f"{field}__isnull": False})
+            return condition
+        condition = Q(**{f"{field}__{after}": value}) | Q(**{field: value, f"id__{after}": pk})
+        if not reverse:
+            condition |= Q(**{f"{field}__isnull": True})
+        return condition
+
+    def build_cursor_link(self, instance, reverse):
+        field, _ = self.keyset
+        # Pages are model instances, or dicts on the .values() fast path.
+        if isinstance(instance, dict):
+            value, pk = instance[field], instance["id"]
+        else:
+            value, pk = getattr(instance, field), instance.pk
+        if value is not None:
+            value = value.isoformat() if hasattr(value, "isoformat") else str(value)
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(value, pk, reverse)
+        )
+
+    def encode_cursor(self, value, pk, reverse):
+        payload = json.dumps({"v": value, "id": pk, "r": int(reverse)}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        field, _ = self.keyset
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            value = payload["v"]
+            if value is not None:
+                if not isinstance(value, str):
+                    raise ValueError
+                value = model._meta.get_field(field).to_python(value)
+            return {"value": value, "id": int(payload["id"]), "reverse": bool(payload.get("r"))}
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class EntityPagination(DocumentPagination):
+    page_size = 50
+    max_page_size = 500
+    keyset_fields = ()
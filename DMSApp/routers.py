@@ -0,0 +1,173 @@
+"""
+Read-replica routing.
+
+``ReplicaRoutingMiddleware`` opens a ``RoutingState`` for each GET, HEAD or
+OPTIONS request, and only inside one does ``ReplicaRouter`` send reads of
+``REPLICA_MODELS`` to the aliases in ``DATABASE_REPLICAS``, round-robin,
+skipping replicas that failed to connect for ``REPLICA_RETRY_SECONDS``.
+The first write in a request pins its remaining reads to the primary, so
+they see that write, and so does an open transaction on the primary.
+Everything outside such a request (management commands, the seeder, unsafe
+methods) stays on the primary.
+"""
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# Document read traffic; everything else (sessions, users, the ingest
+# manifest) always reads from the primary.
+REPLICA_MODELS = {
+    "DMSApp.document",
+    "DMSApp.documentbody",
+    "DMSApp.documententity",
+    "DMSApp.document_descriptor_terms",
+    "DMSApp.descriptor",
+    "DMSApp.entity",
+}
+
+_routing_state = ContextVar("routing_state", default=None)
+
+
+class RoutingState:
+    # Mutated in place rather than re-set, so a pin made inside a
+    # sync_to_async thread is seen by the rest of the request.
+    def __init__(self, use_replicas):
+        self.use_replicas = use_replicas
+        self.pinned = False
+
+
+def replica_aliases():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+@contextmanager
+def _routed(state):
+    token = _routing_state.set(state)
+    try:
+        yield state
+    finally:
+        _routing_state.reset(token)
+
+
+def replica_reads(use_replicas=True):
+    """Route reads in the block like a safe-method request (or, with ``False``, to the primary)."""
+    return _routed(RoutingState(use_replicas))
+
+
+def use_primary():
+    """Keep every read in the block (or decorated function) on the primary."""
+    return replica_reads(use_replicas=False)
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self._turns = itertools.count()
+        self._down_until = {}
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if state is None or model._meta.label_lower not in REPLICA_MODELS:
+            return None
+        if not state.use_replicas or state.pinned or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return self.choose_replica()
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None:
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary through replication.
+        if db in replica_aliases():
+            return False
+        return None
+
+    def choose_replica(self):
+        """Return the next healthy replica in turn, or the primary if none is."""
+        replicas = replica_aliases()
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        start = next(self._turns)
+        for offset in range(len(replicas)):
+            alias = replicas[(start + offset) % len(replicas)]
+            if self.is_healthy(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def is_healthy(self, alias):
+        if self._down_until.get(alias, 0) > time.monotonic():
+            return False
+        try:
+            # A no-op on an open connection; otherwise it is opened here
+            # instead of by the first query.
+            connections[alias].ensure_connection()
+        except DatabaseError as e:
+            retry = getattr(settings, "REPLICA_RETRY_SECONDS", 30)
+            logger.warning(f"Replica {alias} is unavailable, reading from the primary for {retry}s: {e}")
+            self._down_until[alias] = time.monotonic() + retry
+            return False
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe-method requests read from replicas. Removed from the stack
+    when ``DATABASE_REPLICAS`` is empty.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(request.method in SAFE_METHODS) as state:
+            response = self.get_response(request)
+        return self.route_streaming(response, state)
+
+    async def __acall__(self, request):
+        with replica_reads(request.method in SAFE_METHODS) as state:
+            response = await self.get_response(request)
+        return self.route_streaming(response, state)
+
+    def route_streaming(self, response, state):
+        # Streamed bodies (e.g. exports) run their queries after this
+        # middleware has returned; route them like the rest of the request.
+        if response.streaming and not response.is_async:
+            response.streaming_content = _routed_chunks(response.streaming_content, state)
+        return response
+
+
+def _routed_chunks(chunks, state):
+    chunks = iter(chunks)
+    while True:
+        with _routed(state):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,151 @@
+import logging
+import re
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_TABLE = "DMSApp_document"
+POSTGRES_SEARCH_CONFIG = "portuguese"
+POSTGRES_SEARCH_COLUMN = "search_vector"
+POSTGRES_SEARCH_INDEX = "document_search_vector_gin"
+SQLITE_FTS_TABLE = "DMSApp_document_fts"
+
+# Summary hits outrank hits that only occur somewhere in the full ruling text.
+SUMMARY_WEIGHT = "A"
+MAIN_TEXT_WEIGHT = "B"
+
+
+def search_backend(connection):
+    if connection.vendor == "postgresql":
+        return "postgresql"
+    if connection.vendor == "sqlite":
+        return "sqlite"
+    return None
+
+
+def install_search_index(schema_editor):
+    connection = schema_editor.connection
+    backend = search_backend(connection)
+    quote = connection.ops.quote_name
+    if backend == "postgresql":
+        schema_editor.execute(
+            f"ALTER TABLE {quote(DOCUMENT_TABLE)} "
+            f"ADD COLUMN IF NOT EXISTS {quote(POSTGRES_SEARCH_COLUMN)} tsvector"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {quote(POSTGRES_SEARCH_INDEX)} "
+            f"ON {quote(DOCUMENT_TABLE)} USING gin ({quote(POSTGRES_SEARCH_COLUMN)})"
+        )
+    elif backend == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {quote(SQLITE_FTS_TABLE)} "
+            "USING fts5(summary, main_text, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    else:
+        logger.warning(f"Full-text search is not supported on '{connection.vendor}'.")
+
+
+def uninstall_search_index(schema_editor):
+    connection = schema_editor.connection
+    backend = search_backend(connection)
+    quote = connection.ops.quote_name
+    if backend == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {quote(POSTGRES_SEARCH_INDEX)}")
+        schema_editor.execute(
+            f"ALTER TABLE {quote(DOCUMENT_TABLE)} DROP COLUMN IF EXISTS {quote(POSTGRES_SEARCH_COLUMN)}"
+        )
+    elif backend == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {quote(SQLITE_FTS_TABLE)}")
+
+
+def index_documents(rows, using="default"):
+    """Write ``(id, summary, main_text)`` rows into the full-text index."""
+    rows = [(pk, summary or "", main_text or "") for pk, summary, main_text in rows]
+    if not rows:
+        return
+    connection = connections[using]
+    backend = search_backend(connection)
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if backend == "postgresql":
+            values = ", ".join(["(%s::bigint, %s::text, %s::text)"] * len(rows))
+            params = [value for row in rows for value in row]
+            cursor.execute(
+                f"UPDATE {quote(DOCUMENT_TABLE)} AS d "
+                f"SET {quote(POSTGRES_SEARCH_COLUMN)} = "
+                f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', v.summary), '{SUMMARY_WEIGHT}') || "
+                f"setweight(to_tsvector('{POSTGRES_SEARCH_CONFIG}', v.main_text), '{MAIN_TEXT_WEIGHT}') "
+                f"FROM (VALUES {values}) AS v(id, summary, main_text) WHERE d.id = v.id",
+                params,
+            )
+        elif backend == "sqlite":
+            table = quote(SQLITE_FTS_TABLE)
+            cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {table} (rowid, summary, main_text) VALUES (%s, %s, %s)", rows
+            )
+
+
+def remove_documents(ids, using="default"):
+    ids = list(ids)
+    if not ids:
+        return
+    connection = connections[using]
+    # On PostgreSQL the vector lives on the document row and goes away with it.
+    if search_backend(connection) == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {connection.ops.quote_name(SQLITE_FTS_TABLE)} WHERE rowid = %s",
+                [(pk,) for pk in ids],
+            )
+
+
+def _sqlite_match_expression(query):
+    # FTS5 has its own query syntax; quote every word so user input is never
+    # interpreted as operators, and require all of them to match.
+    terms = re.findall(r"\w+", query)
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def full_text_search(queryset, query):
+    """
+    Restrict ``queryset`` to documents matching ``query`` and annotate each one
+    with ``search_rank`` (higher is more relevant).
+
+    Returns ``None`` when the database has no full-text index so callers can
+    fall back to a plain ``icontains`` scan.
+    """
+    connection = connections[queryset.db]
+    backend = search_backend(connection)
+    quote = connection.ops.quote_name
+    document_id = f"{quote(DOCUMENT_TABLE)}.{quote('id')}"
+
+    if backend == "postgresql":
+        tsquery = f"websearch_to_tsquery('{POSTGRES_SEARCH_CONFIG}', %s)"
+        vector = f"{quote(DOCUMENT_TABLE)}.{quote(POSTGRES_SEARCH_COLUMN)}"
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT {quote('id')} FROM {quote(DOCUMENT_TABLE)} "
+                f"WHERE {quote(POSTGRES_SEARCH_COLUMN)} @@ {tsquery}",
+                [query],
+            )
+        ).annotate(search_rank=RawSQL(f"ts_rank_cd({vector}, {tsquery})", [query]))
+
+    if backend == "sqlite":
+        match = _sqlite_match_expression(query)
+        if not match:
+            return queryset
+        fts = quote(SQLITE_FTS_TABLE)
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", [match])
+        ).annotate(
+            search_rank=RawSQL(
+                f"(SELECT -bm25({fts}, 2.0, 1.0) FROM {fts} "
+                f"WHERE {fts} MATCH %s AND rowid = {document_id})",
+                [match],
+            )
+        )
+
+    return None
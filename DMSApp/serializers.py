@@ -3,15 +3,83 @@ from rest_framework import serializers
 from .models import Document, Entity
 
 
+def requested_field_names(request, param):
+    """Parse a comma-separated field list such as ``?fields=uid,date``."""
+    if request is None:
+        return set()
+    value = request.query_params.get(param, "")
+    return {name.strip() for name in value.split(",") if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Lets clients trim the representation with ``?fields=a,b`` (keep only
+    these) and ``?exclude=c`` (drop these). Unknown names are ignored.
+    """
+
+    fields_query_param = "fields"
+    exclude_query_param = "exclude"
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        requested = requested_field_names(request, self.fields_query_param)
+        excluded = requested_field_names(request, self.exclude_query_param)
+        if requested and requested & fields.keys():
+            fields = {name: field for name, field in fields.items() if name in requested}
+        for name in excluded:
+            fields.pop(name, None)
+        return fields
+
+
 class EntitySerializer(serializers.ModelSerializer):
     class Meta:
         model = Entity
-        fields = "__all__"
+        # normalized_name is a lookup key, not part of the API.
+        fields = ["id", "name", "label", "url"]
 
 
-class DocumentSerializer(serializers.ModelSerializer):
+class DocumentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     entities = EntitySerializer(many=True, read_only=True)
+    descriptor_terms = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name")
 
     class Meta:
         model = Document
         fields = "__all__"
+
+
+class DocumentListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Compact list representation: enough to render a result row, no bodies or entities."""
+
+    class Meta:
+        model = Document
+        fields = ("id", "uid", "process_number", "tribunal", "date", "descriptors", "version", "updated_at")
+        read_only_fields = fields
+
+
+class CoCitedDocumentSerializer(DocumentListSerializer):
+    shared_entities = serializers.IntegerField(read_only=True)
+
+    class Meta(DocumentListSerializer.Meta):
+        fields = DocumentListSerializer.Meta.fields + ("shared_entities",)
+        read_only_fields = fields
+
+
+class BulkEntitySerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    label = serializers.ChoiceField(choices=Entity._meta.get_field("label").choices)
+    url = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+
+
+class BulkDocumentSerializer(serializers.ModelSerializer):
+    """One item of a bulk upsert; ``process_number`` is the idempotency key."""
+
+    entities = BulkEntitySerializer(many=True, required=False)
+
+    class Meta:
+        model = Document
+        fields = ("process_number", "tribunal", "summary", "decision", "date", "descriptors", "main_text", "entities")
+        extra_kwargs = {
+            # Existing process numbers are updated, not rejected.
+            "process_number": {"required": True, "allow_null": False, "allow_blank": False, "validators": []},
+        }
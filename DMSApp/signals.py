@@ -0,0 +1,67 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_document_lists
+from .descriptors import index_descriptors
+from .models import Document, DocumentEntity, Entity, bump_document_versions
+from .search import index_documents, remove_documents
+
+
+def _deleted_with_document(origin):
+    return isinstance(origin, Document) or (isinstance(origin, QuerySet) and origin.model is Document)
+
+
+@receiver(post_save, sender=Document)
+def index_saved_document(sender, instance, using, **kwargs):
+    index_documents([(instance.pk, instance.summary, instance.main_text)], using=using)
+    invalidate_document_lists(using=using)
+
+
+@receiver(post_save, sender=Document)
+def index_saved_descriptors(sender, instance, using, update_fields=None, **kwargs):
+    if update_fields is not None and "descriptors" not in update_fields:
+        return
+    index_descriptors([(instance.pk, instance.descriptors)], using=using)
+
+
+@receiver(post_delete, sender=Document)
+def unindex_deleted_document(sender, instance, using, **kwargs):
+    remove_documents([instance.pk], using=using)
+    invalidate_document_lists(using=using)
+
+
+@receiver(post_save, sender=Entity)
+def bump_version_on_entity_save(sender, instance, using, created, **kwargs):
+    if created:
+        return
+    bump_document_versions(
+        DocumentEntity.objects.using(using).filter(entity=instance).values_list("document_id", flat=True),
+        using=using,
+    )
+    invalidate_document_lists(using=using)
+
+
+@receiver(post_save, sender=DocumentEntity)
+def bump_version_on_link_save(sender, instance, using, **kwargs):
+    bump_document_versions([instance.document_id], using=using)
+    invalidate_document_lists(using=using)
+
+
+@receiver(post_delete, sender=DocumentEntity)
+def bump_version_on_link_delete(sender, instance, using, origin=None, **kwargs):
+    # Links cascading away with their document need no bump.
+    if _deleted_with_document(origin):
+        return
+    bump_document_versions([instance.document_id], using=using)
+    invalidate_document_lists(using=using)
+
+
+@receiver(m2m_changed, sender=Document.entities.through)
+def bump_version_on_entities_added(sender, instance, action, reverse, pk_set, using, **kwargs):
+    # add() bulk-inserts links without post_save; remove() and clear() delete
+    # them through the queryset, which is handled above.
+    if action != "post_add" or not pk_set:
+        return
+    bump_document_versions(pk_set if reverse else [instance.pk], using=using)
+    invalidate_document_lists(using=using)
@@ -1,16 +1,38 @@
+import csv
+import datetime
+import gzip
+import io
+import json
+import warnings
+
 import pytest
+from django.core.cache import cache
+from django.core.management import call_command
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
+from django.http import HttpResponse, StreamingHttpResponse
+from DMSApp import compression_middleware
+from DMSApp.cache import get_list_generation
+from DMSApp.compression_middleware import available_encodings, negotiate_encoding
+from DMSApp.etag_middleware import ETagMiddleware
+from DMSApp.export import parse_since
 from DMSApp.models import Document, Entity
+from DMSApp.renderers import ORJSONRenderer
 from DMSApp.serializers import DocumentSerializer
 import uuid
+from django.db import IntegrityError, transaction
+from django.db.models import F
 
 @pytest.mark.django_db
 class TestDocumentViewSet:
 
     @pytest.fixture(autouse=True)
     def setup(self, db):
+        cache.clear()
         self.client = APIClient()
         
 
@@ -37,15 +59,13 @@ class TestDocumentViewSet:
         )
 
 
-        self.entity1 = Entity.objects.create(
-            document=self.document1,
+        self.entity1 = self.document1.entities.create(
             name="Entity1",
             label="Label1",
             url="http://example.com/entity1"
         )
         
-        self.entity2 = Entity.objects.create(
-            document=self.document2,
+        self.entity2 = self.document2.entities.create(
             name="Entity2",
             label="Label2",
             url="http://example.com/entity2"
@@ -110,8 +130,24 @@ class TestDocumentViewSet:
     def test_entities_action(self):
         response = self.client.get(self.entities_url(self.document1.uid))
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 1
-        assert response.data[0]["name"] == "Entity1"
+        assert response.data["count"] == 1
+        assert response.data["results"][0]["name"] == "Entity1"
+        assert set(response.data["results"][0]) == {"id", "name", "label", "url"}
+
+    def test_entities_action_is_paginated_and_filtered(self, django_assert_num_queries):
+        for index in range(3):
+            self.document1.entities.create(name=f"Law {index}", label="LAW", url="")
+
+        # Version lookup, count and page; never the document row.
+        with django_assert_num_queries(3) as captured:
+            response = self.client.get(f"{self.entities_url(self.document1.uid)}?label=law&page_size=2")
+        assert all("main_text" not in query["sql"] for query in captured.captured_queries)
+        assert response.data["count"] == 3
+        assert [entity["name"] for entity in response.data["results"]] == ["Law 0", "Law 1"]
+        assert response.data["next"] is not None
+
+        response = self.client.get(f"{self.entities_url(self.document1.uid)}?label=CASE")
+        assert [entity["name"] for entity in response.data["results"]] == []
 
     def test_delete_nonexistent_document(self):
         non_existent_uid = str(uuid.uuid4())
@@ -145,4 +181,631 @@ class TestDocumentViewSet:
             self.detail_url(self.document1.uid),
             HTTP_IF_NONE_MATCH=etag
         )
-        assert response.status_code == status.HTTP_304_NOT_MODIFIED
\ No newline at end of file
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_search_documents_full_text(self):
+        Document.objects.create(
+            process_number="55555",
+            tribunal="Supreme Court",
+            summary="Recurso sobre responsabilidade civil",
+            main_text="O tribunal julgou procedente a ação de indemnização.",
+        )
+
+        response = self.client.get(f"{self.list_url}?search=indemnizacao")
+        assert response.status_code == status.HTTP_200_OK
+        assert [doc["process_number"] for doc in response.data["results"]] == ["55555"]
+
+    def test_search_documents_ranks_summary_matches_first(self):
+        Document.objects.create(
+            process_number="55555",
+            summary="Outro assunto",
+            main_text="Menciona prescrição uma vez.",
+        )
+        Document.objects.create(
+            process_number="66666",
+            summary="Prescrição do direito",
+            main_text="Texto sobre prescrição.",
+        )
+
+        response = self.client.get(f"{self.list_url}?search=prescrição")
+        assert response.status_code == status.HTTP_200_OK
+        assert [doc["process_number"] for doc in response.data["results"]] == ["66666", "55555"]
+
+    def test_search_index_follows_updates_and_deletes(self):
+        self.client.put(
+            self.detail_url(self.document1.uid),
+            {**self.test_payload, "process_number": "12345", "main_text": "Texto revisto"},
+            format="json",
+        )
+        response = self.client.get(f"{self.list_url}?search=revisto")
+        assert [doc["process_number"] for doc in response.data["results"]] == ["12345"]
+
+        self.client.delete(self.detail_url(self.document1.uid))
+        response = self.client.get(f"{self.list_url}?search=revisto")
+        assert response.data["results"] == []
+
+    def test_search_with_operator_characters(self):
+        response = self.client.get(f'{self.list_url}?search="Main" (text*')
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.data["results"]) == 2
+
+    def _create_dated_documents(self):
+        for index, day in enumerate(["2023-11-20", "2023-11-20", "2023-11-22", None, "2023-11-19"]):
+            Document.objects.create(process_number=f"K{index}", date=day, main_text="Keyset")
+
+    def _walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(doc["process_number"] for doc in response.data["results"])
+            url = response.data["next"]
+        return seen
+
+    def test_list_documents_keyset_pagination(self):
+        self._create_dated_documents()
+        expected = list(
+            Document.objects.order_by(F("date").asc(nulls_last=True), "id").values_list("process_number", flat=True)
+        )
+
+        assert self._walk(f"{self.list_url}?ordering=date&page_size=2") == expected
+
+    def test_list_documents_keyset_pagination_descending(self):
+        self._create_dated_documents()
+        expected = list(
+            Document.objects.order_by(F("process_number").desc(nulls_last=True), "-id").values_list("process_number", flat=True)
+        )
+
+        assert self._walk(f"{self.list_url}?ordering=-process_number&page_size=3") == expected
+
+    def test_list_documents_keyset_previous_link(self):
+        self._create_dated_documents()
+        first = self.client.get(f"{self.list_url}?ordering=date&page_size=3")
+        second = self.client.get(first.data["next"])
+        assert second.data["previous"] is not None
+
+        back = self.client.get(second.data["previous"])
+        assert [doc["uid"] for doc in back.data["results"]] == [doc["uid"] for doc in first.data["results"]]
+        assert back.data["previous"] is None
+
+    def test_list_documents_without_count(self):
+        response = self.client.get(f"{self.list_url}?count=false&page_size=1")
+        assert response.status_code == status.HTTP_200_OK
+        assert "count" not in response.data
+        assert response.data["next"] is not None
+
+        response = self.client.get(f"{self.list_url}?page=2&count=false&page_size=1")
+        assert "count" not in response.data
+        assert response.data["next"] is None
+        assert len(response.data["results"]) == 1
+
+    def test_list_documents_legacy_page_param(self):
+        response = self.client.get(f"{self.list_url}?page=2&page_size=1")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 2
+        assert response.data["results"][0]["process_number"] == "67890"
+
+    def test_list_documents_invalid_cursor(self):
+        response = self.client.get(f"{self.list_url}?cursor=not-a-cursor")
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_conditional_get_answered_from_version_column(self, django_assert_num_queries):
+        etag = self.client.get(self.detail_url(self.document1.uid))["ETag"]
+
+        with django_assert_num_queries(1):
+            response = self.client.get(self.detail_url(self.document1.uid), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == etag
+
+    def test_etag_changes_when_document_changes(self):
+        etag = self.client.get(self.detail_url(self.document1.uid))["ETag"]
+
+        self.client.patch(self.detail_url(self.document1.uid), {"summary": "Changed"}, format="json")
+
+        response = self.client.get(self.detail_url(self.document1.uid), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+        assert response.data["summary"] == "Changed"
+
+    def test_etag_changes_when_entities_change(self):
+        etag = self.client.get(self.detail_url(self.document1.uid))["ETag"]
+        self.document1.entities.create(name="Entity3", label="LAW")
+
+        response = self.client.get(self.detail_url(self.document1.uid), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+        new_etag = response["ETag"]
+
+        self.entity1.delete()
+        response = self.client.get(self.detail_url(self.document1.uid), HTTP_IF_NONE_MATCH=new_etag)
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_deleting_document_does_not_bump_per_entity(self, django_assert_max_num_queries):
+        for index in range(10):
+            self.document1.entities.create(name=f"Cited {index}", label="LAW")
+
+        with django_assert_max_num_queries(8):
+            self.document1.delete()
+
+    def test_conditional_get_with_etag_list(self):
+        etag = self.client.get(self.detail_url(self.document1.uid))["ETag"]
+
+        response = self.client.get(
+            self.detail_url(self.document1.uid), HTTP_IF_NONE_MATCH=f'"stale", W/{etag}'
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_conditional_get_with_if_modified_since(self):
+        response = self.client.get(self.detail_url(self.document1.uid))
+        last_modified = response["Last-Modified"]
+
+        response = self.client.get(self.detail_url(self.document1.uid), HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+        response = self.client.get(
+            self.detail_url(self.document1.uid), HTTP_IF_MODIFIED_SINCE="Mon, 01 Jan 2001 00:00:00 GMT"
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    def test_partial_save_moves_last_modified(self):
+        yesterday = timezone.now() - datetime.timedelta(days=1)
+        Document.objects.filter(id=self.document1.id).update(updated_at=yesterday)
+        last_modified = self.client.get(self.detail_url(self.document1.uid))["Last-Modified"]
+
+        document = Document.objects.get(id=self.document1.id)
+        document.summary = "Changed"
+        document.save(update_fields=["summary"])
+
+        assert Document.objects.get(id=self.document1.id).updated_at > yesterday
+        response = self.client.get(self.detail_url(self.document1.uid), HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["summary"] == "Changed"
+
+    def test_list_gets_weak_etag(self):
+        response = self.client.get(self.list_url)
+        etag = response["ETag"]
+        assert etag.startswith('W/"')
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_non_api_and_streaming_responses_are_not_hashed(self, rf):
+        middleware = ETagMiddleware(lambda request: HttpResponse(b"admin page"))
+        assert not middleware(rf.get("/admin/")).has_header("ETag")
+
+        middleware = ETagMiddleware(lambda request: StreamingHttpResponse(iter([b"chunk"])))
+        response = middleware(rf.get("/api/documents/"))
+        assert not response.has_header("ETag")
+        assert b"".join(response.streaming_content) == b"chunk"
+
+    def test_detail_is_gzipped_with_weak_etag(self):
+        Document.objects.filter(id=self.document1.id).update(main_text="Texto integral do acórdão. " * 50)
+        url = self.detail_url(self.document1.uid)
+        plain = self.client.get(url)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        assert response["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response["Vary"]
+        assert json.loads(gzip.decompress(response.content)) == plain.json()
+        assert int(response["Content-Length"]) == len(response.content) < len(plain.content)
+        assert response["ETag"] == f"W/{plain['ETag']}"
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response["ETag"] == f"W/{plain['ETag']}"
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=plain["ETag"]).status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_compressed_detail_is_served_from_cache(self, monkeypatch):
+        Document.objects.filter(id=self.document1.id).update(main_text="Texto integral do acórdão. " * 50)
+        url = self.detail_url(self.document1.uid)
+        calls = []
+        encode_body = compression_middleware.encode_body
+        monkeypatch.setattr(
+            compression_middleware, "encode_body", lambda *args: calls.append(args) or encode_body(*args)
+        )
+
+        first = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        second = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        assert second.content == first.content
+        assert len(calls) == 1
+
+        self.client.patch(url, {"summary": "Changed"}, format="json")
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        assert json.loads(gzip.decompress(response.content))["summary"] == "Changed"
+        assert len(calls) == 2
+
+    def test_compression_negotiation(self):
+        assert negotiate_encoding("gzip;q=0.5, identity") == "gzip"
+        assert negotiate_encoding("gzip;q=0") is None
+        assert negotiate_encoding("*") == available_encodings()[0]
+        assert negotiate_encoding("") is None
+        assert negotiate_encoding("deflate") is None
+
+        response = self.client.get(self.list_url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+        assert not response.has_header("Content-Encoding")
+        assert response["ETag"].startswith('W/"')
+
+    def test_list_documents_uses_compact_representation(self, django_assert_num_queries):
+        # COUNT + page, no entities prefetch.
+        with django_assert_num_queries(2):
+            response = self.client.get(self.list_url)
+        assert response.status_code == status.HTTP_200_OK
+        document = response.data["results"][0]
+        assert document["process_number"] == "12345"
+        assert "main_text" not in document
+        assert "entities" not in document
+
+    def test_list_documents_with_sparse_fields(self):
+        response = self.client.get(f"{self.list_url}?fields=uid,summary,entities")
+        assert response.status_code == status.HTTP_200_OK
+        document = response.data["results"][0]
+        assert set(document) == {"uid", "summary", "entities"}
+        assert document["entities"][0]["name"] == "Entity1"
+
+    def test_sparse_fields_defer_unused_columns(self, django_assert_num_queries):
+        with django_assert_num_queries(2) as captured:
+            response = self.client.get(f"{self.list_url}?fields=uid,tribunal")
+        assert set(response.data["results"][0]) == {"uid", "tribunal"}
+        assert "main_text" not in captured.captured_queries[-1]["sql"]
+
+    def test_retrieve_document_with_exclude(self):
+        response = self.client.get(f"{self.detail_url(self.document1.uid)}?exclude=main_text,entities")
+        assert response.status_code == status.HTTP_200_OK
+        assert "main_text" not in response.data
+        assert "entities" not in response.data
+        assert response.data["summary"] == "Summary 1"
+
+    def test_sparse_fields_keep_keyset_cursor(self):
+        response = self.client.get(f"{self.list_url}?fields=uid&page_size=1&ordering=date")
+        assert set(response.data["results"][0]) == {"uid"}
+        next_response = self.client.get(response.data["next"])
+        assert next_response.data["results"][0]["uid"] == str(self.document2.uid)
+
+    def test_sparse_fields_vary_etag(self):
+        full = self.client.get(self.detail_url(self.document1.uid))
+        sparse = self.client.get(f"{self.detail_url(self.document1.uid)}?fields=uid")
+        assert full["ETag"] != sparse["ETag"]
+
+    def test_retrieve_document_served_from_cache(self, django_assert_num_queries):
+        self.client.get(self.detail_url(self.document1.uid))
+        # Only the version lookup; no document or entity query.
+        with django_assert_num_queries(1):
+            response = self.client.get(self.detail_url(self.document1.uid))
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["entities"][0]["name"] == "Entity1"
+        assert response.has_header("ETag")
+
+    def test_cached_detail_follows_updates(self):
+        self.client.get(self.detail_url(self.document1.uid))
+        self.client.put(
+            self.detail_url(self.document1.uid),
+            {**self.test_payload, "process_number": "12345", "summary": "Revised"},
+            format="json",
+        )
+        response = self.client.get(self.detail_url(self.document1.uid))
+        assert response.data["summary"] == "Revised"
+
+        self.document1.entities.create(name="Entity3", label="Label3", url="")
+        response = self.client.get(self.entities_url(self.document1.uid))
+        assert {entity["name"] for entity in response.data["results"]} == {"Entity1", "Entity3"}
+
+    def test_list_served_from_cache(self, django_assert_num_queries):
+        first = self.client.get(self.list_url)
+        with django_assert_num_queries(0):
+            response = self.client.get(self.list_url)
+        assert response.data == first.data
+
+    def test_list_cache_invalidated_by_writes(self):
+        self.client.get(self.list_url)
+        self.client.post(self.list_url, self.test_payload, format="json")
+        assert len(self.client.get(self.list_url).data["results"]) == 3
+
+        self.client.delete(self.detail_url(self.document1.uid))
+        assert len(self.client.get(self.list_url).data["results"]) == 2
+
+    def test_list_cache_invalidated_after_commit(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks() as callbacks:
+            self.client.post(self.list_url, self.test_payload, format="json")
+        # A page cached between the write and the commit is dropped on commit.
+        generation = get_list_generation()
+        for callback in callbacks:
+            callback()
+        assert get_list_generation() != generation
+
+    def test_entities_are_shared_between_documents(self):
+        law = Entity.objects.create(name="Código Civil, artigo 483.º", label="LAW")
+        self.document1.entities.add(law)
+        self.document2.entities.add(law)
+
+        response = self.client.get(reverse("entity-list"), {"name": "codigo  civil, ARTIGO 483.º", "label": "law"})
+        assert [entity["id"] for entity in response.data["results"]] == [law.id]
+
+        response = self.client.get(reverse("entity-documents", args=[law.id]))
+        assert response.status_code == status.HTTP_200_OK
+        assert [doc["process_number"] for doc in response.data["results"]] == ["12345", "67890"]
+
+    def test_entity_names_are_unique_per_label(self):
+        Entity.objects.create(name="Lei 1/2020", label="LAW")
+        Entity.objects.create(name="Lei 1/2020", label="CASE")
+        with pytest.raises(IntegrityError), transaction.atomic():
+            Entity.objects.create(name="lei 1/2020 ", label="LAW")
+
+    def test_co_citations(self):
+        shared = [Entity.objects.create(name=f"Lei {index}", label="LAW") for index in range(2)]
+        self.document1.entities.add(*shared)
+        self.document2.entities.add(shared[0])
+        document3 = Document.objects.create(process_number="33333")
+        document3.entities.add(*shared)
+        Document.objects.create(process_number="44444").entities.add(self.entity2)
+
+        response = self.client.get(reverse("document-co-citations", args=[self.document1.uid]))
+        assert response.status_code == status.HTTP_200_OK
+        assert [(doc["process_number"], doc["shared_entities"]) for doc in response.data["results"]] == [
+            ("33333", 2),
+            ("67890", 1),
+        ]
+
+        response = self.client.get(reverse("document-co-citations", args=[uuid.uuid4()]))
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_citing_documents_follow_link_changes(self):
+        url = reverse("entity-documents", args=[self.entity1.id])
+        assert len(self.client.get(url).data["results"]) == 1
+
+        etag = self.client.get(self.detail_url(self.document2.uid))["ETag"]
+        self.document2.entities.add(self.entity1)
+        assert len(self.client.get(url).data["results"]) == 2
+        response = self.client.get(self.detail_url(self.document2.uid), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_200_OK
+
+        self.document2.entities.remove(self.entity1)
+        assert len(self.client.get(url).data["results"]) == 1
+
+    def _create_faceted_documents(self):
+        Document.objects.create(
+            process_number="70001", tribunal="High Court", date="2022-05-01", descriptors="Prescrição; Dolo"
+        )
+        Document.objects.create(
+            process_number="70002", tribunal="Supreme Court", date="2023-12-01", descriptors="PRESCRIÇÃO"
+        )
+
+    def test_descriptors_are_split_into_terms(self):
+        self.client.patch(self.detail_url(self.document1.uid), {"descriptors": "Dolo; Culpa\nDolo"}, format="json")
+        response = self.client.get(self.detail_url(self.document1.uid))
+        assert sorted(response.data["descriptor_terms"]) == ["Culpa", "Dolo"]
+
+    def test_filter_by_tribunal_and_date_range(self):
+        self._create_faceted_documents()
+
+        response = self.client.get(
+            self.list_url, {"tribunal": ["High Court", "Supreme Court"], "date_from": "2023-01-01"}
+        )
+        assert [doc["process_number"] for doc in response.data["results"]] == ["12345", "67890", "70002"]
+
+        response = self.client.get(self.list_url, {"tribunal": "High Court", "date_to": "2023-11-20"})
+        assert [doc["process_number"] for doc in response.data["results"]] == ["70001"]
+
+        response = self.client.get(self.list_url, {"date_from": "20-11-2023"})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "date_from" in response.data
+
+    def test_filter_by_descriptors(self):
+        self._create_faceted_documents()
+
+        response = self.client.get(self.list_url, {"descriptor": "prescricao"})
+        assert [doc["process_number"] for doc in response.data["results"]] == ["70001", "70002"]
+
+        response = self.client.get(self.list_url, {"descriptor": ["prescrição", "dolo"]})
+        assert [doc["process_number"] for doc in response.data["results"]] == ["70001"]
+
+    def test_facet_counts_are_opt_in(self):
+        self._create_faceted_documents()
+        assert "facets" not in self.client.get(self.list_url).data
+
+        response = self.client.get(self.list_url, {"facets": "true", "date_from": "2023-01-01"})
+        facets = response.data["facets"]
+        assert facets["tribunal"] == [
+            {"value": "Supreme Court", "count": 2},
+            {"value": "High Court", "count": 1},
+        ]
+        assert {"value": "Prescrição", "count": 1} in facets["descriptors"]
+        assert facets["year"] == [{"value": 2023, "count": 3}]
+
+    def _read_export(self, response):
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        return b"".join(response.streaming_content)
+
+    def test_export_ndjson_streams_every_document(self):
+        response = self.client.get(reverse("document-export"))
+        lines = self._read_export(response).decode("utf-8").splitlines()
+        rows = [json.loads(line) for line in lines]
+        assert response["Content-Type"] == "application/x-ndjson"
+        assert [row["process_number"] for row in rows] == ["12345", "67890"]
+        assert rows[0]["uid"] == str(self.document1.uid)
+        assert rows[0]["main_text"] == "Main text 1"
+        assert rows[0]["entities"] == [{"name": "Entity1", "label": "Label1", "url": "http://example.com/entity1"}]
+
+    def test_export_csv_with_selected_fields(self):
+        response = self.client.get(
+            reverse("document-export"), {"output": "csv", "fields": "process_number,entities"}
+        )
+        rows = list(csv.reader(io.StringIO(self._read_export(response).decode("utf-8"))))
+        assert rows[0] == ["process_number", "entities"]
+        assert rows[1][0] == "12345"
+        assert json.loads(rows[1][1])[0]["name"] == "Entity1"
+
+    def test_export_gzip_and_since(self):
+        started_at = self.client.get(reverse("document-export"))["X-Export-Started-At"]
+        self.client.patch(self.detail_url(self.document2.uid), {"summary": "Changed"}, format="json")
+
+        response = self.client.get(
+            reverse("document-export"), {"since": started_at}, HTTP_ACCEPT_ENCODING="gzip, deflate"
+        )
+        assert response["Content-Encoding"] == "gzip"
+        rows = [json.loads(line) for line in gzip.decompress(self._read_export(response)).splitlines()]
+        assert [row["summary"] for row in rows] == ["Changed"]
+
+    @pytest.mark.parametrize("use_tz", [False, True])
+    def test_export_since_follows_use_tz(self, settings, use_tz):
+        settings.USE_TZ = use_tz
+        assert timezone.is_aware(parse_since("2020-01-01")) is use_tz
+        assert timezone.is_aware(parse_since("2020-01-01T10:00:00+01:00")) is use_tz
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", RuntimeWarning)
+            response = self.client.get(reverse("document-export"), {"since": "2020-01-01"})
+            assert len(self._read_export(response).splitlines()) == 2
+
+    def test_export_negotiates_encoding(self):
+        response = self.client.get(reverse("document-export"), HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        assert not response.has_header("Content-Encoding")
+        assert len(self._read_export(response).splitlines()) == 2
+
+        encoding = available_encodings()[0]
+        response = self.client.get(reverse("document-export"), HTTP_ACCEPT_ENCODING="gzip;q=0.5, br")
+        assert response["Content-Encoding"] == encoding
+        # Brotli when installed, and it is then preferred over gzip.
+        decompress = compression_middleware.brotli.decompress if encoding == "br" else gzip.decompress
+        assert len(decompress(self._read_export(response)).splitlines()) == 2
+
+    def test_export_chunks_entities_queries(self, django_assert_num_queries):
+        for index in range(5):
+            Document.objects.create(process_number=f"9000{index}").entities.add(self.entity1)
+        # One document query and one entity prefetch per chunk.
+        with django_assert_num_queries(2):
+            body = self._read_export(self.client.get(reverse("document-export")))
+        assert len(body.splitlines()) == 7
+
+    def test_export_rejects_bad_parameters(self):
+        assert self.client.get(reverse("document-export"), {"output": "xml"}).status_code == 400
+        assert self.client.get(reverse("document-export"), {"since": "yesterday"}).status_code == 400
+
+    def test_bulk_upsert_creates_and_updates(self):
+        Entity.objects.filter(id__in=[self.entity1.id, self.entity2.id]).update(label="CASE")
+        payload = [
+            {"process_number": "12345", "summary": "Updated 1", "entities": [{"name": "entity2", "label": "CASE"}]},
+            {
+                "process_number": "P-1",
+                "tribunal": "High Court",
+                "descriptors": "Contrato; Renda",
+                "entities": [{"name": "Entity1", "label": "CASE"}, {"name": "Lei 1", "label": "LAW"}],
+            },
+            {"process_number": "67890", "summary": "Updated 2"},
+            {"process_number": "", "summary": "No key"},
+            {"process_number": "P-1", "summary": "Duplicate"},
+        ]
+        version = Document.objects.get(id=self.document1.id).version
+        response = self.client.post(reverse("document-bulk-upsert"), payload, format="json")
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()["results"]
+        assert [result["status"] for result in results] == ["updated", "created", "updated", "invalid", "invalid"]
+        assert results[0]["uid"] == str(self.document1.uid)
+        assert "process_number" in results[3]["errors"]
+
+        self.document1.refresh_from_db()
+        self.document2.refresh_from_db()
+        assert self.document1.summary == "Updated 1"
+        assert self.document1.main_text == "Main text 1"
+        assert self.document1.version == version + 1
+        assert list(self.document1.entities.all()) == [self.entity2]
+        assert list(self.document2.entities.all()) == [self.entity2]
+
+        created = Document.objects.get(uid=results[1]["uid"])
+        assert created.entities.filter(id=self.entity1.id).exists()
+        assert sorted(created.descriptor_terms.values_list("name", flat=True)) == ["Contrato", "Renda"]
+        assert Entity.objects.count() == 3
+
+        search = self.client.get(reverse("document-list"), {"search": "Updated"})
+        assert {item["process_number"] for item in search.data["results"]} == {"12345", "67890"}
+
+    def test_bulk_upsert_rejects_bad_payloads(self):
+        url = reverse("document-bulk-upsert")
+        assert self.client.post(url, {"process_number": "1"}, format="json").status_code == 400
+        assert self.client.post(url, [], format="json").status_code == 400
+        too_many = [{"process_number": str(index)} for index in range(1001)]
+        assert self.client.post(url, too_many, format="json").status_code == 400
+        assert Document.objects.count() == 2
+
+        # Items are validated one by one; a bad label rejects only its item.
+        response = self.client.post(
+            url, [{"process_number": "P-1", "entities": [{"name": "Lei 1", "label": "BOGUS"}]}], format="json"
+        )
+        result = response.json()["results"][0]
+        assert result["status"] == "invalid"
+        assert "label" in result["errors"]["entities"][0]
+        assert not Document.objects.filter(process_number="P-1").exists()
+        assert not Entity.objects.filter(label="BOGUS").exists()
+
+    def test_bulk_upsert_invalidates_list_cache(self):
+        self.client.get(reverse("document-list"))
+        self.client.post(reverse("document-bulk-upsert"), [{"process_number": "P-2"}], format="json")
+        assert self.client.get(reverse("document-list")).data["count"] == 3
+
+    def test_bulk_delete(self):
+        missing = str(uuid.uuid4())
+        response = self.client.post(
+            reverse("document-bulk-delete"),
+            {"uids": [str(self.document1.uid), missing, "not-a-uid"]},
+            format="json",
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert [result["status"] for result in response.data["results"]] == ["deleted", "not_found", "invalid"]
+        assert list(Document.objects.values_list("process_number", flat=True)) == ["67890"]
+        assert Entity.objects.filter(id=self.entity1.id).exists()
+        assert self.client.post(reverse("document-bulk-delete"), {"uids": []}, format="json").status_code == 400
+
+    @pytest.mark.parametrize("params", [
+        {},
+        {"fields": "uid,summary,main_text,entities,descriptor_terms"},
+        {"exclude": "main_text", "ordering": "-process_number"},
+        {"fields": "uid", "page": "1"},
+        {"fields": "uid,decision", "search": "Summary"},
+    ])
+    def test_fast_serialization_matches_serializers(self, settings, params):
+        self.document1.entities.create(name="Lei n.º 1/2024 \u2028", label="LAW")
+        responses = []
+        for enabled in (False, True):
+            settings.FAST_SERIALIZATION = enabled
+            cache.clear()
+            responses.append([
+                self.client.get(reverse("document-list"), params).content,
+                self.client.get(reverse("document-entities", args=[self.document1.uid])).content,
+                self.client.get(reverse("entity-list")).content,
+                self.client.get(reverse("entity-documents", args=[self.entity1.id])).content,
+            ])
+        assert responses[0] == responses[1]
+        assert json.loads(responses[1][0])["results"]
+
+    def test_fast_serialization_queries(self, django_assert_num_queries):
+        # COUNT, page rows, then one query per many-to-many field.
+        with django_assert_num_queries(4):
+            response = self.client.get(reverse("document-list"), {"fields": "uid,entities,descriptor_terms"})
+        assert response.data["results"][0]["entities"][0]["name"] == "Entity1"
+        assert response.data["results"][0]["descriptor_terms"] == ["Descriptor 1"]
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        data = {
+            "text": "Acórdão \u2028 \u2029 \"quoted\"",
+            "uid": uuid.UUID("996dd81b-6324-4e6a-b6c4-2bc3d6c4863f"),
+            "date": datetime.date(2024, 3, 15),
+            "updated_at": datetime.datetime(2024, 3, 15, 10, 30, 0, 123456),
+            "lazy": gettext_lazy("Not found."),
+            "nested": [{"count": 1, "ratio": 0.5, "empty": None, "flag": True}],
+        }
+        assert ORJSONRenderer().render(data) == JSONRenderer().render(data)
+        assert ORJSONRenderer().render(data, "application/json; indent=2") == JSONRenderer().render(
+            data, "application/json; indent=2"
+        )
+
+    def test_orjson_parser_rejects_invalid_json(self):
+        response = self.client.post(
+            reverse("document-bulk-upsert"), data=b"[{", content_type="application/json"
+        )
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["detail"].startswith("JSON parse error")
+
+    def test_benchmark_serialization_command(self, capsys):
+        call_command("benchmark_serialization", "--documents", "10", "--repeat", "1")
+        output = capsys.readouterr().out
+        assert "full list" in output
+        assert "Outputs are identical." in output
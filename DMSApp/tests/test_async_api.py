@@ -0,0 +1,141 @@
+import json
+import os
+import subprocess
+import sys
+from io import StringIO
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from DMSApp.models import Document
+
+
+@pytest.mark.django_db
+class TestAsyncDocumentViews:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db):
+        cache.clear()
+        self.client = APIClient()
+        self.async_client = AsyncClient()
+        self.documents = [
+            Document.objects.create(
+                process_number=f"{index}/2024",
+                tribunal="Supreme Court",
+                summary=f"Summary {index}",
+                date=f"2024-01-{index + 1:02d}",
+                descriptors="Prescrição",
+                main_text=f"Main text {index}",
+            )
+            for index in range(7)
+        ]
+        self.documents[0].entities.create(name="Lei 1/2020", label="LAW")
+        self.documents[0].entities.create(name="Acórdão 2/2021", label="CASE")
+
+    def request_async(self, method, url, headers=None):
+        async def send():
+            return await getattr(self.async_client, method)(url, headers=headers)
+
+        return async_to_sync(send)()
+
+    def get_async(self, url, headers=None):
+        return self.request_async("get", url, headers)
+
+    def assert_same_body(self, sync_url, async_url):
+        sync_response = self.client.get(sync_url)
+        async_response = self.get_async(async_url)
+        assert async_response.status_code == sync_response.status_code == 200
+        sync_body = json.loads(sync_response.content)
+        async_body = json.loads(async_response.content)
+        # Page links point at their own endpoint.
+        for body in (sync_body, async_body):
+            for link in ("next", "previous"):
+                if body.get(link):
+                    body[link] = body[link].partition("?")[2]
+        assert async_body == sync_body
+        return async_body
+
+    def test_list_matches_sync_view(self):
+        body = self.assert_same_body(reverse("document-list"), reverse("async-document-list"))
+        assert len(body["results"]) == 5
+        assert "cursor=" in body["next"]
+
+        query = "?ordering=-date&fields=uid,summary,entities&tribunal=Supreme Court&facets=true&count=false"
+        self.assert_same_body(reverse("document-list") + query, reverse("async-document-list") + query)
+        self.assert_same_body(reverse("document-list") + "?page=2", reverse("async-document-list") + "?page=2")
+
+    def test_list_follows_cursor(self):
+        first = json.loads(self.get_async(reverse("async-document-list") + "?page_size=4").content)
+        second = json.loads(self.get_async(first["next"]).content)
+        assert [doc["process_number"] for doc in second["results"]] == ["4/2024", "5/2024", "6/2024"]
+        assert second["next"] is None
+
+    def test_retrieve_matches_sync_view_and_validates(self):
+        uid = self.documents[0].uid
+        self.assert_same_body(reverse("document-detail", args=[uid]), reverse("async-document-detail", args=[uid]))
+
+        response = self.get_async(reverse("async-document-detail", args=[uid]))
+        assert response["ETag"]
+        response = self.get_async(
+            reverse("async-document-detail", args=[uid]), headers={"If-None-Match": response["ETag"]}
+        )
+        assert response.status_code == 304
+
+    def test_entities_match_sync_view(self):
+        uid = self.documents[0].uid
+        body = self.assert_same_body(
+            reverse("document-entities", args=[uid]) + "?label=law",
+            reverse("async-document-entities", args=[uid]) + "?label=law",
+        )
+        assert [entity["name"] for entity in body["results"]] == ["Lei 1/2020"]
+
+    def test_errors(self):
+        missing = "00000000-0000-0000-0000-000000000000"
+        for view in ("document-detail", "document-entities"):
+            for uid in ("not-a-uuid", missing):
+                sync_response = self.client.get(reverse(view, args=[uid]))
+                async_response = self.get_async(reverse(f"async-{view}", args=[uid]))
+                assert async_response.status_code == sync_response.status_code == 404
+                assert json.loads(async_response.content) == sync_response.json()
+        response = self.get_async(reverse("async-document-list") + "?cursor=bogus")
+        assert response.status_code == 404
+        assert json.loads(response.content) == {"detail": "Invalid cursor"}
+        response = self.request_async("post", reverse("async-document-list"))
+        assert response.status_code == 405
+
+
+@pytest.mark.django_db(transaction=True)
+def test_load_test_command(live_server):
+    Document.objects.create(process_number="1/2024")
+    out = StringIO()
+    call_command(
+        "load_test",
+        f"{live_server.url}/api/documents/",
+        f"{live_server.url}/api/async/documents/",
+        "--requests", "6",
+        "--concurrency", "2",
+        stdout=out,
+    )
+    rows = out.getvalue().splitlines()[2:]
+    assert len(rows) == 2
+    assert all(row.split()[-1] == "0" for row in rows)
+
+
+@pytest.mark.parametrize("configured, expected", [(None, "0"), ("30", "30")])
+def test_asgi_connection_max_age(configured, expected):
+    # A fresh interpreter, since settings are only read once.
+    env = {key: value for key, value in os.environ.items() if key not in ("DB_CONN_MAX_AGE", "DJANGO_ASGI")}
+    if configured is not None:
+        env["DB_CONN_MAX_AGE"] = configured
+    output = subprocess.run(
+        [sys.executable, "-c", "import Documents.asgi; from django.conf import settings; "
+                               "print(settings.DATABASES['default']['CONN_MAX_AGE'])"],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    assert output.split() == [expected]
@@ -0,0 +1,81 @@
+import io
+import os
+from unittest.mock import patch
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, router
+
+from DMSApp.benchmarks import compare_results, generate_corpus, run_suite
+from DMSApp.management.commands import benchmark_suite
+from DMSApp.models import Document
+from DMSApp.routers import replica_aliases, replica_reads
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
+
+
+def test_generate_corpus_clones_sample_files(tmp_path):
+    assert generate_corpus(DATA_FOLDER, tmp_path, 12) == 12
+    assert len(list(tmp_path.glob("*.html"))) == 12
+    assert len(list(tmp_path.glob("*.json"))) == 12
+    assert b"-S0000011" in (tmp_path / "synthetic0000011.html").read_bytes()
+
+
+@pytest.mark.django_db
+def test_run_suite(tmp_path):
+    results = run_suite(DATA_FOLDER, tmp_path, documents=12, repeat=3)
+
+    assert results["seed"]["documents"] == 12
+    assert Document.objects.count() == 12
+    assert set(results["endpoints"]) >= {"list", "search", "detail", "entities"}
+    for endpoint in results["endpoints"].values():
+        assert endpoint["errors"] == 0
+        assert endpoint["queries"] > 0
+    assert results["endpoints"]["list"]["queries"] == 2
+
+
+def test_compare_results():
+    baseline = {
+        "seed": {"documents": 100, "documents_per_second": 100.0, "queries": 20},
+        "endpoints": {"list": {"p50_ms": 10.0, "p95_ms": 20.0, "queries": 2}},
+    }
+    current = {
+        "seed": {"documents": 100, "documents_per_second": 90.0, "queries": 20},
+        "endpoints": {"list": {"p50_ms": 13.0, "p95_ms": 21.0, "queries": 3}},
+    }
+    regressed = {row[0] for row in compare_results(baseline, current, threshold=0.2) if row[4]}
+    assert regressed == {"list.p50_ms", "list.queries"}
+    assert not any(row[4] for row in compare_results(baseline, baseline, threshold=0.0))
+
+
+@pytest.mark.django_db
+def test_benchmark_connections_reports_both_modes():
+    stdout = io.StringIO()
+    call_command("benchmark_connections", "--requests", "3", stdout=stdout)
+
+    rows = [line.split() for line in stdout.getvalue().splitlines()[2:]]
+    assert [row[0] for row in rows] == ["fresh", "persistent"]
+    assert connection.settings_dict["CONN_MAX_AGE"] == settings.DATABASES["default"]["CONN_MAX_AGE"]
+
+
+def test_benchmark_suite_ignores_replicas(settings, tmp_path):
+    settings.DATABASE_REPLICAS = ["replica1"]
+    seen = []
+
+    def fake_run_suite(*args):
+        seen.append((replica_aliases(), router.db_for_read(Document)))
+        return {}
+
+    with patch.object(benchmark_suite, "run_suite", side_effect=fake_run_suite), \
+            patch.object(benchmark_suite, "setup_test_environment"), \
+            patch.object(benchmark_suite, "teardown_test_environment"), \
+            patch.object(connection.creation, "create_test_db", return_value="test"), \
+            patch.object(connection.creation, "destroy_test_db"), \
+            replica_reads():
+        benchmark_suite.Command().run_in_test_database(
+            {"data_folder": DATA_FOLDER, "documents": 1, "repeat": 1, "workers": 1}
+        )
+
+    assert seen == [([], "default")]
+    assert replica_aliases() == ["replica1"]
@@ -0,0 +1,79 @@
+import pytest
+from django.core.cache import caches
+from django.db import transaction
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from DMSApp.cache import LIST_GENERATION_KEY, get_list_generation, invalidate_document_lists
+from DMSApp.models import Document
+
+fakeredis = pytest.importorskip("fakeredis")
+# Renamed in fakeredis 2.3x.
+CONNECTION_CLASS = getattr(fakeredis, "FakeRedisConnection", None) or fakeredis.FakeConnection
+
+
+@pytest.fixture
+def redis_cache(settings):
+    # Django's RedisCache talking to an in-memory server, as with REDIS_URL.
+    settings.CACHES = {
+        **settings.CACHES,
+        "redis": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": "redis://localhost:6379/0",
+            "KEY_PREFIX": "dms",
+            "OPTIONS": {"connection_class": CONNECTION_CLASS, "server": fakeredis.FakeServer()},
+        },
+    }
+    settings.DOCUMENT_CACHE_ALIAS = "redis"
+    cache = caches["redis"]
+    yield cache
+    cache.clear()
+
+
+def stored_keys(cache):
+    return {key.decode() for key in cache._cache.get_client().keys("*")}
+
+
+@pytest.mark.django_db
+class TestRedisCache:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, redis_cache):
+        self.cache = redis_cache
+        self.client = APIClient()
+        self.document = Document.objects.create(process_number="1/24", summary="Resumo")
+
+    def test_list_generation_is_incremented_now_and_on_commit(self, django_capture_on_commit_callbacks):
+        generation = get_list_generation()
+        # Stored as a Redis integer, so INCR works on it.
+        assert int(self.cache._cache.get_client().get(f"dms:1:{LIST_GENERATION_KEY}")) == generation
+
+        with django_capture_on_commit_callbacks(execute=True), transaction.atomic():
+            invalidate_document_lists()
+            assert get_list_generation() == generation + 1
+        assert get_list_generation() == generation + 2
+
+    def test_evicted_list_generation_restarts_from_the_clock(self):
+        generation = get_list_generation()
+        self.cache.delete(LIST_GENERATION_KEY)
+
+        invalidate_document_lists()
+        assert get_list_generation() > generation
+
+    def test_list_pages_follow_writes(self):
+        self.client.get(reverse("document-list"))
+        self.client.post(reverse("document-list"), {"process_number": "2/24", "summary": "Outro"}, format="json")
+
+        response = self.client.get(reverse("document-list"))
+        assert [row["process_number"] for row in response.data["results"]] == ["1/24", "2/24"]
+
+    def test_detail_entries_are_keyed_by_version(self, django_assert_num_queries):
+        url = reverse("document-detail", args=[self.document.uid])
+        self.client.get(url)
+        with django_assert_num_queries(1):
+            assert self.client.get(url).data["summary"] == "Resumo"
+
+        self.client.patch(url, {"summary": "Novo resumo"}, format="json")
+        assert self.client.get(url).data["summary"] == "Novo resumo"
+        uid = self.document.uid.hex
+        assert {key.split(":")[5] for key in stored_keys(self.cache) if f":documents:detail:{uid}:" in key} == {"1", "2"}
@@ -0,0 +1,149 @@
+import pytest
+from django.core.management import CommandError, call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from DMSApp.bulk import upsert_documents
+from DMSApp.compression import compress_text, decompress_text
+from DMSApp.models import Document, DocumentBody
+
+MAIN_TEXT = "Acordam os juízes do Supremo Tribunal de Justiça. " * 40
+
+
+def stored_columns(document):
+    return Document.objects.filter(id=document.id).values_list("main_text", "decision").get()
+
+
+def test_compress_text_round_trip():
+    data = compress_text(MAIN_TEXT, "zlib")
+    assert len(data) < len(MAIN_TEXT) / 10
+    assert decompress_text(data) == MAIN_TEXT
+    assert compress_text(None, "zlib") is None
+
+
+@pytest.mark.django_db
+class TestCompressedBodies:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        self.settings = settings
+        settings.DOCUMENT_BODY_CODEC = "zlib"
+        self.client = APIClient()
+        self.document = Document.objects.create(
+            process_number="1/24", summary="Resumo", decision="Negado provimento", main_text=MAIN_TEXT
+        )
+
+    def test_bodies_are_stored_compressed_and_read_transparently(self):
+        assert stored_columns(self.document) == (None, None)
+        assert decompress_text(DocumentBody.objects.get(document=self.document).main_text) == MAIN_TEXT
+
+        document = Document.objects.get(id=self.document.id)
+        assert document.main_text == MAIN_TEXT
+        assert document.decision == "Negado provimento"
+
+    def test_detail_and_list_read_bodies_in_one_query(self, django_assert_num_queries):
+        # The validator lookup, then the document joined with its body.
+        with django_assert_num_queries(2):
+            response = self.client.get(reverse("document-detail", args=[self.document.uid]), {"fields": "main_text"})
+        assert response.data == {"main_text": MAIN_TEXT}
+
+        response = self.client.get(reverse("document-list"), {"fields": "uid,decision"})
+        assert response.data["results"][0]["decision"] == "Negado provimento"
+
+    def test_updates_keep_and_replace_bodies(self):
+        url = reverse("document-detail", args=[self.document.uid])
+        self.client.patch(url, {"summary": "Novo resumo"}, format="json")
+        assert self.client.get(url).data["main_text"] == MAIN_TEXT
+
+        self.client.patch(url, {"main_text": "Texto novo"}, format="json")
+        assert Document.objects.get(id=self.document.id).main_text == "Texto novo"
+        assert stored_columns(self.document) == (None, None)
+
+        search = self.client.get(reverse("document-list"), {"search": "novo"})
+        assert search.data["results"][0]["uid"] == str(self.document.uid)
+
+    def test_disabling_compression_writes_plain_text_again(self):
+        self.settings.DOCUMENT_BODY_CODEC = ""
+        document = Document.objects.get(id=self.document.id)
+        document.decision = None
+        document.save()
+
+        assert stored_columns(self.document) == (MAIN_TEXT, None)
+        assert DocumentBody.objects.get(document=self.document).main_text is None
+        document = Document.objects.get(id=self.document.id)
+        assert document.main_text == MAIN_TEXT
+        assert document.decision is None
+
+    def test_compressed_bodies_stay_readable_with_compression_off(self):
+        self.settings.DOCUMENT_BODY_CODEC = ""
+        document = Document.objects.get(id=self.document.id)
+        assert document.main_text == MAIN_TEXT
+        document.summary = "Novo resumo"
+        document.save(update_fields=["summary"])
+
+        assert stored_columns(self.document) == (None, None)
+        search = self.client.get(reverse("document-list"), {"search": "juízes"})
+        assert [row["uid"] for row in search.data["results"]] == [str(self.document.uid)]
+
+    def test_plain_documents_never_write_bodies(self, django_assert_num_queries):
+        self.settings.DOCUMENT_BODY_CODEC = ""
+        document = Document.objects.create(process_number="2/24", summary="Resumo", main_text=None)
+        document = Document.objects.get(id=document.id)
+
+        # The update, the version refresh, one lookup of the (missing) body
+        # row and the search index rewrite, plus the descriptor terms on a
+        # full save; nothing is written to DocumentBody.
+        with django_assert_num_queries(5):
+            document.summary = "Novo resumo"
+            document.save(update_fields=["summary"])
+        document = Document.objects.get(id=document.id)
+        with django_assert_num_queries(6):
+            document.save()
+        assert document.main_text is None
+        assert not DocumentBody.objects.filter(document=document).exists()
+
+    def test_bulk_upsert_compresses_bodies(self):
+        result = upsert_documents([
+            ({"process_number": "1/24", "main_text": "Texto atualizado"}, None),
+            ({"process_number": "2/24", "summary": "Outro", "main_text": MAIN_TEXT}, None),
+        ])
+        assert result.outcomes == {"1/24": "updated", "2/24": "created"}
+        created = Document.objects.get(process_number="2/24")
+        assert stored_columns(created) == (None, None)
+        assert created.main_text == MAIN_TEXT
+        updated = Document.objects.get(id=self.document.id)
+        assert (updated.main_text, updated.decision) == ("Texto atualizado", "Negado provimento")
+
+    def test_compress_and_decompress_commands(self):
+        self.settings.DOCUMENT_BODY_CODEC = ""
+        plain = Document.objects.create(process_number="2/24", main_text="Texto simples")
+        DocumentBody.objects.all().delete()
+        Document.objects.filter(id=self.document.id).update(main_text=MAIN_TEXT)
+        version = Document.objects.get(id=plain.id).version
+
+        self.settings.DOCUMENT_BODY_CODEC = "zlib"
+        call_command("compress_document_bodies", "--batch-size", "1")
+        assert stored_columns(plain) == (None, None)
+        assert stored_columns(self.document) == (None, None)
+        assert Document.objects.get(id=plain.id).main_text == "Texto simples"
+        assert Document.objects.get(id=plain.id).version == version
+
+        self.settings.DOCUMENT_BODY_CODEC = ""
+        call_command("compress_document_bodies", "--decompress")
+        assert stored_columns(plain) == ("Texto simples", None)
+        assert stored_columns(self.document) == (MAIN_TEXT, None)
+        assert not DocumentBody.objects.exists()
+
+    def test_compress_command_requires_a_codec(self):
+        self.settings.DOCUMENT_BODY_CODEC = ""
+        plain = Document.objects.create(process_number="2/24", main_text="Texto simples")
+
+        with pytest.raises(CommandError, match="DOCUMENT_BODY_CODEC"):
+            call_command("compress_document_bodies")
+        assert stored_columns(plain) == ("Texto simples", None)
+
+    def test_benchmark_command(self, capsys):
+        call_command("benchmark_document_bodies", "--sample", "5", "--repeat", "1")
+        output = capsys.readouterr().out
+        assert "zlib" in output
+        assert "Detail load: 1 loads" in output
@@ -0,0 +1,97 @@
+import logging
+import re
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from DMSApp.instrumentation import registry
+from DMSApp.models import Document
+
+
+def timing_entries(response):
+    return {
+        match.group(1): (float(match.group(2)), match.group(3))
+        for match in re.finditer(r'(\w+);dur=([\d.]+)(?:;desc="([^"]*)")?', response["Server-Timing"])
+    }
+
+
+@pytest.mark.django_db
+class TestInstrumentation:
+
+    @pytest.fixture(autouse=True)
+    def setup(self, db, settings):
+        settings.SERVER_TIMING = True
+        settings.METRICS_ENABLED = True
+        cache.clear()
+        registry.reset()
+        self.client = APIClient()
+        self.document = Document.objects.create(process_number="1/2024", summary="Resumo", main_text="Texto")
+        self.document.entities.create(name="Lei 1/2020", label="LAW")
+
+    def test_server_timing_reports_queries_and_phases(self):
+        response = self.client.get(reverse("document-list"), {"fields": "uid,entities"})
+        entries = timing_entries(response)
+        # COUNT, page rows and the entities query.
+        assert entries["db"][1] == "3 queries"
+        assert {"serialize", "render", "etag", "total"} <= entries.keys()
+        assert entries["total"][0] >= entries["db"][0]
+
+        cached = timing_entries(self.client.get(reverse("document-list"), {"fields": "uid,entities"}))
+        assert cached["db"][1] == "0 queries"
+        assert "serialize" not in cached
+
+    def test_async_views_count_queries_from_threads(self):
+        async def send():
+            return await AsyncClient().get(reverse("async-document-list"), {"fields": "uid,entities"})
+
+        entries = timing_entries(async_to_sync(send)())
+        assert entries["db"][1] == "3 queries"
+
+    def test_metrics_endpoint_exposes_route_histograms(self):
+        self.client.get(reverse("document-list"))
+        self.client.get(reverse("document-detail", args=[self.document.uid]))
+
+        response = self.client.get("/metrics")
+        assert response.status_code == 200
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        body = response.content.decode()
+        assert "# TYPE dms_request_duration_seconds histogram" in body
+        assert 'dms_request_duration_seconds_count{route="document-list",method="GET",status="200"} 1' in body
+        assert 'dms_request_db_queries_bucket{route="document-detail",method="GET",status="200",le="+Inf"} 1' in body
+
+    def test_metrics_endpoint_is_restricted(self, settings):
+        assert self.client.get("/metrics", REMOTE_ADDR="203.0.113.7").status_code == 403
+
+        settings.METRICS_TOKEN = "scrape-secret"
+        assert self.client.get("/metrics").status_code == 403
+        assert self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer wrong").status_code == 403
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-secret", REMOTE_ADDR="203.0.113.7")
+        assert response.status_code == 200
+
+    def test_slow_queries_are_logged(self, settings, caplog):
+        settings.SLOW_QUERY_THRESHOLD_MS = 0.000001
+        with caplog.at_level(logging.WARNING, logger="DMSApp.instrumentation"):
+            self.client.get(reverse("document-detail", args=[self.document.uid]))
+        assert any("Slow query" in message and "SELECT" in message for message in caplog.messages)
+
+    def test_timings_and_metrics_are_not_exposed_by_default(self, settings):
+        del settings.SERVER_TIMING
+        del settings.METRICS_ENABLED
+        assert not APIClient().get(reverse("document-list")).has_header("Server-Timing")
+        assert APIClient().get("/metrics").status_code == 404
+
+    def test_instrumentation_can_be_disabled(self, settings):
+        settings.INSTRUMENTATION = False
+        response = APIClient().get(reverse("document-list"))
+        assert not response.has_header("Server-Timing")
+        assert APIClient().get("/metrics").status_code == 404
+
+        settings.INSTRUMENTATION = True
+        settings.SERVER_TIMING = False
+        settings.METRICS_ENABLED = False
+        assert not APIClient().get(reverse("document-list")).has_header("Server-Timing")
+        assert APIClient().get("/metrics").status_code == 404
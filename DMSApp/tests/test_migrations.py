@@ -0,0 +1,45 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+BEFORE = [("DMSApp", "0009_document_updated_at")]
+AFTER = [("DMSApp", "0012_entity_document_links_constraints")]
+
+
+def migrate(targets):
+    executor = MigrationExecutor(connection)
+    executor.loader.build_graph()
+    executor.migrate(targets)
+    return executor.loader.project_state(targets).apps
+
+
+@pytest.fixture(autouse=True)
+def latest_migrations(transactional_db):
+    # Later transactional tests share this database and need the full schema.
+    yield
+    migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_entity_document_links_migration():
+    apps = migrate(BEFORE)
+    Document = apps.get_model("DMSApp", "Document")
+    Entity = apps.get_model("DMSApp", "Entity")
+    first = Document.objects.create(process_number="1")
+    second = Document.objects.create(process_number="2")
+    Entity.objects.create(document=first, name="Código Civil", label="LAW")
+    Entity.objects.create(document=second, name="codigo civil", label="LAW")
+    Entity.objects.create(document=second, name="CÓDIGO CIVIL", label="CASE")
+
+    apps = migrate(AFTER)
+    Document = apps.get_model("DMSApp", "Document")
+    Entity = apps.get_model("DMSApp", "Entity")
+
+    law = Entity.objects.get(normalized_name="codigo civil", label="LAW")
+    assert law.name == "Código Civil"
+    assert sorted(law.documents.values_list("process_number", flat=True)) == ["1", "2"]
+    assert Entity.objects.count() == 2
+    assert Document.objects.get(process_number="2").entities.count() == 2
+
+    migrate(BEFORE)
+    migrate(AFTER)
@@ -0,0 +1,183 @@
+import os
+import sqlite3
+import time
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.db import connections, router
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from DMSApp.models import Document, IngestedFile
+from DMSApp.routers import replica_reads, use_primary
+from DMSApp.utils.seeding_scripts import populate_database_with_files
+
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
+REPLICAS = ["replica1", "replica2"]
+
+
+def add_alias(alias, settings_dict, connection=None):
+    connections.settings[alias] = settings_dict
+    if connection is not None:
+        connections[alias] = connection
+
+
+def remove_alias(alias):
+    if hasattr(connections._connections, alias):
+        del connections[alias]
+    del connections.settings[alias]
+
+
+@pytest.fixture
+def replicas(settings):
+    # Both replicas share the test database connection, like a TEST MIRROR,
+    # so they see the rows written inside the test transaction.
+    for alias in REPLICAS:
+        add_alias(alias, connections.settings["default"], connections["default"])
+    settings.DATABASE_REPLICAS = REPLICAS
+    yield REPLICAS
+    for alias in REPLICAS:
+        remove_alias(alias)
+
+
+@pytest.fixture
+def reads():
+    chosen = []
+    db_for_read = router.db_for_read
+
+    def record(model, **hints):
+        alias = db_for_read(model, **hints)
+        chosen.append(alias)
+        return alias
+
+    with patch.object(router, "db_for_read", record):
+        yield chosen
+
+
+@pytest.fixture
+def document(db):
+    cache.clear()
+    return Document.objects.create(
+        process_number="12345",
+        tribunal="Supreme Court",
+        summary="Summary",
+        decision="Decision",
+        date="2023-11-20",
+        descriptors="Descriptor",
+        main_text="Main text",
+    )
+
+
+# Reads inside a transaction on the primary never go to a replica, so these
+# tests must not run inside the usual per-test transaction.
+@pytest.mark.django_db(transaction=True)
+class TestReplicaRouting:
+    def test_safe_requests_read_from_replicas(self, settings, replicas, reads, document):
+        # Otherwise the page is built on the primary, right after the write.
+        settings.REPLICA_LAG_SECONDS = 0
+        response = APIClient().get(reverse("document-list"))
+
+        assert response.status_code == 200
+        assert response.json()["results"][0]["process_number"] == "12345"
+        assert reads and set(reads) <= set(replicas)
+
+    def test_streamed_export_reads_from_replicas(self, replicas, reads, document):
+        response = APIClient().get(reverse("document-export"))
+        body = b"".join(response.streaming_content)
+
+        assert b"12345" in body
+        assert reads and set(reads) <= set(replicas)
+
+    def test_unsafe_requests_read_from_primary(self, replicas, reads, document):
+        response = APIClient().post(
+            reverse("document-bulk-upsert"),
+            [{"process_number": "12345", "summary": "Changed"}],
+            format="json",
+        )
+
+        assert response.status_code == 200
+        assert reads and set(reads) == {"default"}
+
+    def test_reads_after_a_write_are_pinned_to_primary(self, replicas, reads, document):
+        with replica_reads():
+            Document.objects.exists()
+            Document.objects.filter(pk=document.pk).update(summary="Changed")
+            Document.objects.exists()
+
+        assert reads[0] in replicas
+        assert reads[1:] == ["default"]
+
+    def test_reads_round_robin_across_replicas(self, replicas, reads, document):
+        with replica_reads():
+            for _ in range(4):
+                Document.objects.exists()
+
+        assert reads[0] != reads[1]
+        assert reads[:2] == reads[2:]
+
+    def test_only_document_models_read_from_replicas(self, replicas, reads, document):
+        with replica_reads():
+            IngestedFile.objects.exists()
+            Document.objects.exists()
+
+        assert reads[0] == "default"
+        assert reads[1] in replicas
+
+    def test_list_pages_after_a_write_are_not_cached_from_a_lagging_replica(self, settings, tmp_path, reads, document):
+        # The replica is a snapshot taken before the second document exists.
+        snapshot = sqlite3.connect(tmp_path / "replica.sqlite3")
+        connections["default"].ensure_connection()
+        connections["default"].connection.backup(snapshot)
+        snapshot.close()
+        add_alias("snapshot", {**connections.settings["default"], "NAME": str(tmp_path / "replica.sqlite3")})
+        settings.DATABASE_REPLICAS = ["snapshot"]
+        try:
+            Document.objects.create(process_number="67890", date="2023-11-21")
+
+            settings.REPLICA_LAG_SECONDS = 0
+            lagging = APIClient().get(reverse("document-list"), {"page_size": 50}).json()
+            settings.REPLICA_LAG_SECONDS = 10
+            fresh = APIClient().get(reverse("document-list")).json()
+        finally:
+            connections["snapshot"].close()
+            remove_alias("snapshot")
+
+        assert [row["process_number"] for row in lagging["results"]] == ["12345"]
+        assert [row["process_number"] for row in fresh["results"]] == ["12345", "67890"]
+
+    def test_reads_outside_requests_use_primary(self, replicas, reads, document):
+        Document.objects.exists()
+        with use_primary():
+            Document.objects.exists()
+
+        assert reads == ["default", "default"]
+
+    def test_unavailable_replica_is_skipped(self, settings, tmp_path, reads, document):
+        add_alias("broken", {**connections.settings["default"], "NAME": str(tmp_path / "missing" / "db.sqlite3")})
+        settings.DATABASE_REPLICAS = ["broken"]
+        try:
+            with patch.object(connections["broken"], "ensure_connection", wraps=connections["broken"].ensure_connection) as connect:
+                with replica_reads():
+                    Document.objects.exists()
+                    Document.objects.exists()
+                # Skipped without a new attempt until the retry delay has passed.
+                assert connect.call_count == 1
+                with replica_reads(), patch("DMSApp.routers.time.monotonic", return_value=time.monotonic() + 60):
+                    Document.objects.exists()
+                assert connect.call_count == 2
+        finally:
+            remove_alias("broken")
+
+        assert reads == ["default", "default", "default"]
+
+    def test_seeder_reads_and_writes_on_primary(self, replicas, reads, db):
+        with replica_reads():
+            report = populate_database_with_files(DATA_FOLDER, max_workers=1)
+
+        assert report.documents_inserted > 0
+        assert reads and set(reads) == {"default"}
+
+    def test_replicas_are_not_migrated(self, replicas):
+        assert router.allow_migrate("replica1", "DMSApp", model_name="document") is False
+        assert router.allow_migrate("default", "DMSApp", model_name="document") is True
@@ -1,20 +1,28 @@
+import io
 import pytest
 import os
 import json
 from datetime import date
 from unittest.mock import mock_open, patch, MagicMock
 from bs4 import BeautifulSoup
-from django.db import IntegrityError
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
 
-from DMSApp.models import Document, Entity
+from DMSApp.cache import get_list_generation
+from DMSApp.models import Document, Entity, IngestedFile
+from DMSApp.utils import seeding_scripts
 from DMSApp.utils.seeding_scripts import (
+    PARSE_STAGES,
     convert_date_to_standard_format,
     extract_metadata_and_text_from_html,
     load_json_file,
     process_html_and_json_files,
-    populate_database_with_files
+    parse_files,
+    populate_database_with_files,
 )
 
+DATA_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
+
 @pytest.fixture
 def sample_html_content():
     return """
@@ -82,6 +90,69 @@ class TestMetadataExtraction:
         assert metadata["tribunal"] == ""
         assert main_text == ""
 
+def legacy_extract(file_path):
+    # The original one-find()-per-label extractor, kept as the parity reference.
+    with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+        soup = BeautifulSoup(file, "html.parser")
+
+    def sibling_text(label, separator):
+        label_td = soup.find("td", string=lambda x: x and label in x)
+        sibling_td = label_td.find_next_sibling("td") if label_td else None
+        return sibling_td.get_text(strip=True, separator=separator) if sibling_td else None
+
+    labels = {
+        "process_number": "Processo:",
+        "tribunal": "Relator:",
+        "descriptors": "Descritores:",
+        "date": "Data do Acordão:",
+        "decision": "Decisão:",
+        "summary": "Sumário:",
+    }
+    metadata = {}
+    for key, label in labels.items():
+        value = sibling_text(label, " ")
+        metadata[key] = value.replace("\xa0", " ").strip() if value else ""
+    return metadata, sibling_text("Decisão Texto Integral:", "\n") or ""
+
+
+class TestExtractorParity:
+    html_files = sorted(
+        os.path.join(DATA_FOLDER, name) for name in os.listdir(DATA_FOLDER) if name.endswith(".html")
+    )
+
+    def assert_matches_legacy(self, extracted, file_path):
+        (metadata, main_text), (legacy_metadata, legacy_main_text) = extracted, legacy_extract(file_path)
+        descriptors, legacy_descriptors = metadata.pop("descriptors"), legacy_metadata.pop("descriptors")
+        assert (metadata, main_text) == (legacy_metadata, legacy_main_text)
+        # Descriptors are now split into '; '-separated terms, one per source
+        # line or semicolon; the words themselves are unchanged.
+        assert descriptors.replace(";", " ").split() == legacy_descriptors.replace(";", " ").split()
+
+    @pytest.mark.parametrize("file_path", html_files)
+    def test_html_parser_backend_matches_legacy_extractor(self, file_path):
+        self.assert_matches_legacy(extract_metadata_and_text_from_html(file_path, backend="html.parser"), file_path)
+
+    @pytest.mark.parametrize("file_path", html_files)
+    def test_lxml_backend_matches_legacy_extractor(self, file_path):
+        pytest.importorskip("lxml")
+        self.assert_matches_legacy(extract_metadata_and_text_from_html(file_path, backend="lxml"), file_path)
+
+    def test_descriptors_are_split_into_terms(self, sample_html_content, tmp_path):
+        html_path = tmp_path / "test.html"
+        html_path.write_text(
+            sample_html_content.replace("Criminal Law", "Criminal Law<br/>Appeal;Criminal  Law"), encoding="utf-8"
+        )
+
+        metadata, _ = extract_metadata_and_text_from_html(str(html_path))
+
+        assert metadata["descriptors"] == "Criminal Law; Appeal"
+        assert legacy_extract(str(html_path))[0]["descriptors"] == "Criminal Law Appeal;Criminal  Law"
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            extract_metadata_and_text_from_html(self.html_files[0], backend="regex")
+
+
 class TestJsonLoading:
     def test_successful_json_load(self, sample_json_content):
         with patch("builtins.open", mock_open(read_data=json.dumps(sample_json_content))):
@@ -124,70 +195,258 @@ class TestFileProcessing:
                     document, entities = process_html_and_json_files("test.html", "data/")
 
         assert document is not None
-        assert document.process_number == "123/2024"
+        assert document["process_number"] == "123/2024"
+        assert document["date"] == date(2024, 3, 15)
         assert len(entities) == 1
-        assert entities[0].name == "John Doe"
+        assert entities[0]["name"] == "John Doe"
+
+    def test_process_executor_matches_thread_executor(self):
+        file_names = sorted(name for name in os.listdir(DATA_FOLDER) if name.endswith(".html"))
+
+        def without_timings(records):
+            return [{key: value for key, value in record.items() if key != "timings"} for record in records]
+
+        threaded = list(parse_files(file_names, DATA_FOLDER, max_workers=2, executor="threads"))
+        forked = list(parse_files(file_names, DATA_FOLDER, max_workers=2, executor="processes", chunk_size=2))
+
+        assert len(threaded) == len(file_names)
+        assert without_timings(forked) == without_timings(threaded)
+        assert all(set(record["timings"]) == set(PARSE_STAGES) for record in forked)
+
+    def test_unknown_executor(self):
+        with pytest.raises(ValueError):
+            list(parse_files(["test.html"], "data/", executor="fibers"))
 
 
 @pytest.mark.django_db
 class TestDatabasePopulation:
-    @pytest.fixture
-    def mock_document_objects(self):
-        mock = MagicMock()
-        mock.get.return_value = MagicMock(spec=Document)
-        return mock
+    def _write_files(self, folder, html_content, json_content, names=("test",)):
+        for name in names:
+            (folder / f"{name}.html").write_text(html_content, encoding="utf-8")
+            (folder / f"{name}.json").write_text(json.dumps(json_content), encoding="utf-8")
 
-    @pytest.fixture
-    def mock_entity_objects(self):
-        return MagicMock()
+    def test_successful_population(self, tmp_path, sample_html_content, sample_json_content):
+        self._write_files(tmp_path, sample_html_content, sample_json_content)
 
-    def test_successful_population(self, sample_html_content, sample_json_content, 
-                                 mock_document_objects, mock_entity_objects):
-        mock_file = mock_open(read_data=sample_html_content)
-        mock_json = mock_open(read_data=json.dumps(sample_json_content))
+        report = populate_database_with_files(str(tmp_path), max_workers=1)
 
-        def side_effect(filename, *args, **kwargs):
-            if filename.endswith('.html'):
-                return mock_file.return_value
-            return mock_json.return_value
+        document = Document.objects.get(process_number="123/2024")
+        assert document.date == date(2024, 3, 15)
+        assert list(document.entities.values_list("name", flat=True)) == ["John Doe"]
+        assert list(document.descriptor_terms.values_list("name", flat=True)) == ["Criminal Law"]
+        assert report.documents_inserted == 1
+        assert report.entities_inserted == 1
+
+    def test_unchanged_files_are_skipped(self, tmp_path, sample_html_content, sample_json_content):
+        self._write_files(tmp_path, sample_html_content, sample_json_content)
+        populate_database_with_files(str(tmp_path), max_workers=1)
+
+        with patch.object(seeding_scripts, "process_file_chunk") as mock_parse:
+            report = populate_database_with_files(str(tmp_path), max_workers=1)
+
+        mock_parse.assert_not_called()
+        assert report.files_unchanged == 1
+        assert report.documents_inserted == 0
+        assert Document.objects.count() == 1
+        assert Entity.objects.count() == 1
+        assert IngestedFile.objects.get().process_number == "123/2024"
+
+    def test_touched_file_with_same_content_is_not_reparsed(self, tmp_path, sample_html_content, sample_json_content):
+        self._write_files(tmp_path, sample_html_content, sample_json_content)
+        populate_database_with_files(str(tmp_path), max_workers=1)
+        touched_ns = (tmp_path / "test.json").stat().st_mtime_ns + 10**9
+        os.utime(tmp_path / "test.html", ns=(touched_ns, touched_ns))
 
-        with patch("os.listdir") as mock_listdir:
-            with patch("builtins.open", side_effect=side_effect):
-                with patch("os.path.exists") as mock_exists:
-                    with patch('bs4.BeautifulSoup', return_value=BeautifulSoup(sample_html_content, 'html.parser')):
-                        with patch.object(Document.objects, 'create', return_value=MagicMock(spec=Document)) as mock_create:
-                            mock_listdir.return_value = ["test.html"]
-                            mock_exists.return_value = True
+        with patch("DMSApp.utils.parsing.process_file_safely") as mock_parse:
+            report = populate_database_with_files(str(tmp_path), max_workers=1)
 
-                            populate_database_with_files("data/", max_workers=1)
+        mock_parse.assert_not_called()
+        assert report.files_unchanged == 1
+        manifest = IngestedFile.objects.get()
+        assert manifest.mtime_ns == touched_ns
+        assert manifest.process_number == "123/2024"
 
-                            # Check if the document was created successfully
-                            mock_create.assert_called_once()
+    def test_changed_file_updates_document_in_place(self, tmp_path, sample_html_content, sample_json_content):
+        self._write_files(tmp_path, sample_html_content, sample_json_content)
+        populate_database_with_files(str(tmp_path), max_workers=1)
+        document = Document.objects.get()
 
+        changed_entities = {"entities": [{"name": "Jane Roe", "label": "CASE", "url": ""}]}
+        self._write_files(tmp_path, sample_html_content.replace("Approved", "Rejected"), changed_entities)
+        report = populate_database_with_files(str(tmp_path), max_workers=1)
+
+        assert report.documents_updated == 1
+        assert report.documents_inserted == 0
+        updated = Document.objects.get()
+        assert updated.pk == document.pk
+        assert updated.uid == document.uid
+        assert updated.decision == "Rejected"
+        assert updated.version == document.version + 1
+        assert list(updated.entities.values_list("name", flat=True)) == ["Jane Roe"]
+
+    def test_shared_citations_are_stored_once(self, tmp_path, sample_html_content):
+        law = {"name": "Código Penal", "label": "LAW", "url": ""}
+        for index, name in enumerate(["Código Penal", "codigo  penal"]):
+            self._write_files(
+                tmp_path,
+                sample_html_content.replace("123/2024", f"{index}/2024"),
+                {"entities": [{**law, "name": name}, {**law, "name": "Lei 5/2006"}]},
+                [f"test{index}"],
+            )
+
+        report = populate_database_with_files(str(tmp_path), max_workers=1, batch_size=1)
+
+        assert report.entities_inserted == 2
+        assert report.citations_inserted == 4
+        assert Entity.objects.count() == 2
+        penal_code = Entity.objects.get(normalized_name="codigo penal")
+        assert sorted(penal_code.documents.values_list("process_number", flat=True)) == ["0/2024", "1/2024"]
+
+    def test_population_invalidates_cached_lists(self, tmp_path, sample_html_content, sample_json_content):
+        self._write_files(tmp_path, sample_html_content, sample_json_content)
+        generation = get_list_generation()
+        populate_database_with_files(str(tmp_path), max_workers=1)
+        assert get_list_generation() != generation
+
+        generation = get_list_generation()
+        populate_database_with_files(str(tmp_path), max_workers=1)
+        assert get_list_generation() == generation
+
+    def test_full_run_ignores_manifest(self, tmp_path, sample_html_content, sample_json_content):
+        self._write_files(tmp_path, sample_html_content, sample_json_content)
+        populate_database_with_files(str(tmp_path), max_workers=1)
+
+        report = populate_database_with_files(str(tmp_path), max_workers=1, full=True)
+
+        assert report.files_parsed == 1
+        assert report.documents_updated == 1
+
+    def test_resume_after_failed_batch(self, tmp_path, sample_html_content):
+        for index in range(4):
+            self._write_files(
+                tmp_path, sample_html_content.replace("123/2024", f"{index}/2024"), {"entities": []}, [f"test{index}"]
+            )
+        original_write = seeding_scripts.write_document_batch
+        calls = []
+
+        def crash_on_second_batch(batch, report):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise DatabaseError("connection lost")
+            original_write(batch, report)
+
+        with patch.object(seeding_scripts, "write_document_batch", side_effect=crash_on_second_batch):
+            report = populate_database_with_files(str(tmp_path), max_workers=1, batch_size=2)
+        assert report.documents_failed == 2
+        assert IngestedFile.objects.count() == 2
+
+        report = populate_database_with_files(str(tmp_path), max_workers=1, batch_size=2)
+
+        assert report.files_unchanged == 2
+        assert report.files_parsed == 2
+        assert report.documents_inserted == 2
+        assert Document.objects.count() == 4
+
+    def test_population_is_batched(self, tmp_path, sample_html_content, django_assert_max_num_queries):
+        for index in range(6):
+            self._write_files(
+                tmp_path, sample_html_content.replace("123/2024", f"{index}/2024"), {"entities": []}, [f"test{index}"]
+            )
+
+        # One manifest read, then at most 12 queries per batch however many
+        # files it holds: savepoint and release, document lookup, insert and
+        # re-read, search index delete and insert, descriptor lookup, insert
+        # and re-read, descriptor link delete and insert, manifest upsert.
+        with django_assert_max_num_queries(1 + 2 * 12):
+            report = populate_database_with_files(str(tmp_path), max_workers=2, batch_size=3, queue_size=1)
+
+        assert report.files_parsed == 6
+        assert report.documents_inserted == 6
+        assert Document.objects.count() == 6
+
+    def test_population_writes_each_batch_as_it_fills(self, tmp_path, sample_html_content):
+        for index in range(4):
+            self._write_files(
+                tmp_path, sample_html_content.replace("123/2024", f"{index}/2024"), {"entities": []}, [f"test{index}"]
+            )
+        written_while_parsing = []
+        original_write = seeding_scripts.write_document_batch
+
+        def write_document_batch(batch, report):
+            written_while_parsing.append(report.files_parsed)
+            original_write(batch, report)
+
+        with patch.object(seeding_scripts, "write_document_batch", side_effect=write_document_batch):
+            populate_database_with_files(str(tmp_path), max_workers=1, batch_size=1)
+
+        assert written_while_parsing == [1, 2, 3, 4]
+
+    def test_population_reports_stage_timings_and_progress(self, tmp_path, sample_html_content, sample_json_content):
+        for index in range(2):
+            self._write_files(
+                tmp_path, sample_html_content.replace("123/2024", f"{index}/2024"), sample_json_content, [f"test{index}"]
+            )
+        progress = []
+
+        report = populate_database_with_files(
+            str(tmp_path), max_workers=1, batch_size=1,
+            progress=lambda report: progress.append(report.files_processed),
+        )
+
+        assert progress == [1, 2]
+        assert set(report.stage_seconds) == set(PARSE_STAGES) | {"wait", "write"}
+        assert all(seconds > 0 for seconds in report.stage_seconds.values())
+        assert report.rows_written == (
+            report.documents_inserted + report.entities_inserted + report.citations_inserted
+        ) > 2
+        assert report.elapsed_seconds > 0
+        assert report.files_per_second > 0
+
+    def test_command_writes_summary_and_profile(self, tmp_path, sample_html_content, sample_json_content):
+        data_folder = tmp_path / "data"
+        data_folder.mkdir()
+        self._write_files(data_folder, sample_html_content, sample_json_content)
+
+        call_command(
+            "seed_database", "--data_folder", str(data_folder), "--workers", "1",
+            "--profile", str(tmp_path / "seed.prof"), "--summary-json", str(tmp_path / "summary.json"),
+            stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+
+        summary = json.loads((tmp_path / "summary.json").read_text())
+        assert summary["status"] == "succeeded"
+        assert summary["documents_inserted"] == 1
+        assert set(summary["stage_seconds"]) == set(PARSE_STAGES) | {"wait", "write"}
+        assert (tmp_path / "seed.prof").stat().st_size > 0
+
+    def test_command_summary_reports_failure(self, tmp_path):
+        stdout = io.StringIO()
+        with patch.object(seeding_scripts, "load_manifest", side_effect=DatabaseError("unavailable")), \
+                pytest.raises(CommandError, match="unavailable"):
+            call_command(
+                "seed_database", "--data_folder", str(tmp_path), "--summary-json", "-",
+                stdout=stdout, stderr=io.StringIO(),
+            )
+
+        summary = json.loads(stdout.getvalue().splitlines()[-1])
+        assert summary["status"] == "failed"
+        assert summary["error"] == "unavailable"
+
+    def test_missing_folder_raises(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            populate_database_with_files(str(tmp_path / "missing"), max_workers=1)
 
     @pytest.mark.parametrize("error_type", [
         FileNotFoundError,
         Exception,
+        lambda: json.JSONDecodeError("Invalid JSON", "doc", 0),
     ])
-    def test_error_handling(self, error_type, mock_document_objects):
-        with patch("os.listdir") as mock_listdir:
-            with patch("builtins.open") as mock_open:
-                mock_listdir.return_value = ["test.html"]
-                if error_type == json.JSONDecodeError:
-                    mock_open.side_effect = json.JSONDecodeError("Invalid JSON", "doc", 0)
-                else:
-                    mock_open.side_effect = error_type()
-
-                with patch.object(Document.objects, 'create') as mock_create:
-                    populate_database_with_files("data/", max_workers=1)
-                    mock_create.assert_not_called()
-
-    def test_json_decode_error_handling(self, mock_document_objects):
-        with patch("os.listdir") as mock_listdir:
-            with patch("builtins.open") as mock_open:
-                mock_listdir.return_value = ["test.html"]
-                mock_open.side_effect = json.JSONDecodeError("Invalid JSON", "doc", 0)
-
-                with patch.object(Document.objects, 'create') as mock_create:
-                    populate_database_with_files("data/", max_workers=1)
-                    mock_create.assert_not_called()
\ No newline at end of file
+    def test_error_handling(self, tmp_path, sample_html_content, error_type):
+        self._write_files(tmp_path, sample_html_content, {"entities": []})
+
+        with patch("builtins.open") as mock_open:
+            mock_open.side_effect = error_type()
+            report = populate_database_with_files(str(tmp_path), max_workers=1)
+
+        assert report.files_failed == 1
+        assert not Document.objects.exists()
@@ -1,11 +1,16 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import DocumentViewSet
+from . import async_views
+from .views import DocumentViewSet, EntityViewSet
 
 router = DefaultRouter()
 router.register("documents", DocumentViewSet, basename="document")
+router.register("entities", EntityViewSet, basename="entity")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("async/documents/", async_views.document_list, name="async-document-list"),
+    path("async/documents/<str:uid>/", async_views.document_detail, name="async-document-detail"),
+    path("async/documents/<str:uid>/entities/", async_views.document_entities, name="async-document-entities"),
 ]
@@ -0,0 +1,354 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:  # pragma: no cover - lxml is an optional speed-up
+    lxml = None
+
+# This module must not import Django models: process-pool workers import it
+# by reference and may start from a fresh interpreter without app loading.
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+METADATA_LABELS = {
+    "process_number": "Processo:",
+    "tribunal": "Relator:",
+    "descriptors": "Descritores:",
+    "date": "Data do Acordão:",
+    "decision": "Decisão:",
+    "summary": "Sumário:",
+}
+MAIN_TEXT_LABEL = "Decisão Texto Integral:"
+# Stored between descriptor terms in ``Document.descriptors``.
+DESCRIPTOR_SEPARATOR = "; "
+# Stages timed per file in ``record["timings"]``; the writer adds its own.
+PARSE_STAGES = ("io", "html", "json", "date")
+
+
+@contextmanager
+def timed_stage(timings, stage):
+    """Add the seconds spent in the block to ``timings[stage]`` (a no-op when ``timings`` is None)."""
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def convert_date_to_standard_format(date_string):
+    if not date_string or not isinstance(date_string, str):
+        logger.warning("Invalid date input provided.")
+        return None
+    try:
+        return datetime.strptime(date_string, '%d-%m-%Y').date()
+    except ValueError:
+        logger.error(f"Invalid date format: {date_string}")
+        return None
+
+def _bs4_label_cells(markup):
+    soup = BeautifulSoup(markup, "html.parser")
+    for td in soup.find_all("td"):
+        yield td.string, td
+
+
+def _bs4_cell_text(td, separator):
+    return td.get_text(strip=True, separator=separator)
+
+
+def _bs4_next_cell(td):
+    return td.find_next_sibling("td")
+
+
+def _lxml_string(element):
+    # Same contract as BeautifulSoup's Tag.string: the text of an element
+    # whose only child is a single string, looking through single-child tags.
+    children = []
+    if element.text:
+        children.append(element.text)
+    for child in element:
+        children.append(child)
+        if child.tail:
+            children.append(child.tail)
+    if len(children) != 1:
+        return None
+    child = children[0]
+    if isinstance(child, str):
+        return child
+    if not isinstance(child.tag, str):
+        return child.text
+    return _lxml_string(child)
+
+
+def _lxml_strings(element):
+    # Same strings BeautifulSoup's get_text() sees: text and tails, but not
+    # comments, processing instructions, scripts or styles.
+    if element.text:
+        yield element.text
+    for node in element.iterdescendants():
+        if isinstance(node.tag, str) and node.tag not in ("script", "style") and node.text:
+            yield node.text
+        if node.tail:
+            yield node.tail
+
+
+def _lxml_label_cells(markup):
+    root = lxml.html.document_fromstring(markup)
+    for td in root.iter("td"):
+        yield _lxml_string(td), td
+
+
+def _lxml_cell_text(td, separator):
+    return separator.join(text.strip() for text in _lxml_strings(td) if text.strip())
+
+
+def _lxml_next_cell(td):
+    return next(td.itersiblings("td"), None)
+
+
+PARSER_BACKENDS = {
+    "html.parser": (_bs4_label_cells, _bs4_next_cell, _bs4_cell_text),
+}
+if lxml is not None:
+    PARSER_BACKENDS["lxml"] = (_lxml_label_cells, _lxml_next_cell, _lxml_cell_text)
+DEFAULT_PARSER_BACKEND = "lxml" if lxml is not None else "html.parser"
+
+
+def split_descriptors(text):
+    """Split descriptor text on line breaks and semicolons into unique terms."""
+    terms = []
+    for term in re.split(r"[\n;]", (text or "").replace("\xa0", " ")):
+        term = " ".join(term.split())
+        if term and term not in terms:
+            terms.append(term)
+    return terms
+
+
+def _scan_labels(markup, backend):
+    """
+    Walk the ``<td>`` cells once and return the text of the cell following
+    each label in ``METADATA_LABELS`` (plus the main text), or ``None``.
+    """
+    label_cells, next_cell, cell_text = PARSER_BACKENDS[backend]
+    labels = dict(METADATA_LABELS, main_text=MAIN_TEXT_LABEL)
+    label_tds = {}
+    for text, td in label_cells(markup):
+        if not text:
+            continue
+        for key, label in labels.items():
+            if key not in label_tds and label in text:
+                label_tds[key] = td
+        if len(label_tds) == len(labels):
+            break
+
+    values = {}
+    for key in labels:
+        sibling_td = next_cell(label_tds[key]) if key in label_tds else None
+        if sibling_td is None:
+            values[key] = None
+        elif key == "main_text":
+            values[key] = cell_text(sibling_td, "\n")
+        elif key == "descriptors":
+            # One descriptor per line in the source; keep them apart.
+            values[key] = DESCRIPTOR_SEPARATOR.join(split_descriptors(cell_text(sibling_td, "\n")))
+        else:
+            values[key] = cell_text(sibling_td, " ").replace("\xa0", " ").strip()
+    return values
+
+
+def extract_metadata_and_text_from_html(file_path, backend=None, timings=None):
+    """
+    Extract the ruling metadata and main text from an HTML file in a single
+    pass over its ``<td>`` cells.
+
+    Uses lxml when it is installed and falls back to BeautifulSoup's
+    ``html.parser`` otherwise, or if lxml cannot handle the document.
+    Reading and parsing time are added to ``timings`` (see ``timed_stage``).
+    """
+    backend = backend or DEFAULT_PARSER_BACKEND
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend '{backend}', expected one of {list(PARSER_BACKENDS)}.")
+    try:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        with timed_stage(timings, "io"), open(file_path, "r", encoding="utf-8", errors="replace") as file:
+            markup = file.read()
+
+        with timed_stage(timings, "html"):
+            try:
+                values = _scan_labels(markup, backend)
+            except Exception as e:
+                if backend == "html.parser":
+                    raise
+                logger.warning(f"{backend} could not parse {file_path} ({e}); falling back to html.parser.")
+                values = _scan_labels(markup, "html.parser")
+
+        main_text = values.pop("main_text") or ""
+        metadata = {key: value if value else "" for key, value in values.items()}
+
+        missing_fields = [key for key, value in metadata.items() if not value]
+        if missing_fields:
+            logger.warning(
+                f"Warning: Missing metadata fields in file {file_path}: {', '.join(missing_fields)}"
+            )
+        return metadata, main_text
+
+    except FileNotFoundError as fnfe:
+        logger.error(fnfe)
+        raise
+    except Exception as e:
+        logger.error(f"Error parsing HTML structure in file {file_path}: {e}")
+        raise ValueError(f"Error parsing HTML file: {file_path}")
+
+
+def load_json_file(json_file):
+    try:
+        if not os.path.exists(json_file):
+            raise FileNotFoundError(f"JSON file not found: {json_file}")
+        
+        with open(json_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError as fnfe:
+        logger.error(fnfe)
+        return {}
+    except json.JSONDecodeError as jde:
+        logger.error(f"Error decoding JSON file {json_file}: {jde}")
+        return {}
+
+
+def process_html_and_json_files(file_name, data_folder, timings=None):
+    """
+    Parse one HTML ruling and its JSON entity file into plain dicts.
+
+    Returns ``(document_data, entities_data)``; both are picklable so they can
+    cross a process boundary. ``(None, [])`` means the file was skipped.
+    Per-stage seconds are added to ``timings`` when it is given.
+    """
+    if file_name.endswith(".html"):
+        try:
+            html_path = os.path.join(data_folder, file_name)
+            metadata, main_text = extract_metadata_and_text_from_html(html_path, timings=timings)
+            if not metadata:
+                return None, []
+            with timed_stage(timings, "date"):
+                document_date = convert_date_to_standard_format(metadata["date"])
+            document_data = {
+                "process_number": metadata["process_number"],
+                "tribunal": metadata["tribunal"],
+                "summary": metadata["summary"],
+                "decision": metadata["decision"],
+                "date": document_date,
+                "descriptors": metadata["descriptors"],
+                "main_text": main_text,
+            }
+
+            json_file = os.path.join(data_folder, file_name.replace(".html", ".json"))
+            with timed_stage(timings, "json"):
+                entities = load_json_file(json_file)["entities"] if os.path.exists(json_file) else []
+
+            entities_data = [
+                {
+                    "name": entity.get("name", ""),
+                    "label": entity.get("label", ""),
+                    "url": entity.get("url", ""),
+                }
+                for entity in entities
+            ]
+            return document_data, entities_data
+        except Exception as e:
+            logger.error(f"Error processing file {file_name}: {e}")
+            return None, []
+    logger.warning(f"File {file_name} does not end with '.html'. Skipping.")
+    return None, []
+
+
+def process_file_safely(file, data_folder, timings=None):
+    try:
+        return process_html_and_json_files(file, data_folder, timings=timings)
+    except Exception as e:
+        logger.error(f"Error processing file {file}: {e}")
+        return None, []
+
+
+def json_path_for(html_path):
+    return html_path[: -len(".html")] + ".json"
+
+
+def source_fingerprint(html_path):
+    """Cheap change detector for an HTML/JSON pair: ``(total size, newest mtime_ns)``."""
+    stats = [os.stat(html_path)]
+    json_path = json_path_for(html_path)
+    if os.path.exists(json_path):
+        stats.append(os.stat(json_path))
+    return sum(stat.st_size for stat in stats), max(stat.st_mtime_ns for stat in stats)
+
+
+def source_content_hash(html_path):
+    digest = hashlib.sha256()
+    for path in (html_path, json_path_for(html_path)):
+        if not os.path.exists(path):
+            continue
+        with open(path, "rb") as source:
+            for block in iter(lambda: source.read(HASH_BLOCK_SIZE), b""):
+                digest.update(block)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def build_source_record(file_name, data_folder, known_hash=None):
+    """
+    Fingerprint, hash and parse one source file into a plain dict record.
+
+    Parsing is skipped (``unchanged=True``) when the content hash matches
+    ``known_hash`` from a previous ingest. ``document`` is ``None`` when the
+    file could not be read or parsed. ``timings`` maps each of
+    ``PARSE_STAGES`` that ran to the seconds it took for this file.
+    """
+    html_path = os.path.join(data_folder, file_name)
+    record = {
+        "file_name": file_name,
+        "path": os.path.abspath(html_path),
+        "size": None,
+        "mtime_ns": None,
+        "content_hash": None,
+        "unchanged": False,
+        "document": None,
+        "entities": [],
+        "timings": {},
+    }
+    try:
+        with timed_stage(record["timings"], "io"):
+            record["size"], record["mtime_ns"] = source_fingerprint(html_path)
+            record["content_hash"] = source_content_hash(html_path)
+    except Exception as e:
+        logger.error(f"Error reading file {file_name}: {e}")
+        return record
+
+    if known_hash is not None and known_hash == record["content_hash"]:
+        record["unchanged"] = True
+        return record
+
+    record["document"], record["entities"] = process_file_safely(file_name, data_folder, record["timings"])
+    return record
+
+
+def process_file_chunk(file_names, data_folder, known_hashes=None):
+    """Parse several files in one task to amortise inter-process overhead."""
+    known_hashes = known_hashes or {}
+    return [
+        build_source_record(file_name, data_folder, known_hashes.get(file_name))
+        for file_name in file_names
+    ]
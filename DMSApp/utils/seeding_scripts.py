@@ -1,191 +1,346 @@
-import json
 import os
-from concurrent.futures import ThreadPoolExecutor,as_completed
-from datetime import datetime
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from itertools import islice
 
-from bs4 import BeautifulSoup
-from django.db import IntegrityError, transaction
-from django.utils.dateparse import parse_date
+from django.db import DatabaseError, transaction
 
-from ..models import Document, Entity
+from ..bulk import upsert_documents
+from ..models import IngestedFile
+from ..routers import use_primary
+from .parsing import (  # noqa: F401 - re-exported for existing callers
+    PARSE_STAGES,
+    convert_date_to_standard_format,
+    extract_metadata_and_text_from_html,
+    load_json_file,
+    process_file_chunk,
+    process_file_safely,
+    process_html_and_json_files,
+    source_fingerprint,
+    split_descriptors,
+    timed_stage,
+)
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def convert_date_to_standard_format(date_string):
-    if not date_string or not isinstance(date_string, str):
-        logger.warning("Invalid date input provided.")
-        return None
-    try:
-        return datetime.strptime(date_string, '%d-%m-%Y').date()
-    except ValueError:
-        logger.error(f"Invalid date format: {date_string}")
-        return None
+DEFAULT_BATCH_SIZE = 500
+EXECUTOR_CHOICES = ("threads", "processes")
+# Processes pay pickling and IPC per task, so hand each one several files.
+DEFAULT_PROCESS_CHUNK_SIZE = 16
+# Parsed records buffered between the parser pool and the database writer.
+DEFAULT_QUEUE_SIZE = 1000
+_END_OF_RECORDS = object()
+MANIFEST_UPDATE_FIELDS = ["size", "mtime_ns", "content_hash", "ingested_at"]
 
-def extract_metadata_and_text_from_html(file_path):
+@dataclass
+class SeedReport:
+    files_parsed: int = 0
+    files_unchanged: int = 0
+    files_failed: int = 0
+    documents_inserted: int = 0
+    documents_updated: int = 0
+    documents_skipped: int = 0
+    documents_failed: int = 0
+    entities_inserted: int = 0
+    entities_skipped: int = 0
+    entities_failed: int = 0
+    citations_inserted: int = 0
+    elapsed_seconds: float = 0.0
+    files_per_second: float = 0.0
+    rows_per_second: float = 0.0
+    # Seconds per stage: ``PARSE_STAGES`` are summed over parser workers (so
+    # they can exceed the wall time), ``wait`` is the writer idling on the
+    # parsers and ``write`` is time spent in database transactions.
+    stage_seconds: dict = field(default_factory=dict)
 
-    try:
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-        with open(file_path, "r", encoding="utf-8", errors="replace") as file:
-            soup = BeautifulSoup(file, "html.parser")
-
-        def get_metadata_value(label):
-
-            label_td = soup.find("td", string=lambda x: x and label in x)
-            if not label_td:
-                return None
-            sibling_td = label_td.find_next_sibling("td")
-            if sibling_td:
-                return sibling_td.get_text(strip=True, separator=" ").replace("\xa0", " ").strip()
-            return None
-
-
-        metadata = {
-            "process_number": get_metadata_value("Processo:"),
-            "tribunal": get_metadata_value("Relator:"),
-            "descriptors": get_metadata_value("Descritores:"),
-            "date": get_metadata_value("Data do Acordão:"),
-            "decision": get_metadata_value("Decisão:"),
-            "summary": get_metadata_value("Sumário:"),
-        }
-
-
-        metadata = {key: value if value else "" for key, value in metadata.items()}
-
-       
-        missing_fields = [key for key, value in metadata.items() if not value]
-        if missing_fields:
-            logger.warning(
-                f"Warning: Missing metadata fields in file {file_path}: {', '.join(missing_fields)}"
-            )
-        
+    @property
+    def files_processed(self):
+        return self.files_parsed + self.files_unchanged + self.files_failed
 
-        main_text_section = soup.find("td", string=lambda x: x and "Decisão Texto Integral:" in x)
-        if main_text_section:
-            sibling_td = main_text_section.find_next_sibling("td")
-            if sibling_td:
-                main_text = sibling_td.get_text(strip=True, separator="\n")
-            else:
-                main_text = ""
-        else:
-            main_text = ""
-        return metadata, main_text
-    
-    except FileNotFoundError as fnfe:
-        logger.error(fnfe)
-        raise
-    except Exception as e:
-        logger.error(f"Error parsing HTML structure in file {file_path}: {e}")
-        raise ValueError(f"Error parsing HTML file: {file_path}")
-
-
-def load_json_file(json_file):
+    @property
+    def rows_written(self):
+        return self.documents_inserted + self.documents_updated + self.entities_inserted + self.citations_inserted
+
+    def add_timings(self, timings):
+        for stage, seconds in timings.items():
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    def update_rates(self, elapsed):
+        self.elapsed_seconds = round(elapsed, 3)
+        self.files_per_second = round(self.files_processed / elapsed, 1) if elapsed else 0.0
+        self.rows_per_second = round(self.rows_written / elapsed, 1) if elapsed else 0.0
+
+    def as_dict(self):
+        data = asdict(self)
+        data["stage_seconds"] = {stage: round(seconds, 4) for stage, seconds in self.stage_seconds.items()}
+        return data
+
+    def __str__(self):
+        return ", ".join(f"{key}={value}" for key, value in self.as_dict().items())
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_html_files(data_folder):
+    """Yield HTML file names lazily; ``os.scandir`` never builds the full listing."""
+    with os.scandir(data_folder) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html") and entry.is_file():
+                yield entry.name
+
+
+def parse_files(file_names, data_folder, max_workers=4, executor="threads", chunk_size=None, known_hashes=None):
+    """
+    Parse HTML/JSON pairs concurrently and yield one record per file (see
+    ``build_source_record``) in submission order. Files whose content hash
+    matches ``known_hashes[file_name]`` are hashed but not parsed.
+
+    ``executor="processes"`` sidesteps the GIL for BeautifulSoup parsing;
+    ``"threads"`` avoids process start-up cost for small folders. Only a
+    couple of tasks per worker are in flight at any time, so ``file_names``
+    may be an arbitrarily long iterator.
+    """
+    if executor not in EXECUTOR_CHOICES:
+        raise ValueError(f"Unknown executor '{executor}', expected one of {EXECUTOR_CHOICES}.")
+    if chunk_size is None:
+        chunk_size = DEFAULT_PROCESS_CHUNK_SIZE if executor == "processes" else 1
+    executor_class = ProcessPoolExecutor if executor == "processes" else ThreadPoolExecutor
+    max_pending = max_workers * 2
+    known_hashes = known_hashes or {}
+
+    def collect(future, chunk):
+        try:
+            return future.result()
+        except Exception as e:
+            logger.error(f"Error processing files {', '.join(chunk)}: {e}")
+            return [{"file_name": file_name, "document": None, "entities": [], "timings": {}} for file_name in chunk]
+
+    with executor_class(max_workers=max_workers) as pool:
+        pending = deque()
+        for chunk in chunked(file_names, chunk_size):
+            chunk_hashes = {name: known_hashes[name] for name in chunk if name in known_hashes}
+            pending.append((pool.submit(process_file_chunk, chunk, data_folder, chunk_hashes), chunk))
+            while len(pending) >= max_pending:
+                yield from collect(*pending.popleft())
+        while pending:
+            yield from collect(*pending.popleft())
+
+
+def _produce_records(records, parsed, stop, errors):
     try:
-        if not os.path.exists(json_file):
-            raise FileNotFoundError(f"JSON file not found: {json_file}")
-        
-        with open(json_file, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError as fnfe:
-        logger.error(fnfe)
-        return {}
-    except json.JSONDecodeError as jde:
-        logger.error(f"Error decoding JSON file {json_file}: {jde}")
-        return {}
-
-
-def process_html_and_json_files(file_name, data_folder):
-
-    if file_name.endswith(".html"):
+        for record in parsed:
+            if not _put_record(records, record, stop):
+                return
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        parsed.close()
+        _put_record(records, _END_OF_RECORDS, stop)
+
+
+def _put_record(records, record, stop):
+    # Block while the writer catches up, but give up once it has stopped.
+    while not stop.is_set():
         try:
-            html_path = os.path.join(data_folder, file_name)
-            metadata, main_text = extract_metadata_and_text_from_html(html_path)
-            if not metadata:
-                return None, []
-            document = Document(
-                process_number=metadata["process_number"],
-                tribunal=metadata["tribunal"],
-                summary=metadata["summary"],
-                decision=metadata["decision"],
-                date=convert_date_to_standard_format(metadata["date"]),
-                descriptors=metadata["descriptors"],
-                main_text=main_text,
+            records.put(record, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def load_manifest(data_folder):
+    """Map file name -> ``(size, mtime_ns, content_hash)`` for files already ingested from ``data_folder``."""
+    prefix = os.path.join(os.path.abspath(data_folder), "")
+    rows = IngestedFile.objects.filter(path__startswith=prefix).values_list(
+        "path", "size", "mtime_ns", "content_hash"
+    )
+    return {
+        path[len(prefix):]: (size, mtime_ns, content_hash)
+        for path, size, mtime_ns, content_hash in rows.iterator()
+    }
+
+
+def iter_changed_files(file_names, data_folder, manifest, unchanged):
+    """
+    Drop files whose size and mtime match the manifest without opening them;
+    ``unchanged`` is a one-item list counting the files dropped.
+    """
+    for file_name in file_names:
+        known = manifest.get(file_name)
+        if known is not None:
+            try:
+                fingerprint = source_fingerprint(os.path.join(data_folder, file_name))
+            except OSError:
+                fingerprint = None
+            if fingerprint == known[:2]:
+                unchanged[0] += 1
+                continue
+        yield file_name
+
+
+def record_manifest(records, update_fields):
+    IngestedFile.objects.bulk_create(
+        [
+            IngestedFile(
+                path=record["path"],
+                size=record["size"],
+                mtime_ns=record["mtime_ns"],
+                content_hash=record["content_hash"],
+                process_number=record["document"]["process_number"] if record["document"] else None,
             )
+            for record in records
+        ],
+        update_conflicts=True,
+        unique_fields=["path"],
+        update_fields=update_fields,
+    )
 
-            json_file = os.path.join(data_folder, file_name.replace(".html", ".json"))
-            entities = load_json_file(json_file)["entities"] if os.path.exists(json_file) else []
-
-            entity_list = [
-                Entity(
-                    document=document,
-                    name=entity.get("name", ""),
-                    label=entity.get("label", ""),
-                    url=entity.get("url", ""),
-                )
-                for entity in entities
-            ]
-            return document, entity_list
-        except Exception as e:
-            logger.error(f"Error processing file {file_name}: {e}")
-            return None, []
-    logger.warning(f"File {file_name} does not end with '.html'. Skipping.")
-    return None, []
-def process_file_safely(file, data_folder):
+
+def write_document_batch(records, report):
+    """
+    Write one batch of source records in a single transaction.
+
+    New documents are bulk-inserted, documents that already exist (by
+    ``process_number``) are updated in place and get their entity links
+    replaced (see ``upsert_documents``), and the manifest rows for every
+    record are upserted in the same transaction, so a crash never leaves a
+    file recorded as ingested without its rows.
+    """
+    parsed = [record for record in records if record["document"]]
+
+    with transaction.atomic():
+        result = upsert_documents((record["document"], record["entities"]) for record in parsed)
+        record_manifest(parsed, update_fields=MANIFEST_UPDATE_FIELDS + ["process_number"])
+        # Unchanged files only refresh their fingerprint; their document is untouched.
+        record_manifest(
+            [record for record in records if record.get("unchanged")], update_fields=MANIFEST_UPDATE_FIELDS
+        )
+
+    outcomes = list(result.outcomes.values())
+    report.documents_inserted += outcomes.count("created")
+    report.documents_updated += outcomes.count("updated")
+    report.documents_skipped += result.documents_skipped
+    report.entities_inserted += result.entities_created
+    report.entities_skipped += result.entities_skipped
+    report.citations_inserted += result.citations_created
+
+
+def _flush_batch(batch, report):
     try:
-        return process_html_and_json_files(file, data_folder)
-    except Exception as e:
-        logger.error(f"Error processing file {file}: {e}")
-        return None, []
+        with timed_stage(report.stage_seconds, "write"):
+            write_document_batch(batch, report)
+    except DatabaseError as e:
+        logger.error(f"Error writing a batch of {len(batch)} files: {e}")
+        report.documents_failed += sum(1 for record in batch if record["document"])
+        report.entities_failed += sum(len(record["entities"]) for record in batch)
 
-def populate_database_with_files(data_folder="data/", max_workers=4):
-    documents_to_create = []
-    entities_to_create = []
 
+# Manifest reads must see the batches just written, whatever replicas lag.
+@use_primary()
+def populate_database_with_files(
+    data_folder="data/",
+    max_workers=4,
+    batch_size=DEFAULT_BATCH_SIZE,
+    executor="threads",
+    chunk_size=None,
+    queue_size=DEFAULT_QUEUE_SIZE,
+    full=False,
+    progress=None,
+):
+    """
+    Stream parsed files from a background producer through a bounded queue
+    into this thread, which writes them in batches of ``batch_size``.
 
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {executor.submit(process_html_and_json_files, file, data_folder): file for file in os.listdir(data_folder)}
+    Memory stays bounded by ``queue_size`` + ``batch_size`` records however
+    large the folder is, and the first batch is committed as soon as it fills.
 
-        for future in as_completed(futures):
-            try:
-                document, entities = future.result()
-                if document:
-                    documents_to_create.append(document)
-                    entities_to_create.extend(entities)
-            except Exception as e:
-                logger.error(f"Error processing a file: {e}")
+    Files recorded in the ingest manifest with the same size and mtime are
+    skipped without being read, and files whose content hash is unchanged
+    are not parsed. Since the manifest commits with each batch, re-running
+    after a crash resumes where the last committed batch ended. ``full=True``
+    ignores the manifest and re-parses everything.
 
+    ``progress`` is called with the report after every committed batch; the
+    report carries per-stage timings and files/rows per second.
+    """
+    report = SeedReport()
+    report.stage_seconds = dict.fromkeys(PARSE_STAGES + ("wait", "write"), 0.0)
+    started = time.perf_counter()
+    records = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    unchanged = [0]
 
-    for doc in documents_to_create:
-        try:
-            with transaction.atomic():
-                Document.objects.create(
-                    process_number=doc.process_number,
-                    tribunal=doc.tribunal,
-                    summary=doc.summary,
-                    decision=doc.decision,
-                    date=doc.date,
-                    descriptors=doc.descriptors,
-                    main_text=doc.main_text,
-                )
-        except IntegrityError:
-            logger.warning(f"Document with process_number '{doc.process_number}' already exists. Skipping.")
-
-
-    for entity in entities_to_create:
-        try:
-            with transaction.atomic():
-                Entity.objects.create(
-                    document=Document.objects.get(process_number=entity.document.process_number),
-                    name=entity.name,
-                    label=entity.label,
-                    url=entity.url,
-                )
-        except IntegrityError:
-            logger.warning(f"Entity with name '{entity.name}' already exists. Skipping.")
-        except Document.DoesNotExist:
-            logger.warning(f"Document for entity '{entity.name}' not found. Skipping.")
-
-    logger.info("Database seeding completed successfully.")
+    # The manifest is read here rather than in the producer thread so that
+    # all database access stays on this thread's connection.
+    manifest = {} if full else load_manifest(data_folder)
+    parsed = parse_files(
+        iter_changed_files(iter_html_files(data_folder), data_folder, manifest, unchanged),
+        data_folder,
+        max_workers=max_workers,
+        executor=executor,
+        chunk_size=chunk_size,
+        known_hashes={file_name: known[2] for file_name, known in manifest.items()},
+    )
+    producer = threading.Thread(
+        target=_produce_records, args=(records, parsed, stop, errors), name="seed-parser", daemon=True
+    )
+    producer.start()
+
+    batch = []
+
+    def flush():
+        _flush_batch(batch, report)
+        report.update_rates(time.perf_counter() - started)
+        logger.info(
+            f"Seeded {report.files_processed} files, {report.rows_written} rows "
+            f"({report.files_per_second} files/s, {report.rows_per_second} rows/s)"
+        )
+        if progress is not None:
+            progress(report)
+
+    try:
+        while True:
+            with timed_stage(report.stage_seconds, "wait"):
+                record = records.get()
+            if record is _END_OF_RECORDS:
+                break
+            report.add_timings(record.get("timings", {}))
+            if record.get("unchanged"):
+                report.files_unchanged += 1
+            elif record["document"]:
+                report.files_parsed += 1
+            else:
+                report.files_failed += 1
+                continue
+            batch.append(record)
+            if len(batch) >= batch_size:
+                flush()
+                batch = []
+        if batch:
+            flush()
+    finally:
+        stop.set()
+        producer.join()
+
+    if errors:
+        raise errors[0]
 
+    report.files_unchanged += unchanged[0]
+    report.update_rates(time.perf_counter() - started)
+    logger.info(f"Database seeding completed successfully: {report}")
+    return report
@@ -1,41 +1,260 @@
+import uuid
+from contextlib import nullcontext
+
+from django.db import transaction
+from django.db.models import Count
 from django.shortcuts import get_object_or_404
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.exceptions import NotFound
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.filters import SearchFilter,OrderingFilter
+from rest_framework.filters import OrderingFilter
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.utils.translation import gettext as _
 
-from .models import Document
-from .serializers import DocumentSerializer
-import hashlib
+from .bulk import upsert_documents
+from .cache import document_cache_key, get_cached, list_cache_key, lists_changed_recently, set_cached
+from .fast_serializers import ValuesPlan, fast_serialization_enabled
+from .filters import DocumentFacetFilter, FullTextSearchFilter, facets_requested, get_facet_counts
+from .export import export_documents
+from .etags import document_etag, get_document_validators, last_modified_timestamp
+from .instrumentation import timed
+from .models import BODY_FIELDS, Document, DocumentEntity, Entity, normalize_name
+from .pagination import DocumentPagination, EntityPagination
+from .routers import use_primary
+from .serializers import (
+    BulkDocumentSerializer,
+    CoCitedDocumentSerializer,
+    DocumentListSerializer,
+    DocumentSerializer,
+    EntitySerializer,
+)
+
+# Upper bound on items per bulk request, so one request stays one transaction
+# of reasonable size.
+BULK_MAX_ITEMS = 1000
+
+
+def filter_by_labels(queryset, request):
+    """Apply ``?label=LAW`` or ``?label=CASE,LAW`` to an entity queryset."""
+    labels = [label.strip().upper() for label in request.query_params.get("label", "").split(",") if label.strip()]
+    if labels:
+        queryset = queryset.filter(label__in=labels)
+    return queryset
+
 
-class DocumentPagination(PageNumberPagination):
-    page_size = 5
-    page_size_query_param = "page_size"  
-    max_page_size = 100
+def serialize_page(serializer, paginator, queryset, request, view=None):
+    """
+    Paginate ``queryset`` and render the page with ``serializer``'s fields,
+    straight from ``.values()`` rows when it has a fast path (``ValuesPlan``).
+    """
+    plan = ValuesPlan.for_serializer(serializer) if fast_serialization_enabled() else None
+    if plan is None:
+        page = paginator.paginate_queryset(queryset, request, view=view)
+        with timed("serialize"):
+            return type(serializer)(page, many=True, context=serializer.context).data
+    page = paginator.paginate_queryset(plan.values(queryset), request, view=view)
+    with timed("serialize"):
+        return plan.render(page)
 
 
-class DocumentViewSet(viewsets.ModelViewSet):
-    queryset = Document.objects.prefetch_related("entities").all()
+class CachedListMixin:
+    def get_representation_variant(self, request):
+        """Everything besides the stored version that changes the response body."""
+        renderer = getattr(request, "accepted_renderer", None)
+        return f"{renderer.format if renderer else ''}?{sorted(request.query_params.lists())}"
+
+    def get_page_variant(self, request):
+        # Page links are absolute, so the full URL is part of the key.
+        return f"{request.build_absolute_uri()}|{self.get_representation_variant(request)}"
+
+    def cached_list_response(self, request, build_response):
+        """Serve a page from the list cache, which every document write invalidates."""
+        key = list_cache_key(self.get_page_variant(request))
+        data = get_cached(key)
+        if data is None:
+            with use_primary() if lists_changed_recently() else nullcontext():
+                data = build_response().data
+            set_cached(key, data)
+        return Response(data)
+
+
+class DocumentViewSet(CachedListMixin, viewsets.ModelViewSet):
+    queryset = Document.objects.prefetch_related("entities", "descriptor_terms").all()
     serializer_class = DocumentSerializer
     pagination_class = DocumentPagination
-    filter_backends = [SearchFilter,OrderingFilter]
+    filter_backends = [DocumentFacetFilter, OrderingFilter, FullTextSearchFilter]
     search_fields = ['main_text', 'summary'] 
     ordering_fields = ['date', 'process_number']
     ordering = ['date'] 
     lookup_field = 'uid'
 
+    def get_serializer_class(self):
+        # Lists default to the compact representation; asking for explicit
+        # ?fields= switches to the full serializer trimmed to those fields.
+        if self.action == "list" and "fields" not in self.request.query_params:
+            return DocumentListSerializer
+        return DocumentSerializer
+
+    def get_queryset(self):
+        if self.action not in ("list", "retrieve"):
+            return super().get_queryset()
+
+        field_names = set(self.get_serializer().fields)
+        model_fields = {field.name for field in Document._meta.concrete_fields}
+        # Keyset pagination reads the ordering fields of the page boundaries.
+        columns = (field_names & model_fields) | {"id", "uid", "version", "updated_at", *self.ordering_fields}
+        queryset = Document.objects.only(*columns)
+        bodies = field_names & set(BODY_FIELDS)
+        if bodies:
+            # Compressed bodies are joined in only when they are rendered.
+            queryset = queryset.select_related("body").only(*columns, *(f"body__{field}" for field in bodies))
+        for relation in ("entities", "descriptor_terms"):
+            if relation in field_names:
+                queryset = queryset.prefetch_related(relation)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        def build_response():
+            queryset = self.filter_queryset(self.get_queryset())
+            data = serialize_page(self.get_serializer(), self.paginator, queryset, request, view=self)
+            response = self.get_paginated_response(data)
+            if facets_requested(request):
+                response.data["facets"] = get_facet_counts(queryset)
+            return response
+
+        return self.cached_list_response(request, build_response)
+
     @action(detail=True, methods=["get"])
     def entities(self, request, uid=None):
-        try:
-            document = get_object_or_404(self.queryset, uid=uid)
-        except NotFound:
+        validators = get_document_validators(uid)
+        if validators is None:
             return Response({"error": "Document with the given ID does not exist."}, status=404)
 
-        serializer = self.get_serializer(document)
-        return Response(serializer.data["entities"])
+        key = document_cache_key("entities", uid, validators[0], self.get_page_variant(request))
+        data = get_cached(key)
+        if data is None:
+            # Straight from the entity and link tables; the document row is never loaded.
+            queryset = filter_by_labels(Entity.objects.filter(documents__uid=uid).order_by("id"), request)
+            paginator = EntityPagination()
+            page_data = serialize_page(EntitySerializer(), paginator, queryset, request, view=self)
+            data = paginator.get_paginated_response(page_data).data
+            set_cached(key, data)
+        return Response(data)
+
+    @action(detail=True, methods=["get"], url_path="co-citations")
+    def co_citations(self, request, uid=None):
+        """Documents citing at least one of this document's entities, most shared citations first."""
+        if get_document_validators(uid) is None:
+            return Response({"error": "Document with the given ID does not exist."}, status=404)
+
+        def build_response():
+            cited = DocumentEntity.objects.filter(document__uid=uid).values("entity_id")
+            queryset = (
+                Document.objects.filter(entity_links__entity_id__in=cited)
+                .exclude(uid=uid)
+                .annotate(shared_entities=Count("entity_links"))
+                .only(*DocumentListSerializer.Meta.fields)
+                .order_by("-shared_entities", "id")
+            )
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(CoCitedDocumentSerializer(page, many=True).data)
+
+        return self.cached_list_response(request, build_response)
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """
+        Stream the corpus as NDJSON (default) or CSV: ``?output=csv``,
+        ``?fields=uid,summary``, ``?since=<ISO datetime>`` for rows changed
+        since a previous export. Gzipped when the client accepts it.
+        """
+        return export_documents(request)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_upsert(self, request):
+        """
+        Create or update up to ``BULK_MAX_ITEMS`` documents, matched on
+        ``process_number``, with their entities, in one transaction. Invalid
+        items are reported and the rest are written.
+        """
+        items = self.get_bulk_items(request.data)
+        results = [None] * len(items)
+        valid = []
+        for index, item in enumerate(items):
+            serializer = BulkDocumentSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                results[index] = {
+                    "process_number": item.get("process_number") if isinstance(item, dict) else None,
+                    "status": "invalid",
+                    "errors": serializer.errors,
+                }
+
+        seen = set()
+        for index, data in valid:
+            if data["process_number"] in seen:
+                results[index] = {
+                    "process_number": data["process_number"],
+                    "status": "invalid",
+                    "errors": {"process_number": ["Duplicate process_number in this request."]},
+                }
+            seen.add(data["process_number"])
+        valid = [(index, data) for index, data in valid if results[index] is None]
+
+        with transaction.atomic():
+            upserted = upsert_documents(
+                (
+                    {key: value for key, value in data.items() if key != "entities"},
+                    [dict(entity) for entity in data["entities"]] if "entities" in data else None,
+                )
+                for _, data in valid
+            )
+            uids = dict(
+                Document.objects.filter(id__in=upserted.document_ids.values()).values_list("process_number", "uid")
+            )
+        for index, data in valid:
+            process_number = data["process_number"]
+            results[index] = {
+                "process_number": process_number,
+                "status": upserted.outcomes.get(process_number, "failed"),
+                "uid": uids.get(process_number),
+            }
+        return Response({"results": results})
+
+    @action(detail=False, methods=["post"], url_path="bulk-delete")
+    def bulk_delete(self, request):
+        """Delete documents by ``{"uids": [...]}`` in one transaction."""
+        uids = self.get_bulk_items(request.data.get("uids") if isinstance(request.data, dict) else None)
+        valid_uids = {}
+        for uid in uids:
+            try:
+                valid_uids[str(uid)] = uuid.UUID(str(uid))
+            except ValueError:
+                pass
+
+        with transaction.atomic():
+            queryset = Document.objects.filter(uid__in=valid_uids.values())
+            found = {str(uid) for uid in queryset.values_list("uid", flat=True)}
+            queryset.delete()
+
+        results = []
+        for uid in uids:
+            if str(uid) not in valid_uids:
+                results.append({"uid": uid, "status": "invalid"})
+            else:
+                deleted = str(valid_uids[str(uid)]) in found
+                results.append({"uid": uid, "status": "deleted" if deleted else "not_found"})
+        return Response({"results": results})
+
+    def get_bulk_items(self, items):
+        if not isinstance(items, list) or not items:
+            raise ValidationError({"detail": "Expected a non-empty list."})
+        if len(items) > BULK_MAX_ITEMS:
+            raise ValidationError({"detail": f"At most {BULK_MAX_ITEMS} items per request."})
+        return items
 
     def destroy(self, request, *args, **kwargs):
         try:
@@ -58,24 +277,81 @@ class DocumentViewSet(viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         instance.delete()
 
-    
     def retrieve(self, request, *args, **kwargs):
+        uid = kwargs.get(self.lookup_field)
+        variant = self.get_representation_variant(request)
+        validators = get_document_validators(uid)
+
+        # Answer conditional requests from the indexed version column alone,
+        # before loading the document body or its entities.
+        if validators is not None:
+            version, updated_at = validators
+            etag = document_etag(uid, version, variant)
+            last_modified = last_modified_timestamp(updated_at)
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return self.set_validators(not_modified, etag, last_modified)
+
+            # Cached representations are keyed by version, so a hit is never stale.
+            data = get_cached(document_cache_key("detail", uid, version, variant))
+            if data is not None:
+                return self.set_validators(Response(data), etag, last_modified)
+
         instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        document_data = serializer.data
+        with timed("serialize"):
+            data = self.get_serializer(instance).data
+        set_cached(document_cache_key("detail", instance.uid, instance.version, variant), data)
+        return self.set_validators(
+            Response(data),
+            document_etag(instance.uid, instance.version, variant),
+            last_modified_timestamp(instance.updated_at),
+        )
+
+    def set_validators(self, response, etag, last_modified):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        return response
+
 
-        # Calculate ETag based on the serialized data
-        etag = hashlib.md5(str(document_data).encode('utf-8')).hexdigest()
+class EntityViewSet(CachedListMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Cited cases and laws across all documents. ``?name=`` matches the
+    normalized name (case and accents ignored), ``?label=`` the label.
+    """
 
-        # Check for the If-None-Match header in the request
-        if_none_match = request.headers.get('If-None-Match')
+    queryset = Entity.objects.order_by("id")
+    serializer_class = EntitySerializer
+    pagination_class = EntityPagination
 
-        # If ETag matches, return 304 Not Modified
-        if if_none_match == etag:
-            return Response(status=status.HTTP_304_NOT_MODIFIED)
+    def get_queryset(self):
+        queryset = filter_by_labels(super().get_queryset(), self.request)
+        name = self.request.query_params.get("name")
+        if name:
+            queryset = queryset.filter(normalized_name=normalize_name(name))
+        return queryset
 
-        # Otherwise, return the serialized data with ETag header
-        response = Response(document_data)
-        response['ETag'] = etag
+    def list(self, request, *args, **kwargs):
+        def build_response():
+            queryset = self.filter_queryset(self.get_queryset())
+            data = serialize_page(self.get_serializer(), self.paginator, queryset, request, view=self)
+            return self.get_paginated_response(data)
+
+        return self.cached_list_response(request, build_response)
+
+    @action(detail=True, methods=["get"])
+    def documents(self, request, pk=None):
+        """Documents citing this entity, paged by date like the document list."""
+        entity = self.get_object()
+
+        def build_response():
+            queryset = (
+                Document.objects.filter(entity_links__entity=entity)
+                .only(*DocumentListSerializer.Meta.fields)
+                .order_by("date")
+            )
+            paginator = DocumentPagination()
+            data = serialize_page(DocumentListSerializer(), paginator, queryset, request, view=self)
+            return paginator.get_paginated_response(data)
 
-        return response
\ No newline at end of file
+        return self.cached_list_response(request, build_response)
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Documents.settings')
+# Lets settings pick ASGI defaults, e.g. no persistent connections.
+os.environ['DJANGO_ASGI'] = 'True'
 
 application = get_asgi_application()
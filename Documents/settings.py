@@ -48,6 +48,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so it times the whole request.
+    'DMSApp.instrumentation.InstrumentationMiddleware',
+    # Before anything that reads the database, e.g. sessions.
+    'DMSApp.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -58,11 +62,76 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.middleware.locale.LocaleMiddleware',
+    # Compresses the body ETagMiddleware (below it) has validated.
+    'DMSApp.compression_middleware.CompressionMiddleware',
     'DMSApp.etag_middleware.ETagMiddleware',
 ]
 
 CORS_ALLOW_ALL_ORIGINS =config('CORS_ALLOW_ALL_ORIGINS', default=False, cast=bool)
 
+# Conditional GET handling (ETag / Last-Modified) only applies under these paths.
+ETAG_PATH_PREFIXES = config('ETAG_PATH_PREFIXES', default='/api/', cast=Csv())
+
+# Responses under these paths are gzip (or brotli, if installed) compressed.
+COMPRESSION_PATH_PREFIXES = config('COMPRESSION_PATH_PREFIXES', default='/api/', cast=Csv())
+
+# Response cache for the document endpoints. Local memory (LRU) by default;
+# set REDIS_URL to share it between workers.
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'dms',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'dms',
+            'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=1000, cast=int)},
+        }
+    }
+
+DOCUMENT_CACHE_ALIAS = 'default'
+DOCUMENT_CACHE_TIMEOUT = config('DOCUMENT_CACHE_TIMEOUT', default=300, cast=int)
+
+REST_FRAMEWORK = {
+    # orjson when installed, with the same output as DRF's JSON renderer.
+    'DEFAULT_RENDERER_CLASSES': [
+        'DMSApp.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'DMSApp.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Per-request query count and timings: a Server-Timing header, Prometheus
+# histograms per route at /metrics and a warning log for slow queries
+# (SLOW_QUERY_THRESHOLD_MS, 0 disables). The header and the endpoint show
+# internals, so they are off unless enabled: the header by default only
+# with DEBUG, /metrics only for METRICS_TOKEN bearers or, without a token,
+# for clients in INTERNAL_IPS.
+INSTRUMENTATION = config('INSTRUMENTATION', default=True, cast=bool)
+SERVER_TIMING = config('SERVER_TIMING', default=DEBUG, cast=bool)
+METRICS_ENABLED = config('METRICS_ENABLED', default=False, cast=bool)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+INTERNAL_IPS = config('INTERNAL_IPS', default='127.0.0.1', cast=Csv())
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=500, cast=float)
+
+# Render list pages straight from .values() rows where the serializer allows it.
+FAST_SERIALIZATION = config('FAST_SERIALIZATION', default=True, cast=bool)
+
+# 'zlib' or 'zstd' (needs the zstandard package) stores new main_text and
+# decision bodies compressed in DocumentBody; empty keeps them as plain text.
+DOCUMENT_BODY_CODEC = config('DOCUMENT_BODY_CODEC', default='')
+
 ROOT_URLCONF = 'Documents.urls'
 
 TEMPLATES = [
@@ -94,12 +163,49 @@ WSGI_APPLICATION = 'Documents.wsgi.application'
 #     }
 # }
 
+DB_SSLMODE = config('DB_SSLMODE', default='require')
+# Set by Documents/asgi.py.
+DJANGO_ASGI = config('DJANGO_ASGI', default=False, cast=bool)
+# Seconds a connection is reused across requests (0 closes it after every
+# request, None keeps it forever). Defaults to 0 under ASGI, where every
+# request runs on a fresh thread and persistent connections would leak.
+DB_CONN_MAX_AGE = config(
+    'DB_CONN_MAX_AGE',
+    default=0 if DJANGO_ASGI else 60,
+    cast=lambda value: None if value == 'None' else int(value),
+)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+# 'pgbouncer' when DATABASE_URL points at PgBouncer in transaction pooling
+# mode, which cannot keep server-side cursors open across transactions.
+DB_POOLER = config('DB_POOLER', default='')
+
 DATABASES = {
     'default': dj_database_url.config(
-        default=f"postgres://{config('DB_USER')}:{config('DB_PASSWORD')}@{config('DB_HOST')}:{config('DB_PORT')}/{config('DB_NAME')}?sslmode=require"
+        default=f"postgres://{config('DB_USER')}:{config('DB_PASSWORD')}@{config('DB_HOST')}:{config('DB_PORT')}/{config('DB_NAME')}?sslmode={DB_SSLMODE}",
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        disable_server_side_cursors=DB_POOLER == 'pgbouncer',
     )
 }
 
+# Read replicas, as comma-separated database URLs. Safe-method requests read
+# from them in turn (see DMSApp/routers.py); tests mirror them to default.
+for index, url in enumerate(config('DATABASE_REPLICA_URLS', default='', cast=Csv()), start=1):
+    DATABASES[f'replica{index}'] = dj_database_url.parse(
+        url,
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=DB_CONN_HEALTH_CHECKS,
+        disable_server_side_cursors=DB_POOLER == 'pgbouncer',
+        test_options={'MIRROR': 'default'},
+    )
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['DMSApp.routers.ReplicaRouter']
+# Seconds a replica that failed to connect is skipped before it is tried again.
+REPLICA_RETRY_SECONDS = config('REPLICA_RETRY_SECONDS', default=30, cast=int)
+# Seconds after a document write during which list pages are built on the
+# primary, so a lagging replica's page is not cached as the new one.
+REPLICA_LAG_SECONDS = config('REPLICA_LAG_SECONDS', default=10, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 